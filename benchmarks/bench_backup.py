@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark backup modes: json export, snapshot, sqlite copy.
+
+Usage: python benchmarks/bench_backup.py [number of tasks]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.lib import appconfig
+appconfig.AppConfig('wxgtd.cfg', 'wxgtd-bench')
+
+from wxgtd.model import db
+from wxgtd.model import objects as OBJ
+from wxgtd.model import exporter
+from wxgtd.model import backup
+
+
+def _fill_db(num_tasks):
+	session = OBJ.Session()
+	folders = [OBJ.Folder(title='folder %d' % idx) for idx in xrange(20)]
+	contexts = [OBJ.Context(title='context %d' % idx) for idx in xrange(20)]
+	session.add_all(folders + contexts)
+	for idx in xrange(num_tasks):
+		session.add(OBJ.Task(title='task %d' % idx,
+				note='note ' * (idx % 50),
+				folder=folders[idx % 20], context=contexts[idx % 20]))
+	session.commit()
+
+
+def _measure(name, func):
+	start = time.time()
+	func()
+	print "%-30s %8.1f ms" % (name, (time.time() - start) * 1000)
+
+
+def main():
+	num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	workdir = tempfile.mkdtemp()
+	try:
+		db.connect(os.path.join(workdir, 'wxgtd.db'))
+		_fill_db(num_tasks)
+		print "tasks: %d" % num_tasks
+		bdir = os.path.join(workdir, 'backups')
+		os.mkdir(bdir)
+		_measure("exporter.save_to_file", lambda: exporter.save_to_file(
+				os.path.join(bdir, 'BACKUP.json.zip'),
+				internal_fname="GDT_SYNC.json"))
+		_measure("snapshot (first)", lambda: backup.create_snapshot(
+				bdir, background=False))
+		os.unlink(os.path.join(bdir, backup.snapshot_name()))
+		_measure("snapshot (unchanged)", lambda: backup.create_snapshot(
+				bdir, background=False))
+		threads = []
+		_measure("snapshot (blocking part)", lambda: threads.append(
+				backup.create_snapshot(os.path.join(bdir, 's2'))))
+		threads[0].join()
+		_measure("sqlite", lambda: backup.create_sqlite_backup(
+				bdir, background=False))
+		for fname in sorted(os.listdir(bdir)):
+			path = os.path.join(bdir, fname)
+			if os.path.isfile(path):
+				print "%-30s %8d kB" % (fname, os.path.getsize(path) / 1024)
+	finally:
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
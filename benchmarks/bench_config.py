@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Microbenchmark of AppConfig.get: cached values vs eval on each call.
+
+Usage: python benchmarks/bench_config.py [number of calls]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.lib import appconfig
+CONFIG = appconfig.AppConfig('wxgtd.cfg', 'wxgtd-bench')
+CONFIG.load_defaults(os.path.join(os.path.dirname(__file__), '..', 'data',
+		'defaults.cfg'))
+
+from wxgtd.model import queries
+
+
+def _eval_get(section, key, default=None):
+	""" AppConfig.get before caching. """
+	# pylint: disable=W0212, W0123
+	config = CONFIG._config
+	if config.has_section(section) and config.has_option(section, key):
+		return eval(config.get(section, key))
+	return default
+
+
+def _measure(name, stmt, number):
+	best = min(timeit.repeat(stmt, number=number, repeat=3))
+	print "%-36s %9.3f us/call" % (name, best * 1e6 / number)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	_measure('eval get (existing key)',
+			lambda: _eval_get('hotlist', 'due', 0), number)
+	_measure('cached get (existing key)',
+			lambda: CONFIG.get('hotlist', 'due', 0), number)
+	_measure('eval get (missing key)',
+			lambda: _eval_get('hotlist', 'missing', 0), number)
+	_measure('cached get (missing key)',
+			lambda: CONFIG.get('hotlist', 'missing', 0), number)
+	_measure('build_query_params(hotlist)',
+			lambda: queries.build_query_params(queries.QUERY_HOTLIST, 0, None,
+					''), number / 10)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark exporting task lists (exporter.dump_tasks_to_*) and formatting
+timestamps (fmt.format_timestamp) on database with synthetic data.
+
+Usage: python benchmarks/bench_export.py [number of tasks]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+# datagen set sys.path and configuration
+import datagen
+
+from wxgtd.lib import fmt
+from wxgtd.lib import datetimeutils as DTU
+from wxgtd.model import queries
+from wxgtd.model import exporter
+from wxgtd.model import objects as OBJ
+
+
+class _NullOutput(object):
+	""" Count written bytes. """
+
+	def __init__(self):
+		self.size = 0
+
+	def write(self, data):
+		self.size += len(data)
+
+
+def _measure(name, func):
+	output = _NullOutput()
+	start = time.time()
+	func(output)
+	print "%-36s %10.1f ms %8d kB" % (name, (time.time() - start) * 1000,
+			output.size // 1024)
+
+
+def _format_timestamp(timestamp, show_time=True):
+	""" Previous fmt.format_timestamp (conversion by dateutil, strftime). """
+	if not timestamp:
+		return ""
+	timestamp = timestamp.replace(tzinfo=DTU.TZ_UTC).astimezone(DTU.TZ_LOCAL)
+	if show_time:
+		return timestamp.strftime("%x %X")
+	return timestamp.strftime("%x")
+
+
+def _format_timestamps(tasks, func):
+	for task in tasks:
+		func(task.completed, True)
+		func(task.due_date, task.due_time_set)
+		func(task.start_date, task.start_time_set)
+		func(task.alarm, True)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	logging.basicConfig(level=logging.CRITICAL)
+	workdir = tempfile.mkdtemp()
+	try:
+		datagen.create_database(os.path.join(workdir, 'wxgtd.db'), number)
+		session = OBJ.Session()
+		params = queries.build_query_params(queries.QUERY_ALL_TASK,
+				queries.OPT_SHOW_FINISHED | queries.OPT_SHOW_SUBTASKS, None, '')
+		snapshots = OBJ.Task.select_by_filters(params, session=session,
+				snapshot=True)
+		print "%d tasks" % len(snapshots)
+		start = time.time()
+		_format_timestamps(snapshots, _format_timestamp)
+		print "%-36s %10.1f ms" % ("timestamps: previous",
+				(time.time() - start) * 1000)
+		fmt.clear_cache()
+		DTU.clear_cache()
+		start = time.time()
+		_format_timestamps(snapshots, fmt.format_timestamp)
+		print "%-36s %10.1f ms" % ("timestamps: format_timestamp",
+				(time.time() - start) * 1000)
+		start = time.time()
+		_format_timestamps(snapshots, fmt.format_timestamp)
+		print "%-36s %10.1f ms" % ("timestamps: format_timestamp (cached)",
+				(time.time() - start) * 1000)
+		for name, func in (('text', lambda tasks, out: exporter.
+					dump_tasks_to_text(tasks, 2, output=out)),
+				('csv', lambda tasks, out: exporter.dump_tasks_to_csv(tasks, 2,
+					output=out)),
+				('jsonl', lambda tasks, out: exporter.dump_tasks_to_jsonl(tasks,
+					output=out)),
+				('ical', lambda tasks, out: exporter.dump_tasks_to_ical(tasks,
+					output=out))):
+			_measure(name + " (query)", lambda out: func(OBJ.Task.
+					select_by_filters(params, session=session), out))
+			_measure(name + " (stream)", lambda out: func(OBJ.Task.
+					iter_snapshots_by_filters(params, session=session), out))
+			session.expunge_all()
+		session.close()
+	finally:
+		OBJ.Session.close_all()
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
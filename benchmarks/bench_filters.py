@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Microbenchmark of Task.select_by_filters / count_by_filters with cached
+statements vs building and compiling query on each call.
+
+Usage: python benchmarks/bench_filters.py [number of calls]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.lib import appconfig
+CONFIG = appconfig.AppConfig('wxgtd.cfg', 'wxgtd-bench')
+CONFIG.load_defaults(os.path.join(os.path.dirname(__file__), '..', 'data',
+		'defaults.cfg'))
+
+from wxgtd.model import db
+from wxgtd.model import objects as OBJ
+from wxgtd.model import queries
+
+
+def _uncached_query(params, session):
+	""" Query built from scratch and compiled on each execution. """
+	# pylint: disable=W0212
+	template, values = OBJ._split_filter_params(params)
+	return OBJ._build_filters_query(session.query(OBJ.Task),
+			template).params(**values)
+
+
+def _measure(name, func, number):
+	best = min(timeit.repeat(func, number=number, repeat=3))
+	print "%-40s %9.3f ms/call" % (name, best * 1000 / number)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+	workdir = tempfile.mkdtemp()
+	try:
+		db.connect(os.path.join(workdir, 'wxgtd.db'))
+		session = OBJ.Session()
+		for idx in xrange(100):
+			session.add(OBJ.Task(title='task %d' % idx, priority=idx % 4,
+					starred=idx % 2))
+		session.commit()
+		params = queries.build_query_params(queries.QUERY_HOTLIST,
+				queries.OPT_HIDE_UNTIL, None, '')
+		queries.query_params_append_contexts(params, ['a', 'b', None])
+		queries.query_params_append_tags(params, ['t1'])
+		_measure('uncached query .all()', lambda: _uncached_query(params,
+				session).all(), number)
+		_measure('select_by_filters().all()', lambda: OBJ.Task.select_by_filters(
+				params, session).all(), number)
+		_measure('uncached query .count()', lambda: _uncached_query(params,
+				session).count(), number)
+		_measure('count_by_filters()', lambda: OBJ.Task.count_by_filters(
+				params, session), number)
+		# main window refresh: list + 9 group counters
+		_measure('refresh (list + 9 counts), uncached', lambda: [
+				_uncached_query(params, session).all()] + [
+				_uncached_query(queries.build_query_params(group, 0, None, ''),
+						session).count() for group in xrange(9)], number / 10)
+		_measure('refresh (list + 9 counts), cached', lambda: [
+				OBJ.Task.select_by_filters(params, session).all()] + [
+				OBJ.Task.count_by_filters(queries.build_query_params(group, 0,
+						None, ''), session) for group in xrange(9)], number / 10)
+	finally:
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
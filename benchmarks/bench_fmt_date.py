@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Microbenchmark of exporter.fmt_date against previous implementation
+(two strftime calls).
+
+Usage: python benchmarks/bench_fmt_date.py [number of dates]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import random
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.model import exporter
+
+
+def _strftime_fmt_date(date):
+	""" Previous implementation. """
+	if not date:
+		return ""
+	return date.strftime("%Y-%m-%dT%H:%M:%S.") + date.strftime("%f")[:3] + 'Z'
+
+
+def _uncached_fmt_date(date):
+	exporter._FMT_DATE_CACHE.clear()  # pylint: disable=W0212
+	return exporter.fmt_date(date)
+
+
+def _measure(name, func, values):
+	best = None
+	for _idx in xrange(3):
+		start = time.time()
+		for value in values:
+			func(value)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print "%-30s %9.3f us/call" % (name, best * 1000000 / len(values))
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+	rand = random.Random(0)
+	now = datetime.datetime.utcnow()
+	unique = [now - datetime.timedelta(seconds=rand.randint(0, 10 ** 8),
+			microseconds=rand.randint(0, 999999)) for _idx in xrange(number)]
+	# export - task timestamps are repeated in alarms and links
+	repeated = [rand.choice(unique[:number * 4 // 10])
+			for _idx in xrange(number)]
+	_measure("strftime", _strftime_fmt_date, unique)
+	_measure("fmt_date (no cache)", _uncached_fmt_date, unique)
+	_measure("fmt_date (repeated)", exporter.fmt_date, repeated)
+	_measure("fmt_date (None)", exporter.fmt_date, [None] * number)
+	assert all(exporter.fmt_date(value) == _strftime_fmt_date(value)
+			for value in unique)
+
+
+if __name__ == '__main__':
+	main()
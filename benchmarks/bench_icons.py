@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark loading icons on start: searching and reading png files from
+data directory against memory-mapped icons atlas (icon_atlas).
+
+Creating bitmaps is measured only when wxPython is available.
+
+Usage: python benchmarks/bench_icons.py [number of repeats]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.wxtools import icon_atlas
+
+try:
+	import wx
+except ImportError:
+	wx = None
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+_FILE_EXTS = ('.png', '.ico', '.jpg')
+# copy of iconprovider.FIRST_FRAME_ICONS (iconprovider require wx)
+_ICONS = ('wxgtd', 'task_new', 'task_quick', 'task_edit', 'task_delete',
+		'task_done', 'task_starred', 'sync', 'reminders', 'notebook', 'prio-1',
+		'prio0', 'prio1', 'prio2', 'prio3', 'sm_up', 'sm_down', 'status_small',
+		'project_small', 'goal_small', 'folder_small', 'tag_small',
+		'starred_small', 'alarm_small', 'repeat_small', 'note_small')
+
+
+def _load_files():
+	""" Previous way: probe each extension, read file. """
+	result = []
+	for name in _ICONS:
+		for ext in _FILE_EXTS:
+			filename = os.path.join(_DATA_DIR, name + ext)
+			if not os.path.isfile(filename):
+				continue
+			if wx:
+				result.append(wx.Bitmap(filename, wx.BITMAP_TYPE_PNG))
+			else:
+				with open(filename, 'rb') as ifile:
+					result.append(ifile.read())
+			break
+	return result
+
+
+def _load_atlas():
+	atlas = icon_atlas.load_atlas(_DATA_DIR)
+	result = []
+	for name in _ICONS:
+		width, height, data = atlas.get_rgba(name)
+		if wx:
+			result.append(wx.BitmapFromBufferRGBA(width, height, data))
+		else:
+			result.append(data)
+	atlas.close()
+	return result
+
+
+def _measure(name, func, repeats):
+	start = time.time()
+	for _idx in xrange(repeats):
+		result = func()
+	elapsed = (time.time() - start) / repeats
+	assert len(result) == len(_ICONS)
+	print "%-36s %10.3f ms" % (name, elapsed * 1000)
+
+
+def main():
+	repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	# bitmaps can be created only after creating application
+	app = wx.App(False) if wx else None
+	if app is None:
+		print "wxPython not available - bitmaps are not created"
+	print "%d icons" % len(_ICONS)
+	_measure("files", _load_files, repeats)
+	_measure("atlas", _load_atlas, repeats)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Compare memory and time of loading task list as Task objects and as
+TaskSnapshot (Task.select_by_filters(..., snapshot=True)).
+
+Each variant is measured in separate process (growth of RSS).
+
+Usage: python benchmarks/bench_snapshot.py [number of tasks]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import resource
+import tempfile
+import subprocess
+
+# datagen set sys.path and configuration
+import datagen
+
+from wxgtd.model import db
+from wxgtd.model import queries
+from wxgtd.model import objects as OBJ
+
+
+def _get_rss():
+	""" Get current (Linux) or max resident set size in kB.
+
+	Max RSS is inherited by process created by fork from big parent, so
+	/proc is preferred.
+	"""
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+	except IOError:
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(filename, snapshot):
+	""" Load all tasks; print time (ms) and memory growth (kB). """
+	db.connect(filename)
+	session = OBJ.Session()
+	params = queries.build_query_params(queries.QUERY_ALL_TASK,
+			queries.OPT_SHOW_FINISHED | queries.OPT_SHOW_SUBTASKS, None, '')
+	# warm up connection and mappers
+	OBJ.Task.count_by_filters(params, session=session)
+	mem_start = _get_rss()
+	start = time.time()
+	tasks = OBJ.Task.select_by_filters(params, session=session,
+			snapshot=snapshot)
+	if not snapshot:
+		tasks = tasks.all()
+	elapsed = time.time() - start
+	mem = _get_rss() - mem_start
+	print len(tasks), elapsed * 1000, mem
+
+
+def main():
+	logging.basicConfig(level=logging.CRITICAL)
+	if len(sys.argv) > 2 and sys.argv[1] == '--child':
+		_measure(sys.argv[2], sys.argv[3] == 'snapshot')
+		return
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	workdir = tempfile.mkdtemp()
+	try:
+		filename = os.path.join(workdir, 'wxgtd.db')
+		datagen.create_database(filename, number)
+		OBJ.Session.close_all()
+		results = {}
+		for mode in ('task', 'snapshot'):
+			output = subprocess.check_output([sys.executable, __file__,
+					'--child', filename, mode])
+			count, elapsed, mem = output.split()
+			results[mode] = float(mem)
+			print "%-10s %6s tasks %10.1f ms %10.0f kB %8.0f B/task" % (mode,
+					count, float(elapsed), float(mem),
+					float(mem) * 1024 / int(count))
+		print "snapshot uses %.0f%% of memory" % (results['snapshot'] * 100 /
+				results['task'])
+	finally:
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
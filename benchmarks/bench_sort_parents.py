@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark ordering objects by parent (loader.sort_objects_by_parent) on
+deep synthetic hierarchies against previous implementation.
+
+Usage: python benchmarks/bench_sort_parents.py [number of objects]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.model import loader
+
+
+def _level_sort(objs):
+	""" Previous implementation (filter remaining objects for every level;
+	loop forever on missing parents). """
+	if not objs:
+		return []
+	result = [x for x in objs if x["parent_id"] == 0]
+	result_uuids = set(obj["_id"] for obj in result)
+	objs = [x for x in objs if x["parent_id"] != 0]
+	while objs:
+		objs_to_add = [x for x in objs if x["parent_id"] in result_uuids]
+		objs = [x for x in objs if x["parent_id"] not in result_uuids]
+		result.extend(objs_to_add)
+		result_uuids.update(obj["_id"] for obj in objs_to_add)
+	return result
+
+
+def _chain(number, _rand):
+	""" One path: each object is child of previous one. """
+	return [{'_id': oid, 'parent_id': oid - 1} for oid in xrange(1, number + 1)]
+
+
+def _deep_tree(number, rand):
+	""" Tree with depth about sqrt(number). """
+	depth = int(number ** 0.5)
+	return [{'_id': oid, 'parent_id': rand.randint(max(oid - depth, 1),
+			oid - 1) if oid > 1 else 0} for oid in xrange(1, number + 1)]
+
+
+def _flat(number, rand):
+	""" Many top-level objects, one level of children (typical folders). """
+	return [{'_id': oid, 'parent_id': rand.randint(1, oid - 1)
+			if oid > 1 and rand.random() < 0.3 else 0}
+			for oid in xrange(1, number + 1)]
+
+
+def _measure(name, func, objs):
+	start = time.time()
+	result = func(objs)
+	elapsed = time.time() - start
+	assert len(result) == len(objs)
+	print "%-36s %10.1f ms" % (name, elapsed * 1000)
+	return result
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+	logging.basicConfig(level=logging.CRITICAL)
+	rand = random.Random(0)
+	for name, generator in (('chain', _chain), ('deep tree', _deep_tree),
+			('flat', _flat)):
+		objs = generator(number, rand)
+		# order in sync file is not defined
+		rand.shuffle(objs)
+		print "%s (%d objects)" % (name, number)
+		old = _measure("  previous", _level_sort, objs)
+		new = _measure("  sort_objects_by_parent", loader.sort_objects_by_parent,
+				objs)
+		assert sorted(old) == sorted(new)
+
+
+if __name__ == '__main__':
+	main()
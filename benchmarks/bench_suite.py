@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark suite on synthetic data (see datagen).
+
+Measure loading and dumping sync data, task lists for each group, group
+counters (as in main window) and repeating tasks. Results can be saved as
+json and compared with previous results.
+
+Usage: python benchmarks/bench_suite.py [options]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import sqlite3
+import datetime
+import optparse
+import tempfile
+
+import sqlalchemy
+
+# datagen set sys.path and configuration
+import datagen
+
+from wxgtd.model import db
+from wxgtd.model import loader
+from wxgtd.model import exporter
+from wxgtd.model import queries
+from wxgtd.model import objects as OBJ
+from wxgtd.logic import task as task_logic
+
+_GROUPS = (('all', queries.QUERY_ALL_TASK),
+		('hotlist', queries.QUERY_HOTLIST),
+		('today', queries.QUERY_TODAY),
+		('starred', queries.QUERY_STARRED),
+		('basket', queries.QUERY_BASKET),
+		('finished', queries.QUERY_FINISHED),
+		('projects', queries.QUERY_PROJECTS),
+		('checklists', queries.QUERY_CHECKLISTS),
+		('future_alarms', queries.QUERY_FUTURE_ALARMS),
+		('trash', queries.QUERY_TRASH))
+
+
+def _quiet(_progress, _msg):
+	pass
+
+
+class Suite(object):
+	""" Run benchmarks and collect results.
+
+	Args:
+		workdir: directory for databases
+		num_tasks: number of generated tasks
+		repeat: number of runs of each benchmark; best time is reported
+		seed: seed for data generator
+	"""
+
+	def __init__(self, workdir, num_tasks, repeat=3, seed=0):
+		self._workdir = workdir
+		self._num_tasks = num_tasks
+		self._repeat = repeat
+		self._data = datagen.generate_json(num_tasks, seed)
+		self._db_cnt = 0
+		# name -> {'best': sec, 'mean': sec, 'number': calls per run}
+		self.results = {}
+
+	def measure(self, name, func, number=1, setup=None):
+		""" Run `func` `number` times in each of runs; store time per call.
+		"""
+		times = []
+		for _idx in xrange(self._repeat):
+			if setup:
+				setup()
+			start = time.time()
+			for _idx in xrange(number):
+				func()
+			times.append((time.time() - start) / number)
+		self.results[name] = {'best': min(times),
+				'mean': sum(times) / len(times),
+				'number': number}
+		print "%-28s %10.3f ms" % (name, min(times) * 1000)
+
+	def _new_database(self):
+		OBJ.Session.close_all()
+		self._db_cnt += 1
+		db.connect(os.path.join(self._workdir, 'wxgtd_%d.db' % self._db_cnt))
+
+	def run(self):
+		print "tasks: %d, sync data: %d kB" % (self._num_tasks,
+				len(self._data) / 1024)
+		self.measure('load_json', lambda: loader.load_json(self._data, _quiet,
+				force=True), setup=self._new_database)
+		self.measure('dump_database_to_json', lambda: exporter.
+				dump_database_to_json(_quiet))
+		session = OBJ.Session()
+		for name, group in _GROUPS:
+			params = queries.build_query_params(group, queries.OPT_HIDE_UNTIL,
+					None, '')
+			self.measure('select_' + name, lambda: OBJ.Task.select_by_filters(
+					params, session=session).all(), 5)
+		self.measure('refresh_groups', lambda: self._count_groups(session), 5)
+		self.measure('repeat_task', lambda: self._repeat_tasks(session),
+				setup=session.rollback)
+		session.rollback()
+
+	@staticmethod
+	def _count_groups(session):
+		""" Count tasks in groups as main window. """
+		for group in xrange(queries.QUERY_TRASH):
+			params = queries.build_query_params(group, queries.OPT_HIDE_UNTIL
+					| queries.OPT_SHOW_SUBTASKS, None, '')
+			OBJ.Task.count_by_filters(params, session=session)
+
+	@staticmethod
+	def _repeat_tasks(session):
+		""" Complete and repeat all tasks with repeat pattern (without
+		saving). """
+		now = datetime.datetime.utcnow()
+		tasks = session.query(OBJ.Task).filter(  # pylint: disable=E1101
+				OBJ.Task.repeat_pattern.isnot(None),
+				OBJ.Task.repeat_pattern != '',
+				OBJ.Task.repeat_pattern != 'Norepeat').all()
+		with session.no_autoflush:
+			for task in tasks:
+				task.completed = task.completed or now
+				task_logic.repeat_task(task, False)
+
+	def dump(self, filename):
+		""" Save results and environment info as json. """
+		data = {'date': datetime.datetime.now().isoformat(),
+				'tasks': self._num_tasks,
+				'repeat': self._repeat,
+				'python': sys.version.split()[0],
+				'sqlalchemy': sqlalchemy.__version__,
+				'sqlite': sqlite3.sqlite_version,
+				'results': self.results}
+		with open(filename, 'w') as ofile:
+			json.dump(data, ofile, indent=2, sort_keys=True)
+
+
+def compare(results, filename):
+	""" Print comparison of `results` with previous results from file. """
+	with open(filename) as ifile:
+		previous = json.load(ifile)
+	print "\ncompared to %s (%s, %d tasks):" % (filename, previous.get('date'),
+			previous.get('tasks'))
+	prev_results = previous.get('results', {})
+	for name in sorted(results):
+		if name not in prev_results:
+			continue
+		prev = prev_results[name]['best']
+		curr = results[name]['best']
+		change = (curr - prev) / prev * 100 if prev else 0
+		print "%-28s %10.3f -> %10.3f ms  %+7.1f%%%s" % (name, prev * 1000,
+				curr * 1000, change, '  <--' if change > 10 else '')
+
+
+def main():
+	optp = optparse.OptionParser(usage="%prog [options]")
+	optp.add_option('--tasks', '-n', type="int", default=1000,
+			help="number of tasks (default 1000)")
+	optp.add_option('--repeat', '-r', type="int", default=3,
+			help="number of runs of each benchmark (default 3)")
+	optp.add_option('--seed', type="int", default=0, help="random seed")
+	optp.add_option('--output', '-o', help="save results to json file")
+	optp.add_option('--compare', '-c', help="compare with results from file")
+	options, _args = optp.parse_args()
+	logging.basicConfig(level=logging.CRITICAL)
+	workdir = tempfile.mkdtemp()
+	try:
+		suite = Suite(workdir, options.tasks, options.repeat, options.seed)
+		suite.run()
+	finally:
+		OBJ.Session.close_all()
+		shutil.rmtree(workdir)
+	if options.output:
+		suite.dump(options.output)
+	if options.compare:
+		compare(suite.results, options.compare)
+
+
+if __name__ == '__main__':
+	main()
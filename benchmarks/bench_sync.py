@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark sync transports against local file and in-process http server.
+
+Usage: python benchmarks/bench_sync.py [number of tasks] [latency ms]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.lib import appconfig
+appconfig.AppConfig('wxgtd.cfg', 'wxgtd-bench')
+
+from wxgtd.model import db
+from wxgtd.model import objects as OBJ
+from wxgtd.model import sync
+from wxgtd.model import transport
+from wxgtd.model.transport_server import StandInServer
+
+
+def _fill_db(num_tasks):
+	session = OBJ.Session()
+	folders = [OBJ.Folder(title='folder %d' % idx) for idx in xrange(20)]
+	session.add_all(folders)
+	for idx in xrange(num_tasks):
+		session.add(OBJ.Task(title='task %d' % idx, note='note ' * (idx % 50),
+				folder=folders[idx % 20]))
+	session.commit()
+
+
+def _measure(name, func, repeat=3):
+	times = []
+	for _idx in xrange(repeat):
+		start = time.time()
+		func()
+		times.append(time.time() - start)
+	print "%-36s %9.1f ms (min of %d)" % (name, min(times) * 1000, repeat)
+	return min(times)
+
+
+def _quiet(_progress, _msg):
+	pass
+
+
+def main():
+	num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.01
+	workdir = tempfile.mkdtemp()
+	config = appconfig.AppConfig()
+	config.set('backup', 'location', os.path.join(workdir, 'backups'))
+	server = StandInServer(latency).start()
+	try:
+		db.connect(os.path.join(workdir, 'wxgtd.db'))
+		_fill_db(num_tasks)
+		print "tasks: %d, server latency: %.1f ms" % (num_tasks, latency * 1000)
+		os.mkdir(os.path.join(workdir, 'sync'))
+		file_trans = lambda: transport.FileTransport(os.path.join(workdir,
+				'sync', 'GTD_SYNC.zip'))
+		http_trans = lambda: transport.HttpTransport(server.url +
+				'/sync/GTD_SYNC.zip')
+		_measure("sync (file)", lambda: sync.sync_transport(file_trans(),
+				notify_cb=_quiet, force=True))
+		_measure("sync (http)", lambda: sync.sync_transport(http_trans(),
+				notify_cb=_quiet, force=True))
+		# raw transport performance
+		trans = http_trans()
+		_measure("http stat latency", trans.stat, 20)
+		data = 'x' * (8 * 1024 * 1024)
+		put_time = _measure("http put 8MB", lambda: trans.put(StringIO(data),
+				len(data)))
+		get_time = _measure("http get 8MB", lambda: trans.get(StringIO()))
+		print "http throughput: put %.1f MB/s, get %.1f MB/s" % (8 / put_time,
+				8 / get_time)
+		trans.close()
+	finally:
+		server.stop()
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
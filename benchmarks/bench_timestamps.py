@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark parsing timestamps from sync file (loader.str2datetime_utc)
+against dateutil parser.
+
+Usage: python benchmarks/bench_timestamps.py [number of timestamps]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import random
+import datetime
+
+from dateutil import parser, tz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.model import loader
+from wxgtd.model.exporter import fmt_date
+
+
+def _dateutil_parse(string):
+	""" Previous implementation. """
+	value = parser.parse(string)
+	return value.astimezone(tz.tzutc()).replace(tzinfo=None)
+
+
+def _fast_parse(string):
+	loader._TIMESTAMPS_CACHE.clear()  # pylint: disable=W0212
+	return loader.str2datetime_utc(string)
+
+
+def _measure(name, func, values):
+	start = time.time()
+	for value in values:
+		func(value)
+	elapsed = time.time() - start
+	print "%-36s %12.0f timestamps/s" % (name, len(values) / elapsed)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+	rand = random.Random(0)
+	now = datetime.datetime.utcnow()
+	unique = [fmt_date(now - datetime.timedelta(seconds=rand.randint(0,
+			10 ** 8), milliseconds=rand.randint(0, 999)))
+			for _idx in xrange(number)]
+	# sync file - about 4 distinct values for 10 timestamps
+	repeated = [rand.choice(unique[:number * 4 // 10])
+			for _idx in xrange(number)]
+	_measure("dateutil", _dateutil_parse, unique)
+	_measure("str2datetime_utc (no cache)", _fast_parse, unique)
+	loader._TIMESTAMPS_CACHE.clear()  # pylint: disable=W0212
+	_measure("str2datetime_utc (unique)", loader.str2datetime_utc, unique)
+	loader._TIMESTAMPS_CACHE.clear()  # pylint: disable=W0212
+	_measure("str2datetime_utc (repeated)", loader.str2datetime_utc, repeated)
+	assert all(loader.str2datetime_utc(value) == _dateutil_parse(value)
+			for value in unique[:1000])
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Benchmark loading xrc resources: localizing whole file on each start
+against precompiled, per-window resources cached on disk (xrc_cache).
+
+When wxPython is available also startup (FrameMain) and first-open time of
+FrameTask and DlgPreferences is measured; each variant in separate process
+with empty home directory:
+	previous - whole xrc localized and parsed on start,
+	cold     - first start (cache is created),
+	warm     - next start (cache is used).
+
+Usage: python benchmarks/bench_xrc.py [number of tasks]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+
+# datagen set sys.path and configuration
+import datagen
+
+from wxgtd.wxtools import xrc_cache
+
+try:
+	import wx
+except ImportError:
+	wx = None
+
+_XRC_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'wxgtd.xrc')
+_WINDOWS = ('frame_main', 'frame_task', 'dlg_preferences')
+
+
+def _measure(name, func, repeats=10):
+	start = time.time()
+	for _idx in xrange(repeats):
+		result = func()
+	print "%-36s %10.1f ms" % (name, (time.time() - start) * 1000 / repeats)
+	return result
+
+
+def _measure_preprocessing(workdir):
+	cache_dir = os.path.join(workdir, 'xrc')
+
+	def load_previous():
+		with open(_XRC_FILE, 'rb') as xrc_file:
+			return xrc_cache.localize_xrc(xrc_file.read())
+
+	def load_cold():
+		shutil.rmtree(cache_dir, True)
+		return xrc_cache.load_objects(_XRC_FILE, None, cache_dir)
+
+	data = _measure("previous (localize)", load_previous)
+	_measure("precompile (no cache)", load_cold)
+	objects = _measure("precompiled (cache)", lambda: xrc_cache.load_objects(
+			_XRC_FILE, None, cache_dir))
+	print "parsed on first open (kB): previous %d" % (len(data) // 1024)
+	for name in _WINDOWS:
+		print "  %-34s %10d" % (name, len(objects[name]) // 1024)
+
+
+def _load_previous(filename, _cache={}):  # pylint: disable=W0102
+	""" Previous wxresources.load_xrc_resource. """
+	from wx import xrc
+	from wxgtd.wxtools import wxresources
+	res = _cache.get(filename)
+	if res is None:
+		with open(datagen.CONFIG.get_data_file(filename), 'rb') as xrc_file:
+			data = xrc_cache.localize_xrc(xrc_file.read())
+		res = _cache[filename] = xrc.EmptyXmlResource()
+		res.InsertHandler(wxresources.NumCtrlXmlHandler())
+		res.InsertHandler(wxresources.TimeCtrlXmlHandler())
+		res.InsertHandler(wxresources.ColourSelectHandler())
+		res.InsertHandler(wxresources.SearchCtrlXmlHandler())
+		res.InsertHandler(wxresources.CalendarCtrlXmlHandler())
+		res.LoadFromString(data)
+	return res
+
+
+def _measure_windows(filename, mode):
+	""" Create windows; print times in ms. """
+	from wxgtd.model import db
+	from wxgtd.model import objects as OBJ
+	from wxgtd.wxtools import iconprovider
+	from wxgtd.wxtools import wxresources
+	app = wx.App(False)
+	if mode == 'previous':
+		wxresources.load_xrc_resource = _load_previous
+	db.connect(filename)
+	iconprovider.init_icon_cache(None, datagen.CONFIG.data_dir)
+	times = []
+	start = time.time()
+	from wxgtd.gui.frame_main import FrameMain
+	frame = FrameMain()
+	app.SetTopWindow(frame.wnd)
+	times.append(time.time() - start)
+	session = OBJ.Session()
+	task = session.query(OBJ.Task).first()
+	start = time.time()
+	from wxgtd.gui.task_controller import TaskController
+	TaskController(frame.wnd, session, task).open_dialog()
+	times.append(time.time() - start)
+	start = time.time()
+	from wxgtd.gui.dlg_preferences import DlgPreferences
+	DlgPreferences(frame.wnd)
+	times.append(time.time() - start)
+	print " ".join(str(elapsed * 1000) for elapsed in times)
+	sys.stdout.flush()
+	# main window started background threads
+	os._exit(0)  # pylint: disable=W0212
+
+
+def main():
+	logging.basicConfig(level=logging.CRITICAL)
+	if len(sys.argv) > 2 and sys.argv[1] == '--child':
+		_measure_windows(sys.argv[2], sys.argv[3])
+		return
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	workdir = tempfile.mkdtemp()
+	try:
+		_measure_preprocessing(workdir)
+		if wx is None:
+			print "wxPython not available - windows are not created"
+			return
+		filename = os.path.join(workdir, 'wxgtd.db')
+		datagen.create_database(filename, number)
+		env = dict(os.environ)
+		env['HOME'] = os.path.join(workdir, 'home')
+		print "%-10s %12s %12s %16s" % ('', 'FrameMain', 'FrameTask',
+				'DlgPreferences')
+		for mode in ('previous', 'cold', 'warm'):
+			output = subprocess.check_output([sys.executable, __file__,
+					'--child', filename, mode], env=env)
+			print "%-10s %9.1f ms %9.1f ms %13.1f ms" % ((mode, ) +
+					tuple(float(val) for val in output.split()))
+	finally:
+		shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,303 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Generator of synthetic GTD sync data for benchmarks.
+
+Generated data contains nested folders, contexts, goals and tags, projects
+with subtasks, checklists with items, tasks with alarms, repeat patterns,
+tags and notes, and notebook pages. Data is generated from seed, so the same
+arguments always give the same content (except uuids and timestamps, which
+are relative to current time).
+
+Usage: python benchmarks/datagen.py [options]
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+import os
+import sys
+import json
+import random
+import zipfile
+import datetime
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxgtd.lib import appconfig
+CONFIG = appconfig.AppConfig('wxgtd.cfg', 'wxgtd-bench')
+CONFIG.load_defaults(os.path.join(os.path.dirname(__file__), '..', 'data',
+		'defaults.cfg'))
+
+from wxgtd.model import enums
+from wxgtd.model import objects as OBJ
+from wxgtd.model.exporter import fmt_date
+
+_REPEAT_PATTERNS = [pattern for pattern, _label in enums.REPEAT_PATTERN_LIST
+		if pattern not in ('Norepeat', 'WITHPARENT')]
+
+_WORDS = ('buy', 'call', 'check', 'fix', 'write', 'read', 'plan', 'send',
+		'review', 'prepare', 'book', 'order', 'clean', 'update', 'meet',
+		'report', 'invoice', 'garden', 'car', 'office', 'project', 'budget',
+		'letter', 'tickets', 'server', 'backup', 'doctor', 'school', 'milk')
+
+# device that "synchronized" generated file
+DEVICE_ID = 'bench-device'
+
+
+class _Generator(object):
+	""" Build sync data dict; objects get sequential _id per kind. """
+
+	def __init__(self, seed, now):
+		self._rand = random.Random(seed)
+		self._now = now
+		self.data = {'version': 2}
+
+	def _title(self, words=3):
+		return ' '.join(self._rand.choice(_WORDS) for _idx in xrange(words))
+
+	def _date(self, min_days, max_days):
+		return self._now + datetime.timedelta(
+				minutes=self._rand.randint(min_days * 1440, max_days * 1440))
+
+	def _base(self, kind, oid):
+		created = self._date(-400, -30)
+		modified = created + datetime.timedelta(
+				minutes=self._rand.randint(0, 29 * 1440))
+		obj = {'_id': oid,
+				'uuid': OBJ.generate_uuid(),
+				'created': fmt_date(created),
+				'modified': fmt_date(modified)}
+		self.data.setdefault(kind, []).append(obj)
+		return obj
+
+	def _link(self, kind, obj, **ids):
+		link = {'created': obj['created'], 'modified': obj['modified']}
+		link.update(ids)
+		self.data.setdefault(kind, []).append(link)
+
+	def tree(self, kind, count, **extra):
+		""" Create `count` nested objects (i.e. folders); return ids. """
+		ids = []
+		for oid in xrange(1, count + 1):
+			obj = self._base(kind, oid)
+			# about third of objects are nested
+			parent = self._rand.choice(ids) if ids and \
+					self._rand.random() < 0.3 else 0
+			obj.update({'parent_id': parent,
+					'deleted': '',
+					'ordinal': oid,
+					'title': self._title(2) + ' %d' % oid,
+					'note': '',
+					'bg_color': 'FFEFFF00',
+					'visible': 1})
+			obj.update(extra)
+			ids.append(oid)
+		return ids
+
+	def task(self, oid, parent_id, task_type):
+		rand = self._rand
+		task = self._base('task', oid)
+		completed = deleted = ''
+		if rand.random() < 0.3:
+			completed = fmt_date(self._date(-30, 0))
+		if rand.random() < 0.03:
+			deleted = fmt_date(self._date(-30, 0))
+		due_date = start_date = hide_until = ''
+		hide_pattern = ''
+		if rand.random() < 0.5:
+			due = self._date(-20, 60)
+			due_date = fmt_date(due)
+			if rand.random() < 0.5:
+				start_date = fmt_date(due - datetime.timedelta(days=rand.randint(
+						0, 14)))
+			if rand.random() < 0.1:
+				hide_pattern = 'given date'
+				hide_until = fmt_date(self._date(-10, 30))
+		elif rand.random() < 0.2:
+			start_date = fmt_date(self._date(-20, 30))
+		repeat_pattern = ''
+		if task_type == enums.TYPE_TASK and rand.random() < 0.1:
+			repeat_pattern = rand.choice(_REPEAT_PATTERNS)
+		task.update({'parent_id': parent_id,
+				'completed': completed,
+				'deleted': deleted,
+				'ordinal': oid,
+				'title': self._title(rand.randint(2, 6)),
+				'note': self._title(rand.randint(5, 40)) if rand.random() < 0.3
+						else '',
+				'type': task_type,
+				'starred': 1 if rand.random() < 0.1 else 0,
+				'status': rand.randint(0, 10) if rand.random() < 0.3 else 0,
+				'priority': rand.randint(-1, 3),
+				'importance': 0,
+				'start_date': start_date,
+				'start_time_set': 0,
+				'due_date': due_date,
+				'due_date_project': '',
+				'due_time_set': rand.randint(0, 1),
+				'due_date_mod': 0,
+				'floating_event': 0,
+				'duration': 0,
+				'energy_required': 0,
+				'repeat_from': rand.randint(0, 1),
+				'repeat_pattern': repeat_pattern,
+				'repeat_end': 0,
+				'hide_pattern': hide_pattern,
+				'hide_until': hide_until,
+				'prevent_auto_purge': 0,
+				'trash_bin': 0,
+				'metainf': ''})
+		return task
+
+	def tasks(self, count, folders, contexts, goals, tags):
+		""" Create tasks with projects, checklists, subtasks and links. """
+		rand = self._rand
+		containers = []  # ids of projects and checklists
+		alarm_id = note_id = 0
+		for oid in xrange(1, count + 1):
+			roll = rand.random()
+			if roll < 0.05:
+				# subprojects
+				projects = [cid for cid, ctype in containers
+						if ctype == enums.TYPE_PROJECT]
+				task_type, parent_id = enums.TYPE_PROJECT, (rand.choice(projects)
+						if projects and rand.random() < 0.3 else 0)
+			elif roll < 0.07:
+				task_type, parent_id = enums.TYPE_CHECKLIST, 0
+			elif roll < 0.5 and containers:
+				parent_id, parent_type = rand.choice(containers)
+				task_type = (enums.TYPE_CHECKLIST_ITEM
+						if parent_type == enums.TYPE_CHECKLIST
+						else enums.TYPE_TASK)
+			else:
+				task_type, parent_id = rand.choice((enums.TYPE_TASK,
+						enums.TYPE_TASK, enums.TYPE_TASK, enums.TYPE_CALL,
+						enums.TYPE_EMAIL)), 0
+			task = self.task(oid, parent_id, task_type)
+			if task_type in (enums.TYPE_PROJECT, enums.TYPE_CHECKLIST):
+				containers.append((oid, task_type))
+			if folders and rand.random() < 0.6:
+				self._link('task_folder', task, task_id=oid,
+						folder_id=rand.choice(folders))
+			if contexts and rand.random() < 0.6:
+				self._link('task_context', task, task_id=oid,
+						context_id=rand.choice(contexts))
+			if goals and rand.random() < 0.2:
+				self._link('task_goal', task, task_id=oid,
+						goal_id=rand.choice(goals))
+			for tag_id in rand.sample(tags, min(len(tags),
+					rand.choice((0, 0, 1, 1, 2, 3)))):
+				self._link('task_tag', task, task_id=oid, tag_id=tag_id)
+			if rand.random() < 0.1 and not task['completed']:
+				alarm_id += 1
+				alarm = self._base('alarm', alarm_id)
+				alarm.update({'task_id': oid,
+						'created': task['created'],
+						'modified': task['modified'],
+						'alarm': fmt_date(self._date(-5, 30)),
+						'reminder': 0,
+						'active': 1,
+						'note': ''})
+			if rand.random() < 0.05:
+				note_id += 1
+				note = self._base('tasknote', note_id)
+				note.update({'task_id': oid,
+						'ordinal': note_id,
+						'title': self._title(10),
+						'bg_color': 'FFEFFF00',
+						'visible': 1})
+
+	def notebooks(self, count, folders):
+		for oid in xrange(1, count + 1):
+			page = self._base('notebook', oid)
+			page.update({'deleted': '',
+					'ordinal': oid,
+					'title': self._title(3),
+					'note': self._title(self._rand.randint(10, 200)),
+					'starred': 1 if self._rand.random() < 0.1 else 0,
+					'bg_color': 'FFEFFF00',
+					'visible': 1})
+			if folders and self._rand.random() < 0.5:
+				self._link('notebook_folder', page, notebook_id=oid,
+						folder_id=self._rand.choice(folders))
+
+	def synclog(self):
+		sync_time = self._now - datetime.timedelta(minutes=5)
+		self.data['syncLog'] = [{'deviceId': DEVICE_ID,
+				'prevSyncTime': fmt_date(sync_time - datetime.timedelta(days=1)),
+				'syncTime': fmt_date(sync_time)}]
+
+
+def generate(num_tasks=1000, seed=0, now=None):
+	""" Generate data in GTD sync format.
+
+	Args:
+		num_tasks: number of tasks; number of other objects depends on it
+		seed: random seed
+		now: base time for dates (utc)
+
+	Returns:
+		dict with sync data (see loader.load_json)
+	"""
+	gen = _Generator(seed, now or datetime.datetime.utcnow())
+	folders = gen.tree('folder', max(num_tasks // 50, 3))
+	contexts = gen.tree('context', max(num_tasks // 200, 5))
+	goals = gen.tree('goal', max(num_tasks // 500, 2), time_period=0,
+			archived=0)
+	tags = gen.tree('tag', max(num_tasks // 20, 5))
+	gen.tasks(num_tasks, folders, contexts, goals, tags)
+	gen.notebooks(max(num_tasks // 20, 1), folders)
+	gen.synclog()
+	return gen.data
+
+
+def generate_json(num_tasks=1000, seed=0, now=None):
+	""" Generate data (see `generate`) encoded as json string. """
+	return json.dumps(generate(num_tasks, seed, now))
+
+
+def write_sync_file(filename, num_tasks=1000, seed=0):
+	""" Write generated data to sync file (zip when filename ends with .zip).
+	"""
+	data = generate_json(num_tasks, seed)
+	if filename.endswith('.zip'):
+		with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zfile:
+			zfile.writestr('GTD_SYNC.json', data)
+	else:
+		with open(filename, 'w') as ofile:
+			ofile.write(data)
+
+
+def create_database(filename, num_tasks=1000, seed=0):
+	""" Create database with generated data (loaded by sync loader). """
+	from wxgtd.model import db
+	from wxgtd.model import loader
+	db.connect(filename)
+	loader.load_json(generate_json(num_tasks, seed), _quiet, force=True)
+
+
+def _quiet(_progress, _msg):
+	pass
+
+
+def main():
+	optp = optparse.OptionParser(usage="%prog [options]")
+	optp.add_option('--tasks', '-n', type="int", default=1000,
+			help="number of tasks (default 1000)")
+	optp.add_option('--seed', type="int", default=0, help="random seed")
+	optp.add_option('--sync-file', help="write sync file (.json or .zip)")
+	optp.add_option('--database', help="create database file")
+	options, _args = optp.parse_args()
+	if not options.sync_file and not options.database:
+		optp.error("missing --sync-file or --database")
+	if options.sync_file:
+		write_sync_file(options.sync_file, options.tasks, options.seed)
+	if options.database:
+		create_database(options.database, options.tasks, options.seed)
+
+
+if __name__ == '__main__':
+	main()
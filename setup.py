@@ -204,11 +204,30 @@ class MakeXrcCommand(Command):
 					os.path.join(base_dir, '%s.wxg' % wxg))
 
 
+class MakeIconAtlasCommand(Command):
+	""" Pack icons from data directory into atlas. """
+
+	description = "create packed icons atlas"
+	user_options = []
+
+	def initialize_options(self):
+		pass
+
+	def finalize_options(self):
+		pass
+
+	def run(self):
+		from wxgtd.wxtools import icon_atlas
+		count = icon_atlas.build_atlas('data')
+		print 'packed %d icons into data/%s' % (count, icon_atlas.ATLAS_FILE)
+
+
 if __name__ == '__main__':
 	cmdclass = {'make_mo': MakeMoCommand,
 			'make_man': MakeManCommand,
 			'update_potfiles': UpdatePotfilesCommand,
 			'create_xrc': MakeXrcCommand,
+			'make_icon_atlas': MakeIconAtlasCommand,
 			'clean': CleanupCmd}
 
 	target = {'script': "wxgtd_dbg.py",
@@ -29,6 +29,7 @@ _LOG = logging.getLogger(__name__)
 
 from wxgtd import version
 from wxgtd.model import queries
+from wxgtd.model import profiler
 
 
 def _parse_opt():
@@ -89,11 +90,32 @@ def _parse_opt():
 			dest="verbose", help='show more information')
 	group.add_option('--output-csv', action="store_true",
 			dest="output_csv", help='show result as csv file')
+	group.add_option('--output-jsonl', action="store_true",
+			dest="output_jsonl", help='show result as json lines')
+	group.add_option('--output-ical', action="store_true",
+			dest="output_ical", help='show result as iCalendar file')
 	optp.add_option_group(group)
 
 	group = optparse.OptionGroup(optp, "Options")
 	group.add_option('--sync', action="store_true", dest="sync",
 			help='sync data on startup and exit')
+	group.add_option('--sync-full', action="store_true", dest="sync_full",
+			help='load all objects from sync file (with --sync)')
+	group.add_option('--list-backups', action="store_true",
+			dest="list_backups", help='list available backups')
+	group.add_option('--restore-backup', dest="restore_backup",
+			help='restore database from backup (see --list-backups)')
+	optp.add_option_group(group)
+
+	group = optparse.OptionGroup(optp, "Reminders")
+	group.add_option('--reminder-daemon', action="store_true",
+			dest="reminder_daemon", help='wait for task alarms and show '
+			'reminders; read commands from stdin: snooze <uuid> [<pattern>], '
+			'dismiss <uuid>, reload, quit')
+	group.add_option('--reminder-output', dest="reminder_output",
+			type="choice", choices=['stdout', 'notify', 'gui'],
+			default='stdout', help='where show reminders: stdout, notify '
+			'(notify-send), gui (running wxGTD); default: stdout')
 	optp.add_option_group(group)
 
 	group = optparse.OptionGroup(optp, "Debug options")
@@ -103,10 +125,17 @@ def _parse_opt():
 			help='enable sql debug messages')
 	group.add_option("--shell", action="store_true", default=False,
 			help="start shell", dest="shell")
+	group.add_option("--profile", action="store_true", default=False,
+			help="print sql queries statistics on exit", dest="profile")
+	group.add_option("--explain-queries", action="store_true", default=False,
+			help="check query plans of standard queries",
+			dest="explain_queries")
 	optp.add_option_group(group)
 	options, args = optp.parse_args()
 	if not any((options.quick_task_title, options.query_group >= 0,
-			options.sync, options.shell)):
+			options.sync, options.shell, options.list_backups,
+			options.restore_backup, options.reminder_daemon,
+			options.explain_queries)):
 		optp.print_help()
 		exit(0)
 	return options, args
@@ -138,23 +167,43 @@ def run():
 	from wxgtd.model import db
 	db_filename = db.find_db_file(config)
 	# connect to databse
-	db.connect(db_filename, options.debug_sql)
+	db.connect(db_filename, options.debug_sql, options.profile)
 
+	if options.list_backups:
+		_list_backups()
+	if options.restore_backup:
+		_restore_backup(options.restore_backup)
 	if options.sync:
-		_sync(config, True)
+		_sync(config, True, options.sync_full)
 	if options.quick_task_title:
 		from wxgtd.logic import quicktask as quicktask_logic
 		quicktask_logic.create_quicktask(options.quick_task_title)
 	elif options.query_group >= 0:
 		_list_tasks(options, args)
 	if options.sync:
-		_sync(config, False)
+		_sync(config, False, options.sync_full)
+	if options.reminder_daemon:
+		_reminder_daemon(config, options.reminder_output)
+	if options.explain_queries:
+		_explain_queries(options.verbose)
 	if options.shell:
 		_shell()
+	if options.profile:
+		print >> sys.stderr, "\n".join(profiler.format_summary())
 	config.save()
 	exit(0)
 
 
+def _explain_queries(verbose):
+	""" Print query plans problems. """
+	from wxgtd.model import objects as OBJ
+	from wxgtd.model import query_advisor
+	session = OBJ.Session()
+	query_advisor.print_report(session.connection(), verbose)
+	session.close()
+
+
+@profiler.profiled('list tasks')
 def _list_tasks(options, _args):
 	""" List tasks action. """
 	from wxgtd.model import objects as OBJ
@@ -169,9 +218,13 @@ def _list_tasks(options, _args):
 	params = queries.build_query_params(group_id, query_opt,
 			options.parent_uuid, options.search_text or '')
 
-	tasks = OBJ.Task.select_by_filters(params)
+	tasks = OBJ.Task.iter_snapshots_by_filters(params)
 	if options.output_csv:
 		_print_csv_tasks_list(tasks, options.verbose)
+	elif options.output_jsonl:
+		_print_jsonl_tasks_list(tasks)
+	elif options.output_ical:
+		_print_ical_tasks_list(tasks)
 	else:
 		_print_simple_tasks_list(tasks, options.verbose)
 
@@ -188,15 +241,60 @@ def _print_csv_tasks_list(tasks, verbose):
 	exporter.dump_tasks_to_csv(tasks, verbose)
 
 
+def _print_jsonl_tasks_list(tasks):
+	""" Export task list to stdout in json lines format. """
+	from wxgtd.model import exporter
+	exporter.dump_tasks_to_jsonl(tasks)
+
+
+def _print_ical_tasks_list(tasks):
+	""" Export task list to stdout in iCalendar format. """
+	from wxgtd.model import exporter
+	exporter.dump_tasks_to_ical(tasks)
+
+
 def _log_sync_cb(progress, msg):
 	print >> sys.stderr, msg
 
 
-def _sync(config, load_only):
+def _sync(config, load_only, force=False):
 	last_sync_file = config.get('files', 'last_sync_file')
 	if last_sync_file:
 		from wxgtd.model import sync
-		sync.sync(last_sync_file, load_only, notify_cb=_log_sync_cb)
+		sync.sync(last_sync_file, load_only, notify_cb=_log_sync_cb,
+				force=force)
+
+
+def _list_backups():
+	from wxgtd.model import sync
+	from wxgtd.model import backup
+	for name in backup.list_backups(sync.get_backup_dir()):
+		print name
+
+
+def _restore_backup(name):
+	from wxgtd.model import sync
+	from wxgtd.model import backup
+	backup_dir = sync.get_backup_dir()
+	if name not in backup.list_backups(backup_dir):
+		print >> sys.stderr, "Backup %s not found" % name
+		exit(1)
+	rows = backup.restore_backup(backup_dir, name)
+	print >> sys.stderr, "Restored %d objects" % rows
+
+
+def _reminder_daemon(config, output):
+	from wxgtd.logic import reminder_daemon
+	try:
+		sink = reminder_daemon.create_sink(output, config)
+	except ValueError as err:
+		print >> sys.stderr, err
+		exit(1)
+	daemon = reminder_daemon.ReminderDaemon(sink, sys.stdin)
+	try:
+		daemon.run()
+	except KeyboardInterrupt:
+		pass
 
 
 def _shell():
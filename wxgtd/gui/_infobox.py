@@ -10,7 +10,7 @@ Licence: GPLv2+
 
 __author__ = "Karol Będkowski"
 __copyright__ = "Copyright (c) Karol Będkowski, 2013"
-__version__ = "2013-05-20"
+__version__ = "2013-07-27"
 
 import gettext
 import logging
@@ -58,7 +58,7 @@ def draw_info(mdc, task, overdue, cache):
 
 	Args:
 		mdc: DC canvas
-		task: task to render
+		task: task to render (Task or TaskListItem)
 		overdue: is task overdue
 	"""
 	main_icon_y_offset = (SETTINGS['line_height'] - 32) / 2
@@ -102,8 +102,8 @@ def _draw_info_task_status(mdc, cache, task, x_off, y_off):
 
 def _draw_info_task_context(mdc, cache, task, x_off, y_off):
 	task_context = cache.get('task_context')
-	if task_context is None and task.context:
-		task_context = task.context.title
+	if task_context is None and task.context_title:
+		task_context = task.context_title
 		if not task_context.startswith('@'):
 			task_context = '@' + task_context
 		cache['task_context'] = task_context
@@ -116,13 +116,8 @@ def _draw_info_task_context(mdc, cache, task, x_off, y_off):
 
 def _draw_info_task_parent(mdc, cache, task, x_off, y_off):
 	task_parent = cache.get('task_parent')
-	if task_parent is None and task.parent:
-		task_parents = []
-		while task.parent:
-			task_parents.insert(0, task.parent.title)
-			task = task.parent
-		task_parent = '/'.join(task_parents)
-		cache['task_parent'] = task_parent
+	if task_parent is None and task.parents_path:
+		cache['task_parent'] = task_parent = task.parents_path
 		cache['task_parent_x_off'] = mdc.GetTextExtent(task_parent)[0] + 10
 	if task_parent:
 		mdc.DrawBitmap(iconprovider.get_image('project_small'), x_off,
@@ -135,8 +130,8 @@ def _draw_info_task_parent(mdc, cache, task, x_off, y_off):
 
 def _draw_info_task_goal(mdc, cache, task, x_off, y_off):
 	task_goal = cache.get('task_goal')
-	if task_goal is None and task.goal:
-		cache['task_goal'] = task_goal = task.goal.title
+	if task_goal is None and task.goal_title:
+		cache['task_goal'] = task_goal = task.goal_title
 		cache['task_goal_x_off'] = mdc.GetTextExtent(task_goal)[0] + 10
 	if task_goal:
 		mdc.DrawBitmap(iconprovider.get_image('goal_small'), x_off,
@@ -149,8 +144,8 @@ def _draw_info_task_goal(mdc, cache, task, x_off, y_off):
 
 def _draw_info_task_folder(mdc, cache, task, x_off, y_off):
 	task_folder = cache.get('task_folder')
-	if task_folder is None and task.folder:
-		cache['task_folder'] = task_folder = task.folder.title
+	if task_folder is None and task.folder_title:
+		cache['task_folder'] = task_folder = task.folder_title
 		cache['task_folder_x_off'] = mdc.GetTextExtent(task_folder)[0] + 10
 	if task_folder:
 		mdc.DrawBitmap(iconprovider.get_image('folder_small'), x_off,
@@ -163,9 +158,8 @@ def _draw_info_task_folder(mdc, cache, task, x_off, y_off):
 
 def _draw_info_task_tags(mdc, cache, task, x_off, y_off):
 	task_tags = cache.get('task_tags')
-	if task_tags is None and task.tags:
-		cache['task_tags'] = task_tags = ",".join(
-				tag.title for tag in task.tags)
+	if task_tags is None and task.tags_titles:
+		cache['task_tags'] = task_tags = task.tags_titles
 	if task_tags:
 		mdc.DrawBitmap(iconprovider.get_image('tag_small'), x_off,
 				y_off, False)
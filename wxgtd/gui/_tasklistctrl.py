@@ -10,7 +10,7 @@ Licence: GPLv2+
 
 __author__ = "Karol Będkowski"
 __copyright__ = "Copyright (c) Karol Będkowski, 2013"
-__version__ = "2011-03-29"
+__version__ = "2013-07-27"
 
 import sys
 import gettext
@@ -22,6 +22,7 @@ from wx.lib.agw import ultimatelistctrl as ULC
 import wx.lib.mixins.listctrl as listmix
 
 from wxgtd.model import enums
+from wxgtd.model import profiler
 from wxgtd.lib import fmt
 from wxgtd.gui import _infobox as infobox
 from wxgtd.wxtools import iconprovider
@@ -190,23 +191,26 @@ class TaskListControl(ULC.UltimateListCtrl, listmix.ColumnSorterMixin):
 				break
 			yield self._items[self.GetItemData(idx)][0]
 
-	def fill(self, tasks, active_only=False):
+	@profiler.profiled('fill list')
+	def fill(self, tasks, active_only=False, append=False):
 		""" Fill the list with tasks.
 
 		Args:
-			task: list of tasks
+			task: list of tasks (Task or TaskListItem)
 			active_only: boolean - show/count only active tasks.
+			append: add tasks to existing items (i.e. next page of results)
 		"""
 		# pylint: disable=R0915
 		self.Freeze()
 		current_sort_state = self.GetSortState()
 		if current_sort_state[0] == -1:
 			current_sort_state = (2, 1)
-		self._drag_item_start = None
-		self._items.clear()
-		self.itemDataMap.clear()
-		self._mainWin.HideWindows()  # workaround for some bug in ULC
-		self.DeleteAllItems()
+		if not append:
+			self._drag_item_start = None
+			self._items.clear()
+			self.itemDataMap.clear()
+			self._mainWin.HideWindows()  # workaround for some bug in ULC
+			self.DeleteAllItems()
 		icon_completed = self._icons.get_image_index('task_done')
 		prio_icon = {-1: self._icons.get_image_index('prio-1'),
 				0: self._icons.get_image_index('prio0'),
@@ -338,7 +342,8 @@ class TaskListControl(ULC.UltimateListCtrl, listmix.ColumnSorterMixin):
 
 
 def _get_sort_info_for_task(task):
-	""" Wartośći sortowań kolejnych kolumn dla danego zadania """
+	""" Wartośći sortowań kolejnych kolumn dla danego zadania
+	(Task lub TaskSnapshot) """
 	due = tuple(task.due_date.timetuple()) if task.due_date else (9999, )
 	# 1 col - priorytet
 	yield (task.priority, task.importance, task.starred, due)
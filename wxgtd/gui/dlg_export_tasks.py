@@ -27,6 +27,12 @@ from ._base_dialog import BaseDialog
 _ = gettext.gettext
 _LOG = logging.getLogger(__name__)
 
+# format (suffix of radio button name) -> file extension
+_FORMATS = {'txt': '.txt',
+		'csv': '.csv',
+		'jsonl': '.jsonl',
+		'ical': '.ics'}
+
 
 class DlgExportTasks(BaseDialog):
 	""" Exporting task parameters dialog.
@@ -46,10 +52,9 @@ class DlgExportTasks(BaseDialog):
 		wnd.Bind(wx.EVT_BUTTON, self._on_save, id=wx.ID_SAVE)
 		wnd.Bind(wx.EVT_BUTTON, self._on_btn_file_select,
 				self['btn_filen_select'])
-		wnd.Bind(wx.EVT_RADIOBUTTON, self._on_format_change,
-				self['rb_format_txt'])
-		wnd.Bind(wx.EVT_RADIOBUTTON, self._on_format_change,
-				self['rb_format_csv'])
+		for fmt_name in _FORMATS:
+			wnd.Bind(wx.EVT_RADIOBUTTON, self._on_format_change,
+					self['rb_format_' + fmt_name])
 
 	def _setup(self):
 		self['tc_filename'].SetValidator(Validator(
@@ -66,12 +71,17 @@ class DlgExportTasks(BaseDialog):
 		elif self['rb_details_verbose'].GetValue():
 			details = 2
 		filename = self['tc_filename'].GetValue()
+		fmt_name = self._get_format()
 		try:
-			with open(filename, 'wt') as dfile:
-				if self['rb_format_txt'].GetValue():  # txt
+			with open(filename, 'wb' if fmt_name == 'ical' else 'wt') as dfile:
+				if fmt_name == 'txt':
 					exporter.dump_tasks_to_text(self._tasks, details, output=dfile)
-				else:  # csv
+				elif fmt_name == 'csv':
 					exporter.dump_tasks_to_csv(self._tasks, details, output=dfile)
+				elif fmt_name == 'jsonl':
+					exporter.dump_tasks_to_jsonl(self._tasks, output=dfile)
+				else:
+					exporter.dump_tasks_to_ical(self._tasks, output=dfile)
 			msg.message_box_info(self._wnd, _("Export complete."))
 		except IOError as error:
 			msg.message_box_error_ex(self._wnd, _("Export Error."),
@@ -79,8 +89,7 @@ class DlgExportTasks(BaseDialog):
 
 	def _on_btn_file_select(self, _evt):
 		default_dir = os.path.expanduser("~")
-		default_file = ("tasks.txt" if self['rb_format_txt'].GetValue() else
-				'tasks.csv')
+		default_file = "tasks" + _FORMATS[self._get_format()]
 		curr_filename = self['tc_filename'].GetValue()
 		if curr_filename:
 			default_file = os.path.basename(curr_filename)
@@ -93,13 +102,18 @@ class DlgExportTasks(BaseDialog):
 			self['tc_filename'].SetValue(dlg.GetPath())
 		dlg.Destroy()
 
+	def _get_format(self):
+		for fmt_name in _FORMATS:
+			if self['rb_format_' + fmt_name].GetValue():
+				return fmt_name
+		return 'txt'
+
 	def _on_format_change(self, _evt):
 		filename = self['tc_filename'].GetValue()
 		if filename:
 			fname, fext = os.path.splitext(filename)
-			if self['rb_format_txt'].GetValue():
-				if fext.lower() == '.csv':
-					self['tc_filename'].SetValue(fname + ".txt")
-			else:
-				if fext.lower() != '.csv':
-					self['tc_filename'].SetValue(fname + ".csv")
+			ext = _FORMATS[self._get_format()]
+			# replace only extensions of known formats
+			if fext.lower() != ext and (not fext
+					or fext.lower() in _FORMATS.values()):
+				self['tc_filename'].SetValue(fname + ext)
@@ -12,6 +12,7 @@ __copyright__ = "Copyright (c) Karol Będkowski, 2013"
 __version__ = "2013-04-28"
 
 import logging
+import gettext
 
 import wx
 from wxgtd.wxtools.wxpub import publisher
@@ -19,6 +20,7 @@ from wxgtd.wxtools.wxpub import publisher
 from ._base_dialog import BaseDialog
 
 _LOG = logging.getLogger(__name__)
+_ = gettext.gettext
 
 
 class DlgSyncProggress(BaseDialog):
@@ -30,6 +32,7 @@ class DlgSyncProggress(BaseDialog):
 	def __init__(self, parent):
 		self._g_progress = None
 		self._tc_progress = None
+		self._cancel_cb = None
 		BaseDialog.__init__(self, parent, 'dlg_sync_progress', save_pos=False)
 		self._setup()
 
@@ -40,11 +43,28 @@ class DlgSyncProggress(BaseDialog):
 			progress: numeric (0-100) progress
 			msg: message to append into window.
 		"""
+		self.append(progress, msg)
+		self._wnd.Update()
+		wx.Yield()
+
+	def append(self, progress, msg):
+		""" Update dialog progress and add message without processing events.
+
+		Used when synchronisation is running in background thread (called by
+		wx.CallAfter).
+		"""
 		_LOG.debug("update %r %r", progress, msg)
+		if not self._wnd:
+			# dialog already destroyed
+			return
 		self._g_progress.SetValue(max(min(int(progress), 100), 0))
 		self._tc_progress.AppendText(msg + '\n')
-		self._wnd.Update()
-		wx.Yield()
+
+	def set_cancel_handler(self, cancel_cb):
+		""" Enable "Cancel" button; `cancel_cb` is called when user press it.
+		"""
+		self._cancel_cb = cancel_cb
+		self[wx.ID_CANCEL].Enable(cancel_cb is not None)
 
 	def mark_finished(self, autoclose=-1):
 		""" Set progress finished.
@@ -52,7 +72,11 @@ class DlgSyncProggress(BaseDialog):
 		Args:
 			autoclose: if > 0 dialog will be closed after given second.
 		"""
+		if not self._wnd:
+			return
 		self._g_progress.SetValue(100)
+		self._cancel_cb = None
+		self[wx.ID_CANCEL].Enable(False)
 		self[wx.ID_CLOSE].Enable(True)
 		if autoclose == 0:
 			self._wnd.Close()
@@ -74,3 +98,22 @@ class DlgSyncProggress(BaseDialog):
 
 	def _on_update_message(self, args):
 		self.update(*args.data)
+
+	def _on_close(self, evt):
+		if self._cancel_cb:
+			# synchronisation in progress; cancel it instead of closing
+			self._request_cancel()
+			return
+		BaseDialog._on_close(self, evt)
+
+	def _on_cancel(self, evt):
+		if evt.GetId() == wx.ID_CANCEL:
+			self._request_cancel()
+			return
+		BaseDialog._on_cancel(self, evt)
+
+	def _request_cancel(self):
+		if self._cancel_cb and self[wx.ID_CANCEL].IsEnabled():
+			self._tc_progress.AppendText(_("Cancelling...") + '\n')
+			self[wx.ID_CANCEL].Enable(False)
+			self._cancel_cb()
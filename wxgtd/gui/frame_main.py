@@ -9,7 +9,7 @@ Licence: GPLv2+
 
 __author__ = "Karol Będkowski"
 __copyright__ = "Copyright (c) Karol Będkowski, 2013"
-__version__ = "2013-04-28"
+__version__ = "2013-07-27"
 
 import os
 import gettext
@@ -28,7 +28,12 @@ from wxgtd.model import sync
 from wxgtd.model import enums
 from wxgtd.model import queries
 from wxgtd.model import dbsync
+from wxgtd.model.sync_worker import SyncWorker
+from wxgtd.model import search_worker
+from wxgtd.model import profiler
 from wxgtd.logic import task as task_logic
+from wxgtd.logic import reminders
+from wxgtd.logic import reminder_daemon
 from wxgtd.lib import fmt
 from wxgtd.gui import dlg_about
 from wxgtd.gui import _infobox as infobox
@@ -38,22 +43,17 @@ from wxgtd.gui import quicktask
 from wxgtd.gui._base_frame import BaseFrame
 from wxgtd.gui._filtertreectrl import FilterTreeCtrl
 from wxgtd.gui._taskbaricon import TaskBarIcon
-from wxgtd.gui.dlg_preferences import DlgPreferences
 from wxgtd.gui.dlg_sync_progress import DlgSyncProggress
-from wxgtd.gui.dlg_tags import DlgTags
-from wxgtd.gui.dlg_goals import DlgGoals
-from wxgtd.gui.dlg_folders import DlgFolders
-from wxgtd.gui.dlg_contexts import DlgContexts
-from wxgtd.gui.dlg_export_tasks import DlgExportTasks
 from wxgtd.gui.frame_reminders import FrameReminders
-from wxgtd.gui.frame_notebooks import FrameNotebook
 from wxgtd.gui.task_controller import TaskController
-from wxgtd.gui.frame_search import FrameSeach
 
 _ = gettext.gettext
 ngettext = gettext.ngettext  # pylint: disable=C0103
 _LOG = logging.getLogger(__name__)
 
+# seconds to wait for cancelled synchronisation when closing window
+_SYNC_JOIN_TIMEOUT = 2
+
 
 class FrameMain(BaseFrame):
 	""" Main window class. """
@@ -73,14 +73,30 @@ class FrameMain(BaseFrame):
 		self._session = OBJ.Session()
 		self._items_path = []
 		self._last_reminders_check = None
+		self._sync_worker = None
+		self._search_worker = search_worker.SearchWorker()
+		self._search_worker.start()
 		self._filter_tree_ctrl.RefreshItems()
 		self._tbicon = TaskBarIcon(self.wnd)  # pylint: disable=W0201
 		self['rb_show_selection'].SetSelection(self._appconfig.get('main',
 			'selected_group', 0))
 		if self._appconfig.get('sync', 'sync_on_startup'):
 			wx.CallAfter(self._autosync)
+		self._reminders = reminders.ReminderScheduler()
+		self._reminders.load(self._session)
 		self._reminders_timer = wx.Timer(self.wnd)
-		self._reminders_timer.Start(30 * 1000)  # 30 sec
+		self._schedule_reminders()
+		self._ipc_listener = None
+		if reminder_daemon.is_ipc_available():
+			# reminders from headless daemon (wxgtd_cli.py --reminder-daemon)
+			try:
+				self._ipc_listener = reminder_daemon.IpcListener(
+						reminder_daemon.get_ipc_path(self._appconfig),
+						self._on_ipc_reminders)
+				self._ipc_listener.start()
+			except IOError as err:
+				_LOG.warn('FrameMain: start ipc listener error: %s', err)
+				self._ipc_listener = None
 
 	def _load_controls(self):
 		# pylint: disable=W0201
@@ -155,6 +171,7 @@ class FrameMain(BaseFrame):
 
 		publisher.subscribe(self._on_tasks_update, ('task', 'update'))
 		publisher.subscribe(self._on_tasks_update, ('task', 'delete'))
+		publisher.subscribe(self._on_sync_finished, ('sync', 'finished'))
 		publisher.subscribe(self._on_frame_messsage, ('gui', 'frame_main'))
 
 		self._create_popup_menu_bindings(wnd)
@@ -289,7 +306,7 @@ class FrameMain(BaseFrame):
 		self._searchbox.SetDescriptiveText(_('Search'))
 		self._searchbox.ShowCancelButton(True)
 		toolbar.AddControl(self._searchbox)
-		#self.wnd.Bind(wx.EVT_TEXT, self._on_search, self._searchbox)
+		self.wnd.Bind(wx.EVT_TEXT, self._on_search_text, self._searchbox)
 		self.wnd.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self._on_search,
 				self._searchbox)
 		self.wnd.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self._on_search_cancel,
@@ -320,8 +337,23 @@ class FrameMain(BaseFrame):
 
 	def _on_close(self, event):
 		appconfig = self._appconfig
-		if appconfig.get('sync', 'sync_on_exit'):
-			self._autosync(False)
+		self._search_worker.stop()
+		sync_running = False
+		worker = self._sync_worker
+		if worker and worker.is_alive():
+			# callbacks of detached worker are ignored
+			self._sync_worker = None
+			worker.cancel()
+			# upload can't be cancelled; don't wait for slow transfer
+			worker.join(_SYNC_JOIN_TIMEOUT)
+			sync_running = worker.is_alive()
+			if sync_running:
+				_LOG.warn("FrameMain._on_close: synchronisation still running")
+		if self._ipc_listener:
+			self._ipc_listener.close()
+			self._ipc_listener = None
+		if appconfig.get('sync', 'sync_on_exit') and not sync_running:
+			self._autosync(False, background=False)
 		appconfig.set('main', 'show_finished', self._btn_show_finished.GetValue())
 		appconfig.set('main', 'show_subtask', self._btn_show_subtasks.GetValue())
 		appconfig.set('main', 'show_hide_until', self._btn_hide_until.GetValue())
@@ -389,17 +421,19 @@ class FrameMain(BaseFrame):
 
 	def _on_menu_file_sync(self, _evt):
 		self._synchronize(False)
-		publisher.sendMessage('task.update')
-		publisher.sendMessage('dict.update')
 
 	def _on_menu_sett_preferences(self, _evt):
+		# rarely used windows are imported on first use
+		from wxgtd.gui.dlg_preferences import DlgPreferences
 		if DlgPreferences(self.wnd).run(True):
 			self._filter_tree_ctrl.RefreshItems()
 
 	def _on_menu_file_export_tasks(self, _evt):
 		params = self._get_params_for_list()
-		tasks = OBJ.Task.select_by_filters(params, session=self._session)
+		tasks = OBJ.Task.select_by_filters(params, session=self._session,
+				snapshot=True)
 		if tasks:
+			from wxgtd.gui.dlg_export_tasks import DlgExportTasks
 			DlgExportTasks(self.wnd, tasks).run(modal=True)
 
 	def _on_menu_file_exit(self, _evt):
@@ -545,24 +579,30 @@ class FrameMain(BaseFrame):
 		self._toggle_task_starred()
 
 	def _on_menu_search_task(self, _evt):
+		from wxgtd.gui.frame_search import FrameSeach
 		FrameSeach.run(self.wnd)
 
 	def _on_menu_notebook_open(self, _evt):  # pylint: disable=R0201
+		from wxgtd.gui.frame_notebooks import FrameNotebook
 		FrameNotebook.run()
 
 	def _on_menu_sett_tags(self, _evt):
+		from wxgtd.gui.dlg_tags import DlgTags
 		DlgTags(self.wnd).run(True)
 		self._filter_tree_ctrl.RefreshItems()
 
 	def _on_menu_sett_goals(self, _evt):
+		from wxgtd.gui.dlg_goals import DlgGoals
 		DlgGoals(self.wnd).run(True)
 		self._filter_tree_ctrl.RefreshItems()
 
 	def _on_menu_sett_folders(self, _evt):
+		from wxgtd.gui.dlg_folders import DlgFolders
 		DlgFolders(self.wnd).run(True)
 		self._filter_tree_ctrl.RefreshItems()
 
 	def _on_menu_sett_contexts(self, _evt):
+		from wxgtd.gui.dlg_contexts import DlgContexts
 		DlgContexts(self.wnd).run(True)
 		self._filter_tree_ctrl.RefreshItems()
 
@@ -635,9 +675,18 @@ class FrameMain(BaseFrame):
 			self._items_path.pop(-1)
 			self._refresh_list()
 
-	def _on_tasks_update(self, _args):
+	def _on_tasks_update(self, args):
+		self._update_reminders(args.data and args.data.get('task_uuid'))
 		self._refresh_list()
 
+	def _on_sync_finished(self, args):
+		changed = args.data['changed']
+		_LOG.debug("FrameMain._on_sync_finished: changed %d tasks", len(changed))
+		if changed:
+			self._update_reminders()
+			self._refresh_list()
+		publisher.sendMessage('dict.update')
+
 	def _on_frame_messsage(self, args):
 		if args.topic == ('gui', 'frame_main', 'raise'):
 			if self.wnd and self.wnd.IsEnabled():
@@ -677,31 +726,44 @@ class FrameMain(BaseFrame):
 					_("Alarms"))
 
 	def _on_search(self, _evt):
-		self._refresh_list()
+		self._start_search(0)
+
+	def _on_search_text(self, _evt):
+		self._start_search()
 
 	def _on_search_cancel(self, _evt):
 		if self._searchbox.GetValue():
 			self._searchbox.SetValue('')
-			self._refresh_list()
+			self._start_search(0)
 
 	def _on_timer(self, _evt, _force_show=False):
-		if self._appconfig.get('notification', 'popup_alarms'):
+		due = self._reminders.pop_due()
+		if due and self._appconfig.get('notification', 'popup_alarms'):
 			_LOG.debug('FrameMain._on_timer: check reminders')
 			FrameReminders.check(self.wnd, self._session)
+		self._schedule_reminders()
+
+	def _on_ipc_reminders(self, _task_uuids):
+		# called in listener thread
+		wx.CallAfter(FrameReminders.check, self.wnd, self._session)
 
 	def _on_window_iconze(self, evt):
 		if evt.Iconized() and self._appconfig.get('gui', 'min_to_tray'):
 			self.wnd.Show(False)
 
+	@profiler.profiled('refresh list')
 	def _refresh_list(self):
 		if not self._all_loaded:
 			return
+		# results of pending search are outdated
+		self._search_worker.cancel()
 		wx.SetCursor(wx.HOURGLASS_CURSOR)
 		self.wnd.Freeze()
 		params = self._get_params_for_list()
 		_LOG.debug("FrameMain._refresh_list; params=%r", params)
 		self._session.expire_all()  # pylint: disable=E1101
-		tasks = OBJ.Task.select_by_filters(params, session=self._session)
+		tasks = OBJ.Task.select_list_items_by_filters(params,
+				session=self._session)
 		active_only = params['finished'] is not None and not params['finished']
 		self._items_list_ctrl.fill(tasks, active_only=active_only)
 		showed = self._items_list_ctrl.GetItemCount()
@@ -711,15 +773,62 @@ class FrameMain(BaseFrame):
 		self.wnd.Thaw()
 		wx.SetCursor(wx.STANDARD_CURSOR)
 
-	def _autosync(self, on_load=True):
+	def _start_search(self, delay=search_worker.DEFAULT_DELAY):
+		""" Run query for task list in background; results are loaded
+		by pages in _show_search_page. """
+		if not self._all_loaded:
+			return
+		params = self._get_params_for_list()
+		active_only = params['finished'] is not None and not params['finished']
+
+		def page_cb(generation, uuids, first, last):
+			wx.CallAfter(self._show_search_page, generation, uuids, first, last,
+					active_only)
+
+		self._search_worker.submit(lambda session:
+				OBJ.Task.select_uuids_by_filters(params, session=session),
+				page_cb, delay)
+
+	@profiler.profiled('show search page')
+	def _show_search_page(self, generation, uuids, first, _last, active_only):
+		if not self._search_worker.is_current(generation):
+			return
+		if first:
+			self._session.expire_all()  # pylint: disable=E1101
+		tasks = OBJ.Task.select_list_items_by_uuids(uuids, self._session)
+		self._items_list_ctrl.fill(tasks, active_only=active_only,
+				append=not first)
+		showed = self._items_list_ctrl.GetItemCount()
+		self.wnd.SetStatusText(ngettext("%d item", "%d items", showed) % showed, 1)
+
+	def _update_reminders(self, task_uuid=None):
+		""" Update alarms of one task (or all tasks) and rearm timer. """
+		if task_uuid:
+			self._reminders.update_task(task_uuid, self._session)
+		else:
+			self._reminders.load(self._session)
+		self._schedule_reminders()
+
+	def _schedule_reminders(self):
+		""" Arm one-shot timer for the nearest alarm. """
+		self._reminders_timer.Stop()
+		seconds = self._reminders.seconds_to_next()
+		if seconds is not None:
+			_LOG.debug('FrameMain._schedule_reminders: next check in %.1fs',
+					seconds)
+			self._reminders_timer.Start(max(int(seconds * 1000), 500),
+					wx.TIMER_ONE_SHOT)
+
+	def _autosync(self, on_load=True, background=True):
 		if not self._appconfig.get('sync', 'use_dropbox'):
 			# don't sync if file is not configured
-			if not self._appconfig.get('files', 'last_sync_file'):
+			last_sync_file = self._appconfig.get('files', 'last_sync_file')
+			if not last_sync_file:
 				return
-		self._synchronize(on_load, autoclose=True)
-		if on_load:
-			publisher.sendMessage('task.update')
-			publisher.sendMessage('dict.update')
+			if not sync.is_sync_needed(last_sync_file, on_load):
+				_LOG.info('FrameMain._autosync: no changes')
+				return
+		self._synchronize(on_load, autoclose=True, background=background)
 
 	def _delete_selected_task(self, permanently=False):
 		tasks_uuid = list(self._items_list_ctrl.get_selected_items_uuid())
@@ -848,6 +957,7 @@ class FrameMain(BaseFrame):
 			return OBJ.Task.get(self._session, uuid=task_uuid)
 		return None
 
+	@profiler.profiled('refresh groups')
 	def _refresh_groups(self):
 		rb_show_selection = self['rb_show_selection']
 		for group, label in enumerate((_("All (%d)"), _("Hotlist (%d)"),
@@ -855,17 +965,23 @@ class FrameMain(BaseFrame):
 				_("Starred (%d)"), _("Basket (%d)"), _("Finished (%d)"),
 				_("Projects (%d)"), _("Checklists (%d)"),
 				_("Active Alarms (%d)"))):
-			cnt = OBJ.Task.select_by_filters(self._get_params_for_list(group,
-					True, True), session=self._session).count()
+			cnt = OBJ.Task.count_by_filters(self._get_params_for_list(group,
+					True, True), session=self._session)
 			rb_show_selection.SetItemLabel(group, label % cnt)
 
-	def _synchronize(self, on_load=True, autoclose=False):
+	def _synchronize(self, on_load=True, autoclose=False, background=True):
 		""" Synchronize data.
 
 		Attr:
 			on_load: if true only read data.
 			autoclose: close progress dialog after sync (if no errors)
+			background: run synchronisation in background thread; when
+				finished "sync.finished" message is send with uuids of changed
+				tasks.
 		"""
+		if self._sync_worker and self._sync_worker.is_alive():
+			_LOG.info("FrameMain._synchronize: sync already running")
+			return
 		use_dropbox = (self._appconfig.get('sync', 'use_dropbox') and
 				dbsync.is_available())
 		if not use_dropbox:
@@ -884,30 +1000,66 @@ class FrameMain(BaseFrame):
 					self._appconfig.set('files', 'last_sync_file', last_sync_file)
 			if not last_sync_file:
 				return
+		if use_dropbox:
+			sync_func, args = dbsync.sync, ()
+		else:
+			sync_func, args = sync.sync, (last_sync_file, )
 		dlg = DlgSyncProggress(self.wnd)
 		dlg.run()
-		try:
-			if use_dropbox:
-				dbsync.sync(load_only=on_load)
-			else:
-				sync.sync(last_sync_file, load_only=on_load)
-		except sync.SyncLockedError:
+		if not background:
+			error = None
+			try:
+				sync_func(*args, load_only=on_load)
+			except (sync.SyncLockedError, sync.OtherSyncError) as err:
+				error = err
+			self._sync_completed(dlg, autoclose, error)
+			return
+
+		def progress_cb(progress, msg):
+			wx.CallAfter(self._sync_progress, worker, dlg, progress, msg)
+
+		def finished_cb(_result, error, changed):
+			wx.CallAfter(self._sync_finished, worker, dlg, autoclose, error,
+					changed)
+
+		worker = self._sync_worker = SyncWorker(sync_func, args,
+				{'load_only': on_load}, progress_cb, finished_cb)
+		dlg.set_cancel_handler(worker.cancel)
+		worker.start()
+
+	def _sync_progress(self, worker, dlg, progress, msg):
+		# worker is detached when window is closed
+		if self._sync_worker is worker:
+			dlg.append(progress, msg)
+
+	def _sync_finished(self, worker, dlg, autoclose, error, changed):
+		if self._sync_worker is worker:
+			self._sync_completed(dlg, autoclose, error, changed)
+
+	def _sync_completed(self, dlg, autoclose, error, changed=None):
+		""" Show synchronisation result; called in gui thread. """
+		self._sync_worker = None
+		if isinstance(error, sync.SyncLockedError):
 			msgbox = wx.MessageDialog(dlg.wnd, _("Sync file is locked."),
 					_("wxGTD"), wx.OK | wx.ICON_HAND)
 			msgbox.ShowModal()
 			msgbox.Destroy()
-			dlg.update(100, _("Sync file is locked."))
+			dlg.append(100, _("Sync file is locked."))
+			autoclose = False
+		elif isinstance(error, sync.SyncCancelledError):
+			dlg.append(100, _("Synchronisation cancelled."))
 			autoclose = False
-		except sync.OtherSyncError as err:
-			_LOG.exception('FrameMain._on_menu_file_sync error: %r',
-					str(err))
+		elif error is not None:
+			_LOG.error('FrameMain._synchronize error: %r', str(error))
 			msgdlg = wx.lib.dialogs.ScrolledMessageDialog(self.wnd,
-					str(err), _("Synchronisation error"))
+					str(error), _("Synchronisation error"))
 			msgdlg.ShowModal()
 			msgdlg.Destroy()
-			dlg.update(100, _("Error: ") + str(err))
+			dlg.append(100, _("Error: ") + str(error))
 			autoclose = False
 		dlg.mark_finished(2 if autoclose else -1)
+		if changed is not None:
+			publisher.sendMessage('sync.finished', data={'changed': changed})
 
 
 class _TasksPopupMenu:
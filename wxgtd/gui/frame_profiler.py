@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+""" Debug window with sql queries statistics (see model.profiler).
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-23"
+
+import logging
+
+import wx
+
+from wxgtd.model import profiler
+
+_LOG = logging.getLogger(__name__)
+
+# auto refresh interval (ms)
+_REFRESH_INTERVAL = 2000
+
+
+class FrameProfiler(wx.Frame):
+	""" Window showing queries per operation; refreshed periodically.
+
+	Debug tool - not translated and created without xrc (like wx inspection
+	tool).
+	"""
+
+	def __init__(self, parent=None):
+		wx.Frame.__init__(self, parent, -1, "wxGTD - SQL profile",
+				size=(800, 400))
+		panel = wx.Panel(self, -1)
+		self._tc_summary = wx.TextCtrl(panel, -1, style=wx.TE_MULTILINE |
+				wx.TE_READONLY | wx.TE_DONTWRAP)
+		self._tc_summary.SetFont(wx.Font(9, wx.FONTFAMILY_TELETYPE,
+				wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL))
+		btn_refresh = wx.Button(panel, wx.ID_REFRESH)
+		btn_reset = wx.Button(panel, wx.ID_CLEAR, "Reset")
+		bsizer = wx.BoxSizer(wx.HORIZONTAL)
+		bsizer.Add(btn_refresh, 0, wx.ALL, 5)
+		bsizer.Add(btn_reset, 0, wx.ALL, 5)
+		sizer = wx.BoxSizer(wx.VERTICAL)
+		sizer.Add(self._tc_summary, 1, wx.EXPAND | wx.ALL, 5)
+		sizer.Add(bsizer, 0, wx.ALIGN_RIGHT)
+		panel.SetSizer(sizer)
+		self._timer = wx.Timer(self)
+		self.Bind(wx.EVT_TIMER, self._on_timer, self._timer)
+		self.Bind(wx.EVT_BUTTON, self._on_btn_refresh, btn_refresh)
+		self.Bind(wx.EVT_BUTTON, self._on_btn_reset, btn_reset)
+		self.Bind(wx.EVT_CLOSE, self._on_close)
+		self._timer.Start(_REFRESH_INTERVAL)
+		self.refresh()
+
+	def refresh(self):
+		summary = "\n".join(profiler.format_summary())
+		if summary != self._tc_summary.GetValue():
+			self._tc_summary.SetValue(summary)
+
+	def _on_timer(self, _evt):
+		if self.IsShown():
+			self.refresh()
+
+	def _on_btn_refresh(self, _evt):
+		self.refresh()
+
+	def _on_btn_reset(self, _evt):
+		profiler.reset()
+		self.refresh()
+
+	def _on_close(self, evt):
+		self._timer.Stop()
+		evt.Skip()
@@ -110,12 +110,7 @@ class FrameReminders(BaseFrame):
 		self.wnd.Close(True)
 
 	def _on_task_btn_dismiss(self, evt):
-		task_uuid = evt.task
-		task = OBJ.Task.get(self._session, uuid=task_uuid)
-		task.alarm = None
-		task.update_modify_time()
-		self._session.commit()
-		publisher.sendMessage('task.update', data={'task_uuid': task.uuid})
+		task_logic.dismiss_task_alarm(evt.task, self._session)
 
 	def _on_task_btn_snooze(self, evt):
 		task_uuid = evt.task
@@ -125,11 +120,7 @@ class FrameReminders(BaseFrame):
 				wx.CHOICEDLG_STYLE)
 		if dlg.ShowModal() == wx.ID_OK:
 			pattern = enums.SNOOZE_PATTERNS[dlg.GetSelection()][0]
-			task = OBJ.Task.get(self._session, uuid=task_uuid)
-			task.alarm = datetime.utcnow() + task_logic.alarm_pattern_to_time(pattern)
-			task.update_modify_time()
-			self._session.commit()
-			publisher.sendMessage('task.update', data={'task_uuid': task.uuid})
+			task_logic.snooze_task_alarm(task_uuid, pattern, self._session)
 		dlg.Destroy()
 
 	def _remove_task(self, task_uuid):
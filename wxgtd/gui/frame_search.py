@@ -9,7 +9,7 @@ Licence: GPLv2+
 
 __author__ = "Karol Będkowski"
 __copyright__ = "Copyright (c) Karol Będkowski, 2013"
-__version__ = "2013-05-23"
+__version__ = "2013-07-27"
 
 import gettext
 import logging
@@ -17,6 +17,7 @@ import logging
 import wx
 
 from wxgtd.model import objects as OBJ
+from wxgtd.model import search_worker
 from wxgtd.gui._base_frame import BaseFrame
 from wxgtd.gui import _tasklistctrl as TLC
 from wxgtd.gui.task_controller import TaskController
@@ -48,10 +49,12 @@ class FrameSeach(BaseFrame):
 			cls._instance.wnd.Show()
 
 	def _setup(self):
+		self._session = OBJ.Session()
+		self._search_worker = search_worker.SearchWorker()
+		self._search_worker.start()
 		self._searchbox.SetDescriptiveText(_('Search'))
 		self._searchbox.ShowCancelButton(True)
 		self._searchbox.ShowSearchButton(True)
-		self._session = OBJ.Session()
 
 	def _load_controls(self):
 		# pylint: disable=W0201
@@ -65,7 +68,7 @@ class FrameSeach(BaseFrame):
 
 	def _create_bindings(self, wnd):
 		BaseFrame._create_bindings(self, wnd)
-		#self.wnd.Bind(wx.EVT_TEXT, self._on_search, self._searchbox)
+		self.wnd.Bind(wx.EVT_TEXT, self._on_search_text, self._searchbox)
 		self.wnd.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self._on_search,
 				self._searchbox)
 		self.wnd.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self._on_search_cancel,
@@ -79,32 +82,52 @@ class FrameSeach(BaseFrame):
 
 	def _on_close(self, event):
 		FrameSeach._instance = None
+		self._search_worker.stop()
 		self._session.close()
 		BaseFrame._on_close(self, event)
 
 	def _on_search(self, _evt):
+		self._refresh_list(0)
+
+	def _on_search_text(self, _evt):
 		self._refresh_list()
 
 	def _on_search_cancel(self, _evt):
 		if self._searchbox.GetValue():
 			self._searchbox.SetValue('')
-		self._refresh_list()
+		self._refresh_list(0)
 
 	def _on_items_list_activated(self, evt):
 		task_uuid, _task_type = self._items_list_ctrl.items[evt.GetData()]
 		if task_uuid:
 			TaskController.open_task(self.wnd, task_uuid)
 
-	def _refresh_list(self):
-		wx.SetCursor(wx.HOURGLASS_CURSOR)
-		self.wnd.Freeze()
+	def _refresh_list(self, delay=search_worker.DEFAULT_DELAY):
+		""" Start search in background; results are loaded by pages in
+		_show_page. """
 		text = self._searchbox.GetValue()
-		tasks = []
 		active_only = not self['cb_search_finished'].GetValue()
-		if text:
-			tasks = OBJ.Task.search(text, active_only, self._session)
-		self._items_list_ctrl.fill(tasks, active_only=active_only)
+		if not text:
+			self._search_worker.cancel()
+			self._show_page(None, [], True, True, active_only)
+			return
+
+		def page_cb(generation, uuids, first, last):
+			wx.CallAfter(self._show_page, generation, uuids, first, last,
+					active_only)
+
+		self._search_worker.submit(lambda session: OBJ.Task.search(text,
+				active_only, session).with_entities(OBJ.Task.uuid),
+				page_cb, delay)
+
+	def _show_page(self, generation, uuids, first, _last, active_only):
+		if generation is not None and \
+				not self._search_worker.is_current(generation):
+			return
+		if first:
+			self._session.expire_all()  # pylint: disable=E1101
+		tasks = OBJ.Task.select_list_items_by_uuids(uuids, self._session)
+		self._items_list_ctrl.fill(tasks, active_only=active_only,
+				append=not first)
 		showed = self._items_list_ctrl.GetItemCount()
 		self.wnd.SetStatusText(ngettext("%d item", "%d items", showed) % showed, 1)
-		self.wnd.Thaw()
-		wx.SetCursor(wx.STANDARD_CURSOR)
@@ -18,6 +18,7 @@ __version__ = "2011-04-24"
 import sys
 import os
 import imp
+import ast
 import logging
 import ConfigParser
 import base64
@@ -28,10 +29,16 @@ from wxgtd.lib.singleton import Singleton
 
 _LOG = logging.getLogger(__name__)
 
+# marker for options that not exists or have invalid value
+_MISSING = object()
+
 
 class AppConfig(Singleton):
 	""" Object holding, loading and saving configuration.
 
+	Values are parsed once (when configuration is loaded or on first access
+	after `set`) and kept in cache.
+
 	Args:
 		filename: path for configuration file
 		app_name: name of applicaiton
@@ -51,6 +58,9 @@ class AppConfig(Singleton):
 		self.data_dir = self._get_data_dir()
 		self._filename = os.path.join(self.config_path, filename)
 		self._config = ConfigParser.SafeConfigParser()
+		# (section, key) -> parsed value
+		self._values = {}
+		self._listeners = []
 		self.clear()
 		_LOG.debug('AppConfig.__init__: frozen=%(main_is_frozen)r, '
 				'main_dir=%(main_dir)s, config=%(_filename)s, '
@@ -93,11 +103,20 @@ class AppConfig(Singleton):
 		"""
 		return os.path.join(self._user_home, '.local', 'share', self.app_name)
 
+	@property
+	def user_cache_dir(self):
+		""" Get path to app cache directory.
+
+		Default: ~/.cache/<app_name>/
+		"""
+		return os.path.join(self._user_home, '.cache', self.app_name)
+
 	def clear(self):
 		""" Clear all data in object. """
 		self.last_open_files = []
 		for section in self._config.sections():
 			self._config.remove_section(section)
+		self._values.clear()
 		self._runtime_params = {}
 
 	def load(self):
@@ -123,6 +142,7 @@ class AppConfig(Singleton):
 		except StandardError:
 			_LOG.exception('AppConfig.load_configuration_file error')
 			return False
+		self._parse_all()
 		_LOG.debug('AppConfig.load_configuration_file finished')
 		return True
 
@@ -170,13 +190,16 @@ class AppConfig(Singleton):
 			key: key name (string)
 			default: optional default value (default=None)
 		"""
-		if (self._config.has_section(section)
-				and self._config.has_option(section, key)):
-			try:
-				return eval(self._config.get(section, key))
-			except:  # catch all errors; pylint: disable=W0702
-				_LOG.exception('AppConfig.get(%s, %s, %r)', section, key, default)
-		return default
+		try:
+			value = self._values[(section, key)]
+		except KeyError:
+			value = self._values[(section, key)] = self._parse(section, key)
+		if value is _MISSING:
+			return default
+		if isinstance(value, (list, dict)):
+			# protect cached value against modifications
+			return type(value)(value)
+		return value
 
 	def get_items(self, section):
 		""" Get all key-value pairs in given config section.
@@ -188,13 +211,13 @@ class AppConfig(Singleton):
 			List of (key, value) or None if section not found.
 		"""
 		if self._config.has_section(section):
-			try:
-				items = self._config.items(section)
-				if items:
-					result = list((key, eval(val)) for key, val in items)
-				return result
-			except:  # catch all errors; pylint: disable=W0702
-				_LOG.exception('AppConfig.get(%s)', section)
+			result = []
+			for key in self._config.options(section):
+				value = self.get(section, key, _MISSING)
+				if value is _MISSING:
+					return None
+				result.append((key, value))
+			return result
 		return None
 
 	def get_secure(self, section, key, default=None):
@@ -225,7 +248,12 @@ class AppConfig(Singleton):
 		"""
 		if not self._config.has_section(section):
 			self._config.add_section(section)
+		old_val = self.get(section, key, _MISSING)
 		self._config.set(section, key, repr(val))
+		# parsed again on next get
+		self._values.pop((section, key), None)
+		if old_val != val:
+			self._notify(section, key, val)
 
 	def set_items(self, section, key, items):
 		""" Store values in configuration.
@@ -244,6 +272,10 @@ class AppConfig(Singleton):
 		config.add_section(section)
 		for idx, item in enumerate(items):
 			config.set(section, '%s%05d' % (key, idx), repr(item))
+		for skey in self._values.keys():
+			if skey[0] == section:
+				del self._values[skey]
+		self._notify(section, key, items)
 
 	def set_secure(self, section, key, val):
 		""" Store "secure" value in configuration.
@@ -254,6 +286,54 @@ class AppConfig(Singleton):
 		"""
 		self.set(section, key, base64.encodestring(val))
 
+	def add_listener(self, callback):
+		""" Register function called after change of configuration value.
+
+		Args:
+			callback: function(section, key, new value)
+		"""
+		if callback not in self._listeners:
+			self._listeners.append(callback)
+
+	def remove_listener(self, callback):
+		""" Unregister function registered by `add_listener`. """
+		if callback in self._listeners:
+			self._listeners.remove(callback)
+
+	def _notify(self, section, key, value):
+		for callback in self._listeners[:]:
+			try:
+				callback(section, key, value)
+			except:  # catch all errors; pylint: disable=W0702
+				_LOG.exception('AppConfig._notify(%s, %s) error in %r', section,
+						key, callback)
+
+	def _parse(self, section, key, quiet=False):
+		""" Parse value of option; return _MISSING when option not exists or
+		value is invalid. """
+		config = self._config
+		if not (config.has_section(section) and config.has_option(section, key)):
+			return _MISSING
+		try:
+			return ast.literal_eval(config.get(section, key))
+		except:  # catch all errors; pylint: disable=W0702
+			if not quiet:
+				_LOG.exception('AppConfig.get(%s, %s)', section, key)
+		return _MISSING
+
+	def _parse_all(self):
+		""" Parse all options and fill cache.
+
+		Invalid values are not cached; error is logged on access.
+		"""
+		self._values.clear()
+		values = self._values
+		for section in self._config.sections():
+			for key in self._config.options(section):
+				value = self._parse(section, key, True)
+				if value is not _MISSING:
+					values[(section, key)] = value
+
 	def _get_main_dir(self):
 		""" Find main application directory. """
 		if self.main_is_frozen:
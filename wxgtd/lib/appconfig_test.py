@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for appconfig module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-21"
+
+import os
+import tempfile
+from unittest import main, TestCase
+
+from . import appconfig
+
+
+class _TestConfig(appconfig.AppConfig):
+	""" Separate singleton instance. """
+	pass
+
+
+class TestAppConfig(TestCase):
+	""" Test AppConfig get/set. """
+
+	def setUp(self):
+		self.config = _TestConfig('test.cfg', 'wxgtd-test')
+		self.config.clear()
+		fd, self.filename = tempfile.mkstemp()
+		os.write(fd, "[main]\nnum = 5\nflag = True\nname = 'abc'\n"
+				"lst = [1, 2]\ninvalid = __import__('os')\n")
+		os.close(fd)
+		self.config.load_configuration_file(self.filename)
+
+	def tearDown(self):
+		os.unlink(self.filename)
+
+	def test_get(self):
+		config = self.config
+		self.assertEqual(config.get('main', 'num'), 5)
+		self.assertTrue(config.get('main', 'flag') is True)
+		self.assertEqual(config.get('main', 'name'), 'abc')
+		self.assertEqual(config.get('main', 'missing', 1), 1)
+		self.assertEqual(config.get('other', 'missing', 2), 2)
+		# no eval
+		self.assertEqual(config.get('main', 'invalid', 3), 3)
+		# cached list is not modified by caller
+		config.get('main', 'lst').append(3)
+		self.assertEqual(config.get('main', 'lst'), [1, 2])
+
+	def test_set(self):
+		config = self.config
+		changes = []
+		listener = lambda *args: changes.append(args)
+		config.add_listener(listener)
+		config.set('main', 'num', 6)
+		config.set('main', 'num', 6)
+		config.set('new', 'val', (1, 'a'))
+		config.remove_listener(listener)
+		config.set('main', 'num', 7)
+		self.assertEqual(config.get('main', 'num'), 7)
+		self.assertEqual(config.get('new', 'val'), (1, 'a'))
+		self.assertEqual(changes, [('main', 'num', 6), ('new', 'val', (1, 'a'))])
+
+
+if __name__ == '__main__':
+	main()
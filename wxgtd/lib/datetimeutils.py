@@ -25,10 +25,52 @@ from dateutil import tz
 TZ_UTC = tz.tzutc()
 TZ_LOCAL = tz.tzlocal()
 
+# utc date -> offset of local timezone in this day or None when offset
+# changes in this day (DST transition)
+_UTC_OFFSETS = {}
+_UTC_OFFSETS_LIMIT = 10000
+_DAY_END = datetime.timedelta(hours=23, minutes=59, seconds=59)
+
+
+def get_local_offset(date_time):
+	""" Get offset of local timezone for naive UTC datetime.
+
+	Offsets are cached per day; only days with DST transition are converted
+	by dateutil each time.
+	"""
+	day = date_time.date()
+	try:
+		offset = _UTC_OFFSETS[day]
+	except KeyError:
+		if len(_UTC_OFFSETS) >= _UTC_OFFSETS_LIMIT:
+			_UTC_OFFSETS.clear()
+		start = datetime.datetime.combine(day, datetime.time())
+		offset = _utcoffset(start)
+		if _utcoffset(start + _DAY_END) != offset:
+			offset = None
+		_UTC_OFFSETS[day] = offset
+	if offset is None:
+		return _utcoffset(date_time)
+	return offset
+
+
+def _utcoffset(date_time):
+	return date_time.replace(tzinfo=TZ_UTC).astimezone(TZ_LOCAL).utcoffset()
+
 
 def datetime_utc2local(date_time):
 	""" Convert datetime object from UTC to local timezone. """
-	return date_time.replace(tzinfo=TZ_UTC).astimezone(TZ_LOCAL)
+	return (date_time + get_local_offset(date_time)).replace(tzinfo=TZ_LOCAL)
+
+
+def datetime_utc2local_naive(date_time):
+	""" Convert naive datetime object from UTC to naive local datetime. """
+	return date_time + get_local_offset(date_time)
+
+
+def clear_cache():
+	""" Clear cached offsets (i.e. after change of timezone). """
+	_UTC_OFFSETS.clear()
 
 
 def datetime_local2utc(date_time):
@@ -21,9 +21,20 @@ from wxgtd.lib import datetimeutils as DTU
 _LOG = logging.getLogger(__name__)
 
 
+# (timestamp, show_time, datetime_in_utc) -> formatted datetime
+_FORMATTED = {}
+_FORMATTED_LIMIT = 20000
+# local date -> date formatted with %x
+_DATES = {}
+# locale use "HH:MM:SS" as %X; checked on first use (after locale setup)
+_TIME_24H = None
+
+
 def format_timestamp(timestamp, show_time=True, datetime_in_utc=True):
 	""" Format date time object.
 
+	Datetime objects are formatted once; results are cached.
+
 	Args:
 		timestamp: date/time as str/unicode, datetime or number.
 		show_time: if true also show time.
@@ -33,11 +44,45 @@ def format_timestamp(timestamp, show_time=True, datetime_in_utc=True):
 	if isinstance(timestamp, (str, unicode)):
 		return timestamp
 	if isinstance(timestamp, datetime.datetime):
-		if datetime_in_utc:
-			timestamp = DTU.datetime_utc2local(timestamp)
-		if show_time:
-			return timestamp.strftime("%x %X")
-		return timestamp.strftime("%x")
+		if timestamp.tzinfo is not None:
+			# naive and aware datetimes can't be compared (cache keys)
+			return _format_datetime(timestamp, show_time, datetime_in_utc)
+		key = (timestamp, bool(show_time), datetime_in_utc)
+		value = _FORMATTED.get(key)
+		if value is None:
+			if len(_FORMATTED) >= _FORMATTED_LIMIT:
+				_FORMATTED.clear()
+			value = _FORMATTED[key] = _format_datetime(timestamp, show_time,
+					datetime_in_utc)
+		return value
 	if show_time:
 		return time.strftime("%x %X", time.localtime(timestamp))
 	return time.strftime("%x", time.localtime(timestamp))
+
+
+def _format_datetime(timestamp, show_time, datetime_in_utc):
+	global _TIME_24H  # pylint: disable=W0603
+	if datetime_in_utc:
+		timestamp = DTU.datetime_utc2local_naive(timestamp)
+	day = timestamp.date()
+	value = _DATES.get(day)
+	if value is None:
+		if len(_DATES) >= _FORMATTED_LIMIT:
+			_DATES.clear()
+		value = _DATES[day] = day.strftime("%x")
+	if not show_time:
+		return value
+	if _TIME_24H is None:
+		_TIME_24H = datetime.time(13, 4, 5).strftime("%X") == "13:04:05"
+	if _TIME_24H:
+		return "%s %02d:%02d:%02d" % (value, timestamp.hour, timestamp.minute,
+				timestamp.second)
+	return value + " " + timestamp.strftime("%X")
+
+
+def clear_cache():
+	""" Clear cached values (i.e. after change of locale). """
+	global _TIME_24H  # pylint: disable=W0603
+	_FORMATTED.clear()
+	_DATES.clear()
+	_TIME_24H = None
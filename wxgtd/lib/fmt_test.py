@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for fmt and datetimeutils modules.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-24"
+
+import random
+import datetime
+from unittest import main, TestCase
+
+from . import fmt
+from . import datetimeutils as DTU
+
+
+def _to_local(timestamp):
+	""" Conversion by dateutil. """
+	return timestamp.replace(tzinfo=DTU.TZ_UTC).astimezone(DTU.TZ_LOCAL)
+
+
+class TestFormatTimestamp(TestCase):
+	""" Cached conversion and formatting give the same results as dateutil
+	and strftime. """
+
+	def setUp(self):
+		fmt.clear_cache()
+		DTU.clear_cache()
+		rand = random.Random(0)
+		start = datetime.datetime(2000, 1, 1)
+		self.dates = [start + datetime.timedelta(seconds=rand.randint(0,
+				10 ** 9), microseconds=rand.randint(0, 10 ** 6))
+				for _idx in xrange(2000)]
+
+	def test_utc2local(self):
+		for date in self.dates:
+			local = _to_local(date)
+			self.assertEqual(DTU.datetime_utc2local_naive(date),
+					local.replace(tzinfo=None))
+			self.assertEqual(DTU.datetime_utc2local(date), local)
+
+	def test_format(self):
+		for _run in xrange(2):  # second run from cache
+			for date in self.dates:
+				local = _to_local(date)
+				self.assertEqual(fmt.format_timestamp(date, True),
+						local.strftime("%x %X"))
+				self.assertEqual(fmt.format_timestamp(date, 0),
+						local.strftime("%x"))
+				self.assertEqual(fmt.format_timestamp(date, True, False),
+						date.strftime("%x %X"))
+
+	def test_format_other(self):
+		self.assertEqual(fmt.format_timestamp(None), "")
+		self.assertEqual(fmt.format_timestamp("abc"), "abc")
+		date = _to_local(self.dates[0])
+		self.assertEqual(fmt.format_timestamp(date, True, False),
+				date.strftime("%x %X"))
+
+
+if __name__ == '__main__':
+	main()
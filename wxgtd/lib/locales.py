@@ -18,6 +18,8 @@ import locale
 import logging
 import gettext
 
+from wxgtd.lib import fmt
+
 
 _LOG = logging.getLogger(__name__)
 
@@ -34,6 +36,8 @@ def setup_locale(app_config):
 		pass
 	default_locale = locale.getdefaultlocale()
 	locale.setlocale(locale.LC_ALL, '')
+	# formatted dates depend on locale
+	fmt.clear_cache()
 	os.environ['LC_ALL'] = os.environ.get('LC_ALL') or default_locale[0]
 	gettext.install(package_name, localedir=locales_dir, unicode=True,
 			names=("ngettext", ))
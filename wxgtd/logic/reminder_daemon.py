@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+""" Headless reminders - daemon and notification sinks.
+
+Daemon sleeps until nearest alarm (see reminders.ReminderScheduler) and send
+due reminders to sink. Snooze and dismiss commands are read from input stream
+(one command per line):
+
+	snooze <task uuid> [<pattern>]
+	dismiss <task uuid>
+	reload
+	quit
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import sys
+import json
+import time
+import errno
+import select
+import socket
+import logging
+import gettext
+import threading
+import subprocess
+
+from wxgtd.lib import fmt
+from wxgtd.model import objects as OBJ
+from wxgtd.logic import task as task_logic
+from wxgtd.logic import reminders
+
+_LOG = logging.getLogger(__name__)
+_ = gettext.gettext
+
+DEFAULT_SNOOZE = '5 minutes'
+# max seconds between checks for changes in database
+CHECK_INTERVAL = 10
+
+
+class NotificationSink(object):
+	""" Base class for reminders outputs. """
+
+	def notify(self, tasks):
+		""" Show reminders for `tasks`. """
+		raise NotImplementedError()
+
+	def close(self):
+		pass
+
+
+class StdoutSink(NotificationSink):
+	""" Print one line per reminder: alarm, task uuid, title. """
+
+	def __init__(self, output=sys.stdout):
+		self._output = output
+
+	def notify(self, tasks):
+		for task in tasks:
+			self._output.write("%s\t%s\t%s\n" % (fmt.format_timestamp(
+					task.alarm), task.uuid, task.title))
+		self._output.flush()
+
+
+class CommandSink(NotificationSink):
+	""" Run external command (i.e. notify-send) for each reminder.
+
+	Args:
+		command: command and arguments; summary and body are appended
+	"""
+
+	def __init__(self, command=('notify-send', '--app-name=wxGTD')):
+		self._command = list(command)
+
+	def notify(self, tasks):
+		for task in tasks:
+			body = fmt.format_timestamp(task.alarm)
+			if task.note:
+				body += "\n" + task.note
+			cmd = self._command + [task.title.encode('utf-8'),
+					body.encode('utf-8')]
+			try:
+				subprocess.call(cmd)
+			except OSError as err:
+				_LOG.error('CommandSink: run %r error: %s', cmd, err)
+
+
+class IpcSink(NotificationSink):
+	""" Send reminders to running GUI (see IpcListener).
+
+	Args:
+		path: path to unix socket
+		fallback: sink used when GUI is not running
+	"""
+
+	def __init__(self, path, fallback=None):
+		self._path = path
+		self._fallback = fallback
+
+	def notify(self, tasks):
+		data = json.dumps({'reminders': [task.uuid for task in tasks]})
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			sock.connect(self._path)
+			sock.sendall(data + "\n")
+		except socket.error as err:
+			_LOG.info('IpcSink: gui not available: %s', err)
+			if self._fallback:
+				self._fallback.notify(tasks)
+		finally:
+			sock.close()
+
+
+class IpcListener(threading.Thread):
+	""" Receive reminders from IpcSink and pass list of task uuids to
+	`callback` (called in listener thread).
+
+	Args:
+		path: path to unix socket
+		callback: function(list of task uuids)
+	"""
+
+	def __init__(self, path, callback):
+		threading.Thread.__init__(self, name='IpcListener')
+		self.daemon = True
+		self._path = path
+		self._callback = callback
+		if os.path.exists(path):
+			os.unlink(path)
+		self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._sock.bind(path)
+		self._sock.listen(5)
+
+	def run(self):
+		while self._sock:
+			try:
+				conn = self._sock.accept()[0]
+			except socket.error:
+				break
+			try:
+				data = json.loads(conn.makefile().readline())
+				self._callback(data.get('reminders') or [])
+			except (ValueError, socket.error) as err:
+				_LOG.warn('IpcListener: invalid message: %s', err)
+			finally:
+				conn.close()
+
+	def close(self):
+		sock, self._sock = self._sock, None
+		if sock:
+			sock.shutdown(socket.SHUT_RDWR)
+			sock.close()
+		if os.path.exists(self._path):
+			os.unlink(self._path)
+
+
+def is_ipc_available():
+	return hasattr(socket, 'AF_UNIX')
+
+
+def get_ipc_path(config):
+	""" Get path to socket used to send reminders to gui. """
+	return os.path.join(config.config_path, 'reminders.sock')
+
+
+def create_sink(name, config):
+	""" Create sink by name: stdout, notify, gui. """
+	if name == 'notify':
+		return CommandSink()
+	if name == 'gui':
+		if not is_ipc_available():
+			raise ValueError(_("GUI notification is not available"))
+		return IpcSink(get_ipc_path(config), StdoutSink())
+	if name == 'stdout':
+		return StdoutSink()
+	raise ValueError(_("Unknown notification output: %s") % name)
+
+
+class ReminderDaemon(object):
+	""" Wait for alarms and notify sink.
+
+	Alarms are loaded once and reloaded when tasks in database are changed
+	(checked on each wakeup, at least every CHECK_INTERVAL), at least every
+	MAX_WAIT, or on `reload` command; between checks daemon is blocked in
+	select (or sleep when commands are not available).
+
+	Args:
+		sink: NotificationSink
+		commands: optional file with commands (i.e. sys.stdin)
+		session: optional SqlAlchemy session
+	"""
+
+	def __init__(self, sink, commands=None, session=None):
+		self._sink = sink
+		self._commands = commands
+		self._buffer = ''
+		self._session = session or OBJ.Session()
+		self._scheduler = reminders.ReminderScheduler()
+		# task uuid -> notified alarm
+		self._notified = {}
+		self._running = False
+		self._last_reload = 0
+
+	def run(self):
+		self._running = True
+		self.reload()
+		while self._running:
+			# catch changes from gui, sync and other instances
+			if (time.time() - self._last_reload >= reminders.MAX_WAIT
+					or self._scheduler.is_outdated(self._session)):
+				self.reload()
+			self.notify_due()
+			if not self._running:
+				break
+			timeout = self._scheduler.seconds_to_next()
+			if timeout is None or timeout > CHECK_INTERVAL:
+				# alarms added by gui or sync can be earlier than next one
+				timeout = CHECK_INTERVAL
+			line = self._wait(timeout)
+			if line is not None:
+				self.execute(line)
+		self._sink.close()
+
+	def stop(self):
+		self._running = False
+
+	def reload(self):
+		""" Load alarms from database; skip already notified. """
+		self._last_reload = time.time()
+		self._session.expire_all()
+		self._scheduler.load(self._session)
+		for task_uuid, alarm in self._notified.items():
+			if self._scheduler.get_alarm(task_uuid) == alarm:
+				self._scheduler.remove_task(task_uuid)
+			else:
+				del self._notified[task_uuid]
+
+	def notify_due(self):
+		""" Send due reminders to sink. """
+		due = self._scheduler.pop_due()
+		if not due:
+			return []
+		tasks = OBJ.Task.select_reminders(None, self._session).filter(
+				OBJ.Task.uuid.in_(due)).all()
+		for task in tasks:
+			self._notified[task.uuid] = task.alarm
+		if tasks:
+			self._sink.notify(tasks)
+		return tasks
+
+	def execute(self, line):
+		""" Execute one command. """
+		args = line.split(None, 2)
+		if not args:
+			return
+		cmd = args[0].lower()
+		if cmd == 'quit':
+			self.stop()
+		elif cmd == 'reload':
+			self.reload()
+		elif cmd == 'snooze' and len(args) > 1:
+			self.snooze(args[1], args[2] if len(args) > 2 else DEFAULT_SNOOZE)
+		elif cmd == 'dismiss' and len(args) > 1:
+			self.dismiss(args[1])
+		else:
+			_LOG.warn('ReminderDaemon: invalid command %r', line)
+
+	def snooze(self, task_uuid, pattern=DEFAULT_SNOOZE):
+		alarm = task_logic.snooze_task_alarm(task_uuid, pattern, self._session)
+		if alarm is None:
+			_LOG.warn('ReminderDaemon: snooze %r %r failed', task_uuid, pattern)
+			return
+		self._notified.pop(task_uuid, None)
+		self._scheduler.set_alarm(task_uuid, alarm)
+
+	def dismiss(self, task_uuid):
+		task_logic.dismiss_task_alarm(task_uuid, self._session)
+		self._notified.pop(task_uuid, None)
+		self._scheduler.remove_task(task_uuid)
+
+	def _wait(self, timeout):
+		""" Wait `timeout` seconds for command.
+
+		Returns:
+			command line or None on timeout.
+		"""
+		if '\n' in self._buffer:
+			line, self._buffer = self._buffer.split('\n', 1)
+			return line.strip()
+		if self._commands is None:
+			time.sleep(timeout)
+			return None
+		fileno = self._commands.fileno()
+		try:
+			ready = select.select([fileno], [], [], timeout)[0]
+		except select.error as err:
+			if err.args[0] == errno.EINTR:
+				return None
+			# i.e. select on file on windows
+			_LOG.warn('ReminderDaemon: commands not available: %s', err)
+			self._commands = None
+			return None
+		if not ready:
+			return None
+		data = os.read(fileno, 4096)
+		if not data:
+			# end of input; only wait for alarms
+			self._commands = None
+			data = '\n'
+		self._buffer += data
+		return self._wait(0)
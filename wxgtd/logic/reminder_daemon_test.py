@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for reminder_daemon module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import main, TestCase
+from datetime import datetime, timedelta
+
+from wxgtd.model import db
+from wxgtd.model import objects as OBJ
+from . import reminder_daemon
+
+
+class _ListSink(reminder_daemon.NotificationSink):
+	def __init__(self):
+		self.notified = []
+
+	def notify(self, tasks):
+		self.notified.extend(task.uuid for task in tasks)
+
+
+class TestReminderDaemon(TestCase):
+	""" Test ReminderDaemon. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		session = OBJ.Session()
+		now = datetime.utcnow()
+		task_due = OBJ.Task(title='due', alarm=now - timedelta(minutes=1))
+		task_soon = OBJ.Task(title='soon', alarm=now + timedelta(seconds=0.5))
+		task_future = OBJ.Task(title='future', alarm=now + timedelta(hours=2))
+		session.add_all([task_due, task_soon, task_future])
+		session.commit()
+		self.due, self.soon, self.future = (task_due.uuid, task_soon.uuid,
+				task_future.uuid)
+		session.close()
+		self.sink = _ListSink()
+
+	def tearDown(self):
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def test_notify(self):
+		rfd, wfd = os.pipe()
+		commands = os.fdopen(rfd)
+		daemon = reminder_daemon.ReminderDaemon(self.sink, commands)
+		thread = threading.Thread(target=daemon.run)
+		thread.start()
+		timer = threading.Timer(1.5, os.write, (wfd, 'quit\n'))
+		timer.start()
+		thread.join(5)
+		self.assertFalse(thread.is_alive())
+		self.assertEqual(self.sink.notified, [self.due,
+				self.soon])
+		os.close(wfd)
+		commands.close()
+
+	def test_reload_on_change(self):
+		""" Alarms changed in database are loaded even when daemon never
+		wait MAX_WAIT (there is always alarm in next hour). """
+		session = OBJ.Session()
+		session.add(OBJ.Task(title='pending',
+				alarm=datetime.utcnow() + timedelta(minutes=30)))
+		session.commit()
+		session.close()
+
+		def change_alarm():
+			session = OBJ.Session()
+			task = OBJ.Task.get(session, uuid=self.future)
+			task.alarm = datetime.utcnow() + timedelta(seconds=0.5)
+			task.update_modify_time()
+			session.commit()
+			session.close()
+
+		rfd, wfd = os.pipe()
+		commands = os.fdopen(rfd)
+		daemon = reminder_daemon.ReminderDaemon(self.sink, commands)
+		thread = threading.Thread(target=daemon.run)
+		thread.start()
+		# changed before wakeup for "soon" alarm
+		threading.Timer(0.2, change_alarm).start()
+		timer = threading.Timer(2, os.write, (wfd, 'quit\n'))
+		timer.start()
+		thread.join(5)
+		self.assertFalse(thread.is_alive())
+		self.assertEqual(self.sink.notified, [self.due, self.soon,
+				self.future])
+		os.close(wfd)
+		commands.close()
+
+	def test_reload_far_alarm(self):
+		""" Changes are checked every CHECK_INTERVAL also when next alarm is
+		later than MAX_WAIT. """
+
+		def change_alarm():
+			session = OBJ.Session()
+			task = OBJ.Task.get(session, uuid=self.future)
+			task.alarm = datetime.utcnow() + timedelta(seconds=0.3)
+			task.update_modify_time()
+			session.commit()
+			session.close()
+
+		check_interval = reminder_daemon.CHECK_INTERVAL
+		reminder_daemon.CHECK_INTERVAL = 0.2
+		rfd, wfd = os.pipe()
+		commands = os.fdopen(rfd)
+		try:
+			daemon = reminder_daemon.ReminderDaemon(self.sink, commands)
+			thread = threading.Thread(target=daemon.run)
+			thread.start()
+			# changed after "soon" alarm; next alarm is in 2 hours
+			threading.Timer(1, change_alarm).start()
+			timer = threading.Timer(2.5, os.write, (wfd, 'quit\n'))
+			timer.start()
+			thread.join(5)
+		finally:
+			reminder_daemon.CHECK_INTERVAL = check_interval
+		self.assertFalse(thread.is_alive())
+		self.assertEqual(self.sink.notified, [self.due, self.soon,
+				self.future])
+		os.close(wfd)
+		commands.close()
+
+	def test_snooze_dismiss(self):
+		daemon = reminder_daemon.ReminderDaemon(self.sink)
+		daemon.reload()
+		self.assertEqual(len(daemon.notify_due()), 1)
+		daemon.execute('snooze %s 1 hour' % self.due)
+		daemon.execute('dismiss %s' % self.future)
+		session = OBJ.Session()
+		task = OBJ.Task.get(session, uuid=self.due)
+		self.assertGreater(task.alarm, datetime.utcnow() + timedelta(minutes=55))
+		self.assertIsNone(OBJ.Task.get(session, uuid=self.future).alarm)
+		# already notified tasks are not notified after reload
+		daemon.reload()
+		self.assertEqual(daemon.notify_due(), [])
+		self.assertEqual(len(daemon._scheduler), 2)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+""" Scheduling task reminders.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import heapq
+import logging
+import datetime
+
+from sqlalchemy import func
+
+from wxgtd.model import objects as OBJ
+
+_LOG = logging.getLogger(__name__)
+
+# maximal time to wait for next alarm (seconds); protect against changes of
+# system clock and suspend
+MAX_WAIT = 3600
+
+
+class ReminderScheduler(object):
+	""" Keep upcoming alarms (utc) of active tasks in min-heap.
+
+	Heap is filled once by `load` and then updated by `update_task` /
+	`remove_task`; outdated heap entries are skipped lazily. `is_outdated`
+	cheaply checks if tasks were changed in database after `load`.
+	"""
+
+	def __init__(self):
+		self._heap = []
+		# task uuid -> current alarm
+		self._alarms = {}
+		# state of tasks table on load
+		self._tasks_state = None
+
+	def __len__(self):
+		return len(self._alarms)
+
+	def load(self, session=None):
+		""" Load alarms of all not completed tasks. """
+		session = session or OBJ.Session()
+		# read state before alarms; change between queries cause only
+		# additional reload
+		self._tasks_state = _get_tasks_state(session)
+		query = session.query(OBJ.Task.uuid,  # pylint: disable=E1101
+				OBJ.Task.alarm).filter(OBJ.Task.alarm.isnot(None),
+						OBJ.Task.completed.is_(None),
+						OBJ.Task.deleted.is_(None))
+		self.set_alarms(query)
+
+	def is_outdated(self, session=None):
+		""" Check if tasks were added, removed or modified after `load`. """
+		return _get_tasks_state(session or OBJ.Session()) != self._tasks_state
+
+	def set_alarms(self, alarms):
+		""" Replace all alarms by (task uuid, alarm) pairs. """
+		self._alarms = dict(alarms)
+		self._heap = [(alarm, uuid) for uuid, alarm in self._alarms.iteritems()]
+		heapq.heapify(self._heap)
+		_LOG.debug("ReminderScheduler.set_alarms: %d alarms", len(self._heap))
+
+	def update_task(self, task_uuid, session=None):
+		""" Reload alarm for one task. """
+		session = session or OBJ.Session()
+		row = session.query(OBJ.Task.alarm,  # pylint: disable=E1101
+				OBJ.Task.completed, OBJ.Task.deleted).filter_by(
+						uuid=task_uuid).first()
+		if row is None or row.completed or row.deleted:
+			self.remove_task(task_uuid)
+		else:
+			self.set_alarm(task_uuid, row.alarm)
+
+	def set_alarm(self, task_uuid, alarm):
+		""" Set or clear (`alarm` = None) alarm for task. """
+		if alarm is None:
+			self.remove_task(task_uuid)
+			return
+		if self._alarms.get(task_uuid) == alarm:
+			return
+		self._alarms[task_uuid] = alarm
+		heapq.heappush(self._heap, (alarm, task_uuid))
+
+	def remove_task(self, task_uuid):
+		self._alarms.pop(task_uuid, None)
+
+	def get_alarm(self, task_uuid):
+		""" Get scheduled alarm for task or None. """
+		return self._alarms.get(task_uuid)
+
+	def next_alarm(self):
+		""" Get time of the nearest alarm or None. """
+		heap = self._heap
+		while heap:
+			alarm, uuid = heap[0]
+			if self._alarms.get(uuid) == alarm:
+				return alarm
+			# outdated entry
+			heapq.heappop(heap)
+		return None
+
+	def pop_due(self, now=None):
+		""" Remove and return uuids of tasks with alarm <= now. """
+		now = now or datetime.datetime.utcnow()
+		due = []
+		heap = self._heap
+		while heap and heap[0][0] <= now:
+			alarm, uuid = heapq.heappop(heap)
+			if self._alarms.get(uuid) == alarm:
+				del self._alarms[uuid]
+				due.append(uuid)
+		return due
+
+	def seconds_to_next(self, now=None):
+		""" Get seconds to the nearest alarm (max MAX_WAIT) or None when
+		there is no alarms. """
+		alarm = self.next_alarm()
+		if alarm is None:
+			return None
+		now = now or datetime.datetime.utcnow()
+		delta = alarm - now
+		seconds = delta.days * 86400 + delta.seconds + \
+				delta.microseconds / 1000000.
+		return min(max(seconds, 0), MAX_WAIT)
+
+
+def _get_tasks_state(session):
+	""" Get (last modification time, number) of tasks. """
+	return tuple(session.query(func.max(OBJ.Task.modified),
+			func.count(OBJ.Task.uuid)).one())
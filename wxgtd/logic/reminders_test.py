@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for reminders module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-20"
+
+from unittest import main, TestCase
+from datetime import datetime, timedelta
+
+from . import reminders
+
+
+class TestReminderScheduler(TestCase):
+	""" Test ReminderScheduler. """
+
+	def setUp(self):
+		self.now = datetime(2013, 7, 20, 12, 0)
+		self.sched = reminders.ReminderScheduler()
+		self.sched.set_alarms([('t1', self.now + timedelta(minutes=10)),
+			('t2', self.now - timedelta(minutes=1)),
+			('t3', self.now + timedelta(hours=5))])
+
+	def test_next_alarm(self):
+		self.assertEqual(self.sched.next_alarm(),
+				self.now - timedelta(minutes=1))
+		self.assertEqual(self.sched.seconds_to_next(self.now), 0)
+
+	def test_pop_due(self):
+		self.assertEqual(self.sched.pop_due(self.now), ['t2'])
+		self.assertEqual(self.sched.pop_due(self.now), [])
+		self.assertEqual(self.sched.seconds_to_next(self.now), 600)
+		self.assertEqual(self.sched.pop_due(self.now + timedelta(hours=6)),
+				['t1', 't3'])
+		self.assertIsNone(self.sched.next_alarm())
+		self.assertIsNone(self.sched.seconds_to_next(self.now))
+
+	def test_update(self):
+		# snooze
+		self.sched.set_alarm('t2', self.now + timedelta(minutes=5))
+		self.assertEqual(self.sched.seconds_to_next(self.now), 300)
+		# dismiss
+		self.sched.set_alarm('t2', None)
+		self.sched.remove_task('t1')
+		self.assertEqual(self.sched.next_alarm(), self.now + timedelta(hours=5))
+		self.assertEqual(len(self.sched), 1)
+		self.assertEqual(self.sched.seconds_to_next(self.now),
+				reminders.MAX_WAIT)
+
+
+if __name__ == '__main__':
+	main()
@@ -23,6 +23,7 @@ from wxgtd.wxtools.wxpub import publisher
 
 from wxgtd.model import objects as OBJ
 from wxgtd.model import enums
+from wxgtd.model import profiler
 
 _LOG = logging.getLogger(__name__)
 _ = gettext.gettext
@@ -466,6 +467,50 @@ def toggle_task_starred(task_uuid, session=None):
 	return save_modified_task(task, session)
 
 
+def snooze_task_alarm(task_uuid, pattern, session=None):
+	""" Move task alarm to now + snooze pattern.
+
+	Args:
+		task_uuid: UUID of task to change
+		pattern: snooze pattern (see: enums.SNOOZE_PATTERNS)
+		session: optional SqlAlchemy session
+	Returns:
+		New alarm or None if wrong pattern or task not found.
+	"""
+	offset = alarm_pattern_to_time(pattern)
+	if offset is None:
+		return None
+	session = session or OBJ.Session()
+	task = OBJ.Task.get(session, uuid=task_uuid)
+	if not task:
+		return None
+	task.alarm = datetime.datetime.utcnow() + offset
+	task.update_modify_time()
+	session.commit()  # pylint: disable=E1101
+	publisher.sendMessage('task.update', data={'task_uuid': task.uuid})
+	return task.alarm
+
+
+def dismiss_task_alarm(task_uuid, session=None):
+	""" Clear task alarm.
+
+	Args:
+		task_uuid: UUID of task to change
+		session: optional SqlAlchemy session
+	Returns:
+		True if ok
+	"""
+	session = session or OBJ.Session()
+	task = OBJ.Task.get(session, uuid=task_uuid)
+	if not task:
+		return False
+	task.alarm = None
+	task.update_modify_time()
+	session.commit()  # pylint: disable=E1101
+	publisher.sendMessage('task.update', data={'task_uuid': task.uuid})
+	return True
+
+
 _PERIOD_PL = {'Week': "Weeks", "Day": "Days", "Month": "Months",
 		"Year": "Years"}
 
@@ -551,6 +596,7 @@ def clone_task(task_uuid, session=None):
 	return new_task.uuid
 
 
+@profiler.profiled('save task')
 def save_modified_task(task, session=None):
 	""" Save modified task.
 	Update required fields.
@@ -577,6 +623,7 @@ def save_modified_task(task, session=None):
 	return True
 
 
+@profiler.profiled('save tasks')
 def save_modified_tasks(tasks, session=None):
 	""" Save modified tasks.
 	Update required fields.
@@ -44,6 +44,8 @@ def _parse_opt():
 	group.add_option('--debug-sql', action="store_true", default=False,
 			help='enable sql debug messages')
 	group.add_option('--wx-inspection', action="store_true", default=False)
+	group.add_option('--profile', action="store_true", default=False,
+			help='collect and show sql queries statistics')
 	optp.add_option_group(group)
 	group = optparse.OptionGroup(optp, "Other options")
 	group.add_option('--force-start', action="store_true", default=False,
@@ -118,7 +120,7 @@ def run():
 
 	# connect to databse
 	from wxgtd.model import db
-	db.connect(db.find_db_file(config), options.debug_sql)
+	db.connect(db.find_db_file(config), options.debug_sql, options.profile)
 
 	if options.quick_task_dialog:
 		from wxgtd.gui import quicktask
@@ -127,6 +129,7 @@ def run():
 		# init icons
 		from wxgtd.wxtools import iconprovider
 		iconprovider.init_icon_cache(None, config.data_dir)
+		iconprovider.preload_icons()
 
 		# show main window
 		from wxgtd.gui.frame_main import FrameMain
@@ -140,9 +143,16 @@ def run():
 			import wx.lib.inspection
 			wx.lib.inspection.InspectionTool().Show()
 
+		if options.profile:
+			from wxgtd.gui.frame_profiler import FrameProfiler
+			FrameProfiler().Show()
+
 		app.MainLoop()
 
 	# app closed; save config
 	if ipcs:
 		ipcs.shutdown()
+	if options.profile:
+		from wxgtd.model import profiler
+		profiler.log_summary()
 	config.save()
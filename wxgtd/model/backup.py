@@ -0,0 +1,449 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Backups of database.
+
+Two kinds of backups are supported:
+
+Incremental (deduplicated) snapshots. Snapshot of database is stored as
+manifest file (SNAPSHOT_<date>.json) and set of chunks. Rows of each table
+are split into chunks; chunk boundaries depend only on primary key of rows,
+so modification of one row change only one chunk. Chunks are stored once,
+in files named by hash of its content, and are shared between snapshots.
+
+Copy of SQLite database file (BACKUP_<date>.db.gz) created by VACUUM INTO
+and compressed in background thread. VACUUM INTO require SQLite 3.27;
+with older library snapshot is created instead.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-27'
+
+import os
+import logging
+import datetime
+import hashlib
+import threading
+import zlib
+import json
+import gzip
+import shutil
+import sqlite3
+import tempfile
+
+from sqlalchemy import select
+from sqlalchemy.types import DateTime
+
+from wxgtd.model import objects
+
+_LOG = logging.getLogger(__name__)
+
+_MANIFEST_PREFIX = "SNAPSHOT_"
+_MANIFEST_EXT = ".json"
+_CHUNKS_DIR = "chunks"
+# chunk is closed after row which key crc32 & _CHUNK_MASK == 0;
+# average 64 rows per chunk
+_CHUNK_MASK = 0x3f
+_DATETIME_FMT = "%Y-%m-%d %H:%M:%S.%f"
+_SQLITE_PREFIX = "BACKUP_"
+_SQLITE_EXT = ".db.gz"
+# first version of SQLite supporting VACUUM INTO
+_SQLITE_VACUUM_INTO_VERSION = (3, 27, 0)
+
+# only one writer at time
+_WRITE_LOCK = threading.Lock()
+
+
+def _backup_tables():
+	""" Tables to backup - all except internal configuration. """
+	return [table for table in objects.Base.metadata.sorted_tables
+			if table is not objects.Conf.__table__]
+
+
+def snapshot_name(date=None):
+	""" Get name of snapshot for given date (default: today). """
+	date = date or datetime.date.today()
+	return _MANIFEST_PREFIX + date.isoformat() + _MANIFEST_EXT
+
+
+def list_snapshots(backup_dir):
+	""" Find all snapshots in `backup_dir`.
+
+	Returns:
+		List of snapshots names; newest first.
+	"""
+	if not os.path.isdir(backup_dir):
+		return []
+	return sorted((fname for fname in os.listdir(backup_dir)
+			if _is_snapshot(fname)), reverse=True)
+
+
+def list_backups(backup_dir):
+	""" Find all snapshots and sqlite backups in `backup_dir`.
+
+	Returns:
+		List of backups names; newest first.
+	"""
+	if not os.path.isdir(backup_dir):
+		return []
+	return sorted((fname for fname in os.listdir(backup_dir)
+			if _is_snapshot(fname) or _is_sqlite_backup(fname)),
+			key=_backup_date, reverse=True)
+
+
+def restore_backup(backup_dir, name):
+	""" Restore database from snapshot or sqlite backup.
+
+	Returns:
+		Number of restored rows.
+	"""
+	if _is_sqlite_backup(name):
+		return restore_sqlite_backup(backup_dir, name)
+	return restore_snapshot(backup_dir, name)
+
+
+def create_snapshot(backup_dir, num_copies=21, background=True):
+	""" Create snapshot of current database when not exists for today.
+
+	Rows are read from database in calling thread (without ORM); encoding,
+	compressing, writing and removing old snapshots is done in background
+	thread when `background` is True.
+
+	Args:
+		backup_dir: directory for backups
+		num_copies: number of snapshots to keep
+		background: run writer in separate thread
+
+	Returns:
+		Thread object for background writer, True when backup was created or
+		already exists, False on error.
+	"""
+	name = snapshot_name()
+	if os.path.isfile(os.path.join(backup_dir, name)):
+		_LOG.info("create_snapshot: %s already exists; skipping...", name)
+		return True
+	if not os.path.isdir(backup_dir):
+		try:
+			os.makedirs(backup_dir)
+		except OSError as error:
+			_LOG.error('create_snapshot: create dir error: %s', str(error))
+			return False
+	tables = _read_tables()
+	if not background:
+		return _write_snapshot(backup_dir, name, tables, num_copies)
+	thread = threading.Thread(target=_write_snapshot, name="backup",
+			args=(backup_dir, name, tables, num_copies))
+	thread.start()
+	return thread
+
+
+def restore_snapshot(backup_dir, name):
+	""" Replace content of database by data from snapshot.
+
+	Args:
+		backup_dir: directory with backups
+		name: snapshot name (see: list_snapshots)
+
+	Returns:
+		Number of restored rows.
+	"""
+	_LOG.info("restore_snapshot: %s", name)
+	with open(os.path.join(backup_dir, name)) as mfile:
+		manifest = json.loads(mfile.read())
+	chunks_dir = os.path.join(backup_dir, _CHUNKS_DIR)
+	session = objects.Session()
+	conn = session.connection()
+	# tasks, folders etc. may reference rows inserted later
+	conn.execute("PRAGMA defer_foreign_keys = ON")
+	tables = _backup_tables()
+	for table in reversed(tables):
+		conn.execute(table.delete())
+	restored = 0
+	for table in tables:
+		tinfo = manifest['tables'].get(table.name)
+		if not tinfo:
+			continue
+		columns = tinfo['columns']
+		dt_columns = [idx for idx, col in enumerate(columns)
+				if col in table.c and isinstance(table.c[col].type, DateTime)]
+		for chunk_hash in tinfo['chunks']:
+			rows = _read_chunk(chunks_dir, chunk_hash)
+			for row in rows:
+				for idx in dt_columns:
+					row[idx] = _str2datetime(row[idx])
+			if rows:
+				conn.execute(table.insert(), [dict(zip(columns, row))
+						for row in rows])
+				restored += len(rows)
+	session.commit()  # pylint: disable=E1101
+	_LOG.info("restore_snapshot: restored %d rows", restored)
+	return restored
+
+
+def create_sqlite_backup(backup_dir, num_copies=21, background=True):
+	""" Create copy of database file when not exists for today.
+
+	Database is copied by "VACUUM INTO" (consistent copy of live database,
+	page by page, without free pages); compression and removing old backups
+	is done in background thread when `background` is True. When SQLite
+	don't support VACUUM INTO - snapshot is created (see create_snapshot).
+
+	Args:
+		backup_dir: directory for backups
+		num_copies: number of backups to keep
+		background: run compression in separate thread
+
+	Returns:
+		Thread object for background writer, True when backup was created or
+		already exists, False on error.
+	"""
+	if not is_sqlite_backup_available():
+		_LOG.warn("create_sqlite_backup: SQLite %s don't support VACUUM INTO;"
+				" creating snapshot", sqlite3.sqlite_version)
+		return create_snapshot(backup_dir, num_copies, background)
+	name = _SQLITE_PREFIX + datetime.date.today().isoformat() + _SQLITE_EXT
+	filename = os.path.join(backup_dir, name)
+	if os.path.isfile(filename):
+		_LOG.info("create_sqlite_backup: %s already exists; skipping...", name)
+		return True
+	if not os.path.isdir(backup_dir):
+		try:
+			os.makedirs(backup_dir)
+		except OSError as error:
+			_LOG.error('create_sqlite_backup: create dir error: %s',
+					str(error))
+			return False
+	tmp_db = filename[:-3] + '.tmp'
+	if os.path.isfile(tmp_db):
+		os.unlink(tmp_db)
+	engine = objects.Session().get_bind()
+	conn = engine.raw_connection()
+	try:
+		conn.execute("VACUUM INTO ?", (tmp_db, ))
+	finally:
+		conn.close()
+	if not background:
+		return _compress_sqlite_backup(backup_dir, tmp_db, filename,
+				num_copies)
+	thread = threading.Thread(target=_compress_sqlite_backup, name="backup",
+			args=(backup_dir, tmp_db, filename, num_copies))
+	thread.start()
+	return thread
+
+
+def is_sqlite_backup_available():
+	""" Check is SQLite library support VACUUM INTO. """
+	return sqlite3.sqlite_version_info >= _SQLITE_VACUUM_INTO_VERSION
+
+
+def restore_sqlite_backup(backup_dir, name):
+	""" Replace content of database by data from sqlite backup.
+
+	Backup is attached to current connection and all tables are copied in
+	one transaction.
+
+	Returns:
+		Number of restored rows.
+	"""
+	_LOG.info("restore_sqlite_backup: %s", name)
+	tmp_fd, tmp_db = tempfile.mkstemp(suffix='.db')
+	try:
+		with os.fdopen(tmp_fd, 'wb') as ofile:
+			with gzip.open(os.path.join(backup_dir, name), 'rb') as ifile:
+				shutil.copyfileobj(ifile, ofile)
+		conn = objects.Session().get_bind().connect()
+		conn.execute("ATTACH DATABASE ? AS bak", (tmp_db, ))
+		try:
+			trans = conn.begin()
+			try:
+				conn.execute("PRAGMA defer_foreign_keys = ON")
+				tables = _backup_tables()
+				for table in reversed(tables):
+					conn.execute(table.delete())
+				restored = 0
+				for table in tables:
+					columns = ", ".join(col.name for col in table.columns)
+					result = conn.execute("INSERT INTO main.%s (%s) "
+							"SELECT %s FROM bak.%s" % (table.name, columns,
+								columns, table.name))
+					restored += result.rowcount
+				trans.commit()
+			except:
+				trans.rollback()
+				raise
+		finally:
+			conn.execute("DETACH DATABASE bak")
+			conn.close()
+	finally:
+		os.unlink(tmp_db)
+	_LOG.info("restore_sqlite_backup: restored %d rows", restored)
+	return restored
+
+
+def _compress_sqlite_backup(backup_dir, tmp_db, filename, num_copies):
+	""" Compress database copy and remove old sqlite backups. """
+	with _WRITE_LOCK:
+		try:
+			with open(tmp_db, 'rb') as ifile:
+				with gzip.open(filename + '.tmp', 'wb', 6) as ofile:
+					shutil.copyfileobj(ifile, ofile, 65536)
+			os.rename(filename + '.tmp', filename)
+			os.unlink(tmp_db)
+			_LOG.info('_compress_sqlite_backup: COMPLETED %s', filename)
+			backups = sorted((fname for fname in os.listdir(backup_dir)
+					if _is_sqlite_backup(fname)), reverse=True)
+			for fname in backups[num_copies:]:
+				_LOG.info('_compress_sqlite_backup: delete backup: %r', fname)
+				os.unlink(os.path.join(backup_dir, fname))
+		except (IOError, OSError):
+			_LOG.exception('_compress_sqlite_backup: error writing %s',
+					filename)
+			return False
+	return True
+
+
+def _is_snapshot(fname):
+	return fname.startswith(_MANIFEST_PREFIX) and fname.endswith(_MANIFEST_EXT)
+
+
+def _is_sqlite_backup(fname):
+	return fname.startswith(_SQLITE_PREFIX) and fname.endswith(_SQLITE_EXT)
+
+
+def _backup_date(fname):
+	return fname.split('_', 1)[1].split('.', 1)[0]
+
+
+def _read_tables():
+	""" Read all rows from backuped tables.
+
+	Returns:
+		list of (table name, column names, list of rows)
+	"""
+	session = objects.Session()
+	conn = session.connection()
+	result = []
+	for table in _backup_tables():
+		columns = [col.name for col in table.columns]
+		query = select([table]).order_by(*table.primary_key.columns)
+		rows = [[_encode_value(val) for val in row]
+				for row in conn.execute(query)]
+		result.append((table.name, columns, rows))
+	session.close()  # pylint: disable=E1101
+	return result
+
+
+def _write_snapshot(backup_dir, name, tables, num_copies):
+	""" Write chunks and manifest; remove old snapshots. """
+	with _WRITE_LOCK:
+		manifest_path = os.path.join(backup_dir, name)
+		if os.path.isfile(manifest_path):
+			return True
+		try:
+			chunks_dir = os.path.join(backup_dir, _CHUNKS_DIR)
+			if not os.path.isdir(chunks_dir):
+				os.mkdir(chunks_dir)
+			manifest = {'version': 1,
+					'created': datetime.datetime.utcnow().strftime(_DATETIME_FMT),
+					'tables': {}}
+			new_chunks = 0
+			for table_name, columns, rows in tables:
+				chunks = []
+				pk_idx = _pk_indexes(table_name, columns)
+				for chunk in _split_rows(rows, pk_idx):
+					chunk_hash, created = _write_chunk(chunks_dir, chunk)
+					chunks.append(chunk_hash)
+					new_chunks += created
+				manifest['tables'][table_name] = {'columns': columns,
+						'chunks': chunks}
+			tmp_path = manifest_path + '.tmp'
+			with open(tmp_path, 'w') as mfile:
+				mfile.write(json.dumps(manifest))
+			os.rename(tmp_path, manifest_path)
+			_LOG.info('_write_snapshot: COMPLETED %s; new chunks: %d', name,
+					new_chunks)
+			_prune(backup_dir, num_copies)
+		except (IOError, OSError):
+			_LOG.exception('_write_snapshot: error writing %s', name)
+			return False
+	return True
+
+
+def _pk_indexes(table_name, columns):
+	""" Get positions of primary key columns in row. """
+	table = objects.Base.metadata.tables[table_name]
+	return [columns.index(col.name) for col in table.primary_key.columns]
+
+
+def _split_rows(rows, pk_idx):
+	""" Split rows into chunks. Boundaries depend on primary key only. """
+	chunk = []
+	for row in rows:
+		chunk.append(row)
+		key = repr([row[idx] for idx in pk_idx])
+		if zlib.crc32(key) & _CHUNK_MASK == 0:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+def _write_chunk(chunks_dir, rows):
+	""" Store chunk if not exists.
+
+	Returns:
+		(chunk hash, 1 if chunk was created, otherwise 0)
+	"""
+	data = json.dumps(rows)
+	chunk_hash = hashlib.sha1(data).hexdigest()
+	path = os.path.join(chunks_dir, chunk_hash)
+	if os.path.isfile(path):
+		return chunk_hash, 0
+	tmp_path = path + '.tmp'
+	with open(tmp_path, 'wb') as cfile:
+		cfile.write(zlib.compress(data))
+	os.rename(tmp_path, path)
+	return chunk_hash, 1
+
+
+def _read_chunk(chunks_dir, chunk_hash):
+	with open(os.path.join(chunks_dir, chunk_hash), 'rb') as cfile:
+		return json.loads(zlib.decompress(cfile.read()))
+
+
+def _prune(backup_dir, num_copies):
+	""" Remove old snapshots and chunks not used in remaining snapshots. """
+	snapshots = list_snapshots(backup_dir)
+	for name in snapshots[num_copies:]:
+		_LOG.info('_prune: delete snapshot: %r', name)
+		os.unlink(os.path.join(backup_dir, name))
+	used = set()
+	for name in snapshots[:num_copies]:
+		with open(os.path.join(backup_dir, name)) as mfile:
+			manifest = json.loads(mfile.read())
+		for tinfo in manifest['tables'].itervalues():
+			used.update(tinfo['chunks'])
+	chunks_dir = os.path.join(backup_dir, _CHUNKS_DIR)
+	removed = 0
+	for fname in os.listdir(chunks_dir):
+		if fname not in used:
+			os.unlink(os.path.join(chunks_dir, fname))
+			removed += 1
+	_LOG.debug('_prune: removed chunks: %d', removed)
+
+
+def _encode_value(value):
+	if isinstance(value, datetime.datetime):
+		return value.strftime(_DATETIME_FMT)
+	return value
+
+
+def _str2datetime(value):
+	if not value:
+		return None
+	return datetime.datetime.strptime(value, _DATETIME_FMT)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for backup module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import json
+import shutil
+import datetime
+import tempfile
+from unittest import main, skipUnless, TestCase
+
+from . import db
+from . import backup
+from . import objects as OBJ
+
+_DUE = datetime.datetime(2013, 7, 1, 12, 30, 15, 250)
+
+
+class _BackupTestCase(TestCase):
+	""" Database with tasks, folder and tag. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.backup_dir = os.path.join(self.tmpdir, 'backups')
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		session = OBJ.Session()
+		session.add(OBJ.Folder(uuid='f1', title='folder'))
+		session.add(OBJ.Tag(uuid='t1', title='tag'))
+		# many tasks - more than one chunk
+		for idx in xrange(500):
+			session.add(OBJ.Task(uuid='task%03d' % idx, title='task %d' % idx,
+					folder_uuid='f1', due_date=_DUE))
+		session.flush()
+		session.add(OBJ.TaskTag(task_uuid='task001', tag_uuid='t1'))
+		session.commit()
+		session.close()
+
+	def tearDown(self):
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def _modify(self):
+		session = OBJ.Session()
+		session.delete(OBJ.Task.get(session, uuid='task001'))
+		OBJ.Task.get(session, uuid='task002').due_date = None
+		session.add(OBJ.Task(uuid='new', title='new'))
+		session.commit()
+		session.close()
+
+	def _check_restored(self):
+		session = OBJ.Session()
+		task = OBJ.Task.get(session, uuid='task001')
+		self.assertEqual(task.due_date, _DUE)
+		self.assertIsNone(task.completed)
+		self.assertEqual([tag.uuid for tag in task.tags], ['t1'])
+		self.assertEqual(task.folder.title, 'folder')
+		self.assertEqual(OBJ.Task.get(session, uuid='task002').due_date, _DUE)
+		self.assertIsNone(OBJ.Task.get(session, uuid='new'))
+		session.close()
+
+
+class TestSnapshot(_BackupTestCase):
+	""" Incremental snapshots. """
+
+	def _snapshot(self, date):
+		""" Create snapshot and rename it as created in `date`. """
+		self.assertTrue(backup.create_snapshot(self.backup_dir,
+				background=False))
+		name = backup.snapshot_name(date)
+		os.rename(os.path.join(self.backup_dir, backup.snapshot_name()),
+				os.path.join(self.backup_dir, name))
+		return name
+
+	def _chunks(self, name, table=None):
+		with open(os.path.join(self.backup_dir, name)) as mfile:
+			tables = json.loads(mfile.read())['tables']
+		if table:
+			return tables[table]['chunks']
+		return set(chunk for tinfo in tables.itervalues()
+				for chunk in tinfo['chunks'])
+
+	def _chunk_files(self):
+		return set(os.listdir(os.path.join(self.backup_dir, 'chunks')))
+
+	def _update_title(self, task_uuid, title):
+		session = OBJ.Session()
+		OBJ.Task.get(session, uuid=task_uuid).title = title
+		session.commit()
+		session.close()
+
+	def test_shared_chunks(self):
+		first = self._snapshot(datetime.date(2013, 7, 1))
+		self._update_title('task250', 'changed')
+		second = self._snapshot(datetime.date(2013, 7, 2))
+		self.assertEqual(backup.list_snapshots(self.backup_dir),
+				[second, first])
+		first_tasks = self._chunks(first, 'tasks')
+		second_tasks = self._chunks(second, 'tasks')
+		self.assertGreater(len(first_tasks), 1)
+		self.assertEqual(len(first_tasks), len(second_tasks))
+		# modified row change only one chunk
+		self.assertEqual(len(set(second_tasks) - set(first_tasks)), 1)
+		self.assertEqual(self._chunks(first, 'folders'),
+				self._chunks(second, 'folders'))
+		self.assertEqual(self._chunk_files(),
+				self._chunks(first) | self._chunks(second))
+		# snapshot for today already exists
+		self.assertTrue(backup.create_snapshot(self.backup_dir,
+				background=False))
+		self.assertTrue(backup.create_snapshot(self.backup_dir,
+				background=False))
+		self.assertEqual(len(backup.list_snapshots(self.backup_dir)), 3)
+
+	def test_restore(self):
+		tables = backup._read_tables()  # pylint: disable=W0212
+		name = self._snapshot(datetime.date(2013, 7, 1))
+		self._modify()
+		restored = backup.restore_snapshot(self.backup_dir, name)
+		self.assertEqual(restored, sum(len(rows) for _name, _columns, rows
+				in tables))
+		self.assertEqual(backup._read_tables(), tables)  # pylint: disable=W0212
+		self._check_restored()
+
+	def test_prune(self):
+		oldest = self._snapshot(datetime.date(2013, 7, 1))
+		self._update_title('task100', 'changed')
+		middle = self._snapshot(datetime.date(2013, 7, 2))
+		self._update_title('task400', 'changed')
+		newest = self._snapshot(datetime.date(2013, 7, 3))
+		self.assertEqual(self._chunk_files(), self._chunks(oldest) |
+				self._chunks(middle) | self._chunks(newest))
+		backup._prune(self.backup_dir, 2)  # pylint: disable=W0212
+		self.assertEqual(backup.list_snapshots(self.backup_dir),
+				[newest, middle])
+		used = self._chunks(middle) | self._chunks(newest)
+		self.assertEqual(self._chunk_files(), used)
+		# only chunk with task100 before change was used only by oldest
+		self.assertEqual(len(used), len(self._chunks(middle)) + 1)
+
+
+class TestSqliteBackup(_BackupTestCase):
+	""" Copies of database file. """
+
+	@skipUnless(backup.is_sqlite_backup_available(),
+			"SQLite don't support VACUUM INTO")
+	def test_restore(self):
+		tables = backup._read_tables()  # pylint: disable=W0212
+		self.assertTrue(backup.create_sqlite_backup(self.backup_dir,
+				background=False))
+		name = 'BACKUP_%s.db.gz' % datetime.date.today().isoformat()
+		self.assertEqual(backup.list_backups(self.backup_dir), [name])
+		self._modify()
+		restored = backup.restore_backup(self.backup_dir, name)
+		self.assertEqual(restored, sum(len(rows) for _name, _columns, rows
+				in tables))
+		self.assertEqual(backup._read_tables(), tables)  # pylint: disable=W0212
+		self._check_restored()
+
+	def test_fallback_to_snapshot(self):
+		version = backup._SQLITE_VACUUM_INTO_VERSION  # pylint: disable=W0212
+		backup._SQLITE_VACUUM_INTO_VERSION = (999, )  # pylint: disable=W0212
+		try:
+			self.assertFalse(backup.is_sqlite_backup_available())
+			self.assertTrue(backup.create_sqlite_backup(self.backup_dir,
+					background=False))
+		finally:
+			backup._SQLITE_VACUUM_INTO_VERSION = version  # pylint: disable=W0212
+		self.assertEqual(backup.list_backups(self.backup_dir),
+				[backup.snapshot_name()])
+
+
+if __name__ == '__main__':
+	main()
@@ -24,6 +24,7 @@ from sqlalchemy.engine import Engine
 
 from wxgtd.model import sqls
 from wxgtd.model import objects
+from wxgtd.model import profiler
 
 _LOG = logging.getLogger(__name__)
 
@@ -35,12 +36,13 @@ def _set_sqlite_pragma(dbapi_connection, _connection_record):
 	cursor.close()
 
 
-def connect(filename, debug=False, *args, **kwargs):
+def connect(filename, debug=False, profile=False, *args, **kwargs):
 	""" Create connection  to database  & initiate it.
 
 	Args:
 		filename: path to sqlite database file
 		debug: (bool) turn on  debugging
+		profile: (bool) collect queries statistics (see profiler)
 		args, kwargs: other arguments for sqlalachemy engine
 
 	Return:
@@ -49,7 +51,10 @@ def connect(filename, debug=False, *args, **kwargs):
 	_LOG.info('connect %r', (filename, args, kwargs))
 	engine = sqlalchemy.create_engine("sqlite:///" + filename, echo=debug,
 			connect_args={'detect_types': sqlite3.PARSE_DECLTYPES |
-				sqlite3.PARSE_COLNAMES}, native_datetime=True)
+				sqlite3.PARSE_COLNAMES,
+				# sessions are used also in background threads (sync)
+				'check_same_thread': False},
+			native_datetime=True)
 	for schema in sqls.SCHEMA_DEF:
 		for sql in schema:
 			engine.execute(sql)
@@ -68,8 +73,12 @@ def connect(filename, debug=False, *args, **kwargs):
 			_LOG.debug("Query time: %.02fms",
 					(time.time() - context.app_query_start) * 1000)
 
+	if profile:
+		profiler.enable(engine)
+
 	_LOG.info('Database create_all START')
 	objects.Base.metadata.create_all(engine)
+	sqls.update_indexes(engine, objects.Base.metadata)
 	_LOG.info('Database create_all COMPLETED')
 	# bootstrap
 	_LOG.info('Database bootstrap START')
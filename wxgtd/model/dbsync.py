@@ -14,34 +14,29 @@ __version__ = '2013-04-26'
 
 
 import os
+import time
+import socket
+import httplib
 import logging
 import gettext
-import tempfile
-import datetime
 
 try:
-	import cjson
-	_JSON_DECODER = cjson.decode
-	_JSON_ENCODER = cjson.encode
+	import dropbox
 except ImportError:
-	import json
-	_JSON_DECODER = json.loads
-	_JSON_ENCODER = json.dumps
+	dropbox = None  # pylint: disable=C0103
 
 try:
-	import dropbox
+	import urllib3
 except ImportError:
-	dropbox = None  # pylint: disable=C0103
+	urllib3 = None  # pylint: disable=C0103
 
 from wxgtd.wxtools.wxpub import publisher
 
 from wxgtd.lib import appconfig
-from wxgtd.lib import ignore_exceptions
 
 from wxgtd.model import exporter
-from wxgtd.model import loader
 from wxgtd.model import sync as SYNC
-from wxgtd.model import objects
+from wxgtd.model import transport
 
 
 _LOG = logging.getLogger(__name__)
@@ -51,6 +46,24 @@ _ = gettext.gettext
 SYNC_PATH = '/Apps/DGT-GTD/sync/GTD_SYNC.zip'
 LOCK_PATH = '/Apps/DGT-GTD/sync/sync.locked'
 
+# size of one upload / download request
+CHUNK_SIZE = 1024 * 1024
+# number of retries of one chunk
+MAX_RETRIES = 5
+# delay before retry (multiplied by number of attempt)
+RETRY_DELAY = 1.0
+_READ_BLOCK_SIZE = 65536
+
+# errors that interrupt transfer; may be transient
+_TRANSFER_ERRORS = (socket.error, httplib.HTTPException)
+if dropbox:
+	_TRANSFER_ERRORS += (dropbox.rest.ErrorResponse, )
+if urllib3:
+	_TRANSFER_ERRORS += (urllib3.exceptions.HTTPError, )
+
+# created clients (key: credentials); reused to keep http connections
+_CLIENTS = {}
+
 
 def is_available():
 	return bool(dropbox)
@@ -61,24 +74,108 @@ def _notify_progress(progress, msg):
 
 
 def _create_session():
+	""" Get dropbox client for configured account.
+
+	Client is created once and reused - dropbox rest client keep pool of
+	http connections.
+	"""
 	appcfg = appconfig.AppConfig()
-	sess = dropbox.session.DropboxSession(appcfg.get('dropbox', 'appkey'),
-			appcfg.get('dropbox', 'appsecret'), 'dropbox')
-	sess.set_token(appcfg.get('dropbox', 'oauth_key'),
+	key = (appcfg.get('dropbox', 'appkey'), appcfg.get('dropbox', 'appsecret'),
+			appcfg.get('dropbox', 'oauth_key'),
 			appcfg.get('dropbox', 'oauth_secret'))
-	return dropbox.client.DropboxClient(sess)
+	dbclient = _CLIENTS.get(key)
+	if dbclient is None:
+		sess = dropbox.session.DropboxSession(key[0], key[1], 'dropbox')
+		sess.set_token(key[2], key[3])
+		dbclient = _CLIENTS[key] = dropbox.client.DropboxClient(sess)
+	return dbclient
+
 
+def download_file(fileobj, source, dbclient, chunk_size=CHUNK_SIZE):
+	""" Download file in chunks; resume interrupted chunk from last offset.
 
-def download_file(fileobj, source, dbclient):
-	_LOG.info('download_file')
+	Args:
+		fileobj: destination file-like object
+		source: path in dropbox
+		dbclient: dropbox client
+		chunk_size: size of one request
+
+	Returns:
+		False when file not exists or is empty.
+	"""
+	_LOG.info('download_file %r', source)
 	try:
-		remote_file, metadata = dbclient.get_file_and_metadata(source)
-		if metadata and metadata['bytes'] > 0:
-			fileobj.write(remote_file.read())
-			return True
+		metadata = dbclient.metadata(source, list=False)
 	except dropbox.rest.ErrorResponse:
 		_LOG.warn("download_file: %r not found", source)
-	return False
+		return False
+	size = metadata.get('bytes', 0)
+	if not size or metadata.get('is_deleted'):
+		return False
+	# all chunks must be from the same revision
+	rev = metadata.get('rev')
+	offset = 0
+	attempt = 0
+	while offset < size:
+		try:
+			resp = dbclient.get_file(source, rev=rev, start=offset,
+					length=min(chunk_size, size - offset))
+			try:
+				while True:
+					data = resp.read(_READ_BLOCK_SIZE)
+					if not data:
+						break
+					fileobj.write(data)
+					offset += len(data)
+					attempt = 0
+			finally:
+				resp.close()
+		except _TRANSFER_ERRORS as err:
+			attempt += 1
+			_check_retry(err, attempt, 'download_file', offset)
+	_LOG.info('download_file: downloaded %d bytes', offset)
+	return True
+
+
+def upload_file(fileobj, destination, dbclient, size, chunk_size=CHUNK_SIZE):
+	""" Upload file by chunked upload; resume from last confirmed offset.
+
+	Existing file is replaced when upload is committed.
+
+	Args:
+		fileobj: source file-like object
+		destination: path in dropbox
+		dbclient: dropbox client
+		size: size of data to upload
+		chunk_size: size of one request
+	"""
+	_LOG.info('upload_file %r, size=%d', destination, size)
+	uploader = dbclient.get_chunked_uploader(fileobj, size)
+	attempt = 0
+	while uploader.offset < size:
+		offset = uploader.offset
+		try:
+			uploader.upload_chunked(chunk_size)
+		except _TRANSFER_ERRORS as err:
+			attempt = attempt + 1 if uploader.offset == offset else 1
+			_check_retry(err, attempt, 'upload_file', uploader.offset)
+	attempt = 0
+	while True:
+		try:
+			return uploader.finish(destination, overwrite=True)
+		except _TRANSFER_ERRORS as err:
+			attempt += 1
+			_check_retry(err, attempt, 'upload_file', size)
+
+
+def _check_retry(error, attempt, func_name, offset):
+	""" Raise `error` if can't retry; otherwise wait before next attempt. """
+	if attempt > MAX_RETRIES or (dropbox and isinstance(error,
+			dropbox.rest.ErrorResponse) and error.status < 500):
+		raise error
+	_LOG.warn('%s: error at offset %d: %s; retrying (%d)', func_name, offset,
+			error, attempt)
+	time.sleep(RETRY_DELAY * attempt)
 
 
 def _delete_file(dbclient, path):
@@ -88,13 +185,14 @@ def _delete_file(dbclient, path):
 		_LOG.warn('_delete_file(%s) error: %s', path, error)
 
 
-def sync(load_only=False, notify_cb=_notify_progress):
+def sync(load_only=False, notify_cb=_notify_progress, force=False):
 	""" Sync data from/to given file.
 
 	Notify progress by publisher.
 
 	Args:
 		load_only: only load, not write data
+		force: load all objects from file (full resync)
 
 	Raises:
 		SyncLockedError when source file is locked.
@@ -105,65 +203,72 @@ def sync(load_only=False, notify_cb=_notify_progress):
 	if not appconfig.AppConfig().get('dropbox', 'oauth_secret'):
 		raise SYNC.OtherSyncError(_("Dropbox is not configured."))
 	notify_cb(0, _("Sync via Dropbox API...."))
-	notify_cb(1, _("Creating backup"))
-	SYNC.create_backup()
-	notify_cb(25, _("Checking sync lock"))
 	try:
 		dbclient = _create_session()
 	except dropbox.rest.ErrorResponse as error:
 		raise SYNC.OtherSyncError(_("Dropbox: connection failed: %s") %
 				str(error))
-	temp_file = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
-	temp_filename = temp_file.name
-	if create_sync_lock(dbclient):
-		notify_cb(2, _("Downloading..."))
+	SYNC.sync_transport(DropboxTransport(dbclient), load_only, notify_cb,
+			force)
+	return True
+
+
+class DropboxTransport(transport.Transport):
+	""" Sync file in Dropbox.
+
+	Args:
+		dbclient: dropbox client
+		path: path to sync file
+		lock_path: path to sync lock
+	"""
+
+	def __init__(self, dbclient, path=SYNC_PATH, lock_path=LOCK_PATH):
+		self._dbclient = dbclient
+		self._path = path
+		self._lock_path = lock_path
+		self.name = os.path.basename(path)
+
+	def stat(self):
 		try:
-			loaded = download_file(temp_file, SYNC_PATH, dbclient)
-			temp_file.close()
-			if loaded:
-				loader.load_from_file(temp_filename, notify_cb)
-			if not load_only:
-				exporter.save_to_file(temp_filename, notify_cb, 'GTD_SYNC.json')
-				_delete_file(dbclient, SYNC_PATH)
-				notify_cb(20, _("Uploading..."))
-				with open(temp_filename) as temp_file:
-					dbclient.put_file(SYNC_PATH, temp_file)
-		except Exception as err:
-			_LOG.exception("file sync error")
-			raise SYNC.OtherSyncError(err)
-		finally:
-			notify_cb(90, _("Removing sync lock"))
-			_delete_file(dbclient, LOCK_PATH)
-			with ignore_exceptions(IOError):
-				os.unlink(temp_filename)
-		notify_cb(100, _("Completed"))
-	else:
-		notify_cb(100, _("Synchronization file is locked. "
-			"Can't synchronize..."))
-		raise SYNC.SyncLockedError()
-
-
-def create_sync_lock(dbclient):
+			metadata = self._dbclient.metadata(self._path, list=False)
+		except dropbox.rest.ErrorResponse as error:
+			if error.status == 404:
+				return None
+			raise
+		if metadata.get('is_deleted'):
+			return None
+		return {'size': metadata.get('bytes', 0), 'rev': metadata.get('rev')}
+
+	def get(self, fileobj):
+		return download_file(fileobj, self._path, self._dbclient)
+
+	def put(self, fileobj, size):
+		upload_file(fileobj, self._path, self._dbclient, size)
+
+	def lock(self):
+		return create_sync_lock(self._dbclient, self._lock_path)
+
+	def unlock(self):
+		_delete_file(self._dbclient, self._lock_path)
+
+
+def create_sync_lock(dbclient, lock_path=LOCK_PATH):
 	""" Check if lockfile exists in sync folder. Create if not.
 
 	Args:
 		dbclient: dropbox client session
+		lock_path: path to lock file
 
 	Returns:
 		False, if directory is locked.
 	"""
 	try:
-		data = dbclient.metadata(LOCK_PATH)
+		data = dbclient.metadata(lock_path)
 		if data and data['bytes'] > 0:
 			return False
 	except dropbox.rest.ErrorResponse:
 		_LOG.exception('create_sync_lock get lock')
 
-	session = objects.Session()
-	device_id = session.query(objects.Conf).filter_by(  # pylint: disable=E1101
-			key='deviceId').first()
-	synclog = {'deviceId': device_id.val,
-			"startTime": exporter.fmt_date(datetime.datetime.utcnow())}
-	session.flush()  # pylint: disable=E1101
-	dbclient.put_file(LOCK_PATH, _JSON_ENCODER(synclog))
+	_device_id, lock_data = exporter.get_sync_lock_data()
+	dbclient.put_file(lock_path, lock_data)
 	return True
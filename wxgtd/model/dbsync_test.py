@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for dbsync module - transfers against local fake Dropbox server.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-20"
+
+import json
+import urlparse
+import SocketServer
+import threading
+import BaseHTTPServer
+from StringIO import StringIO
+from unittest import main, TestCase, skipIf
+
+from . import dbsync
+
+
+class _FakeDropboxServer(SocketServer.ThreadingMixIn,
+		BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+
+class _FakeDropboxHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	""" Minimal Dropbox API v1: metadata, files, chunked_upload, commit. """
+	protocol_version = 'HTTP/1.1'
+
+	def setup(self):
+		BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+		self.server.connections += 1
+
+	def log_message(self, *_args):
+		pass
+
+	def do_GET(self):
+		path, query = self._parse()
+		if path.startswith('/1/metadata/dropbox'):
+			fname = path[len('/1/metadata/dropbox'):]
+			if fname not in self.server.files:
+				return self._reply(404, {'error': 'not found'})
+			data, rev = self.server.files[fname]
+			return self._reply(200, {'path': fname, 'bytes': len(data),
+				'rev': rev})
+		if path.startswith('/1/files/dropbox'):
+			fname = path[len('/1/files/dropbox'):]
+			if self.server.unavailable:
+				return self._reply(503, {'error': 'unavailable'})
+			data, rev = self.server.files[fname]
+			assert query.get('rev') == rev
+			start, end = self.headers['Range'][6:].split('-')
+			data = data[int(start):int(end) + 1]
+			self.send_response(206)
+			self.send_header('Content-Length', str(len(data)))
+			self.end_headers()
+			if self._should_fail():
+				# connection dropped in the middle of transfer
+				self.wfile.write(data[:len(data) / 2])
+				self.close_connection = 1
+				return
+			self.wfile.write(data)
+			return
+		self._reply(404, {'error': 'unknown'})
+
+	def do_PUT(self):
+		path, query = self._parse()
+		body = self.rfile.read(int(self.headers['Content-Length']))
+		assert path == '/1/chunked_upload'
+		upload_id = query.get('upload_id')
+		if upload_id is None:
+			upload_id = 'upload%d' % len(self.server.uploads)
+			self.server.uploads[upload_id] = ''
+		offset = int(query.get('offset', 0))
+		current = self.server.uploads[upload_id]
+		if offset != len(current):
+			return self._reply(400, {'error': 'bad offset',
+				'upload_id': upload_id, 'offset': len(current)})
+		self.server.uploads[upload_id] = current + body
+		if self._should_fail():
+			# chunk stored but response lost
+			self.close_connection = 1
+			return
+		self._reply(200, {'upload_id': upload_id,
+			'offset': len(self.server.uploads[upload_id])})
+
+	def do_POST(self):
+		path, _query = self._parse()
+		body = self.rfile.read(int(self.headers['Content-Length']))
+		params = dict(urlparse.parse_qsl(body))
+		fname = path[len('/1/commit_chunked_upload/dropbox'):]
+		data = self.server.uploads.pop(params['upload_id'])
+		self.server.files[fname] = (data, 'rev%d' % len(data))
+		self._reply(200, {'path': fname, 'bytes': len(data)})
+
+	def _parse(self):
+		url = urlparse.urlparse(self.path)
+		return url.path, dict(urlparse.parse_qsl(url.query))
+
+	def _should_fail(self):
+		self.server.requests += 1
+		return bool(self.server.fail_every and
+				self.server.requests % self.server.fail_every == 0)
+
+	def _reply(self, status, data):
+		data = json.dumps(data)
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+
+if dbsync.dropbox:
+	class _LocalRESTClient(dbsync.dropbox.rest.RESTClientObject):
+		""" Rest client sending all requests to local server. """
+		def __init__(self, port):
+			dbsync.dropbox.rest.RESTClientObject.__init__(self)
+			self._base = 'http://127.0.0.1:%d' % port
+
+		def request(self, method, url, *args, **kwargs):
+			url = self._base + url[url.index('/', len('https://')):]
+			return dbsync.dropbox.rest.RESTClientObject.request(self, method,
+					url, *args, **kwargs)
+
+
+@skipIf(dbsync.dropbox is None, "dropbox not available")
+class TestTransfers(TestCase):
+	""" Test chunked download / upload. """
+
+	def setUp(self):
+		self._retry_delay = dbsync.RETRY_DELAY
+		dbsync.RETRY_DELAY = 0
+		self.server = _FakeDropboxServer(('127.0.0.1', 0), _FakeDropboxHandler)
+		self.server.files = {}
+		self.server.uploads = {}
+		self.server.connections = 0
+		self.server.requests = 0
+		self.server.fail_every = 0
+		self.server.unavailable = False
+		thread = threading.Thread(target=self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		sess = dbsync.dropbox.session.DropboxSession('key', 'secret',
+				'dropbox')
+		sess.set_token('token', 'token_secret')
+		self.client = dbsync.dropbox.client.DropboxClient(sess,
+				rest_client=_LocalRESTClient(self.server.server_port))
+		self.data = ''.join(chr(idx % 251) for idx in xrange(100000))
+
+	def tearDown(self):
+		# close keep-alive connections
+		self.client.rest_client.pool_manager.clear()
+		self.server.shutdown()
+		self.server.server_close()
+		dbsync.RETRY_DELAY = self._retry_delay
+
+	def test_download(self):
+		self.server.files['/sync.zip'] = (self.data, 'rev1')
+		out = StringIO()
+		self.assertTrue(dbsync.download_file(out, '/sync.zip', self.client,
+				chunk_size=8192))
+		self.assertEqual(out.getvalue(), self.data)
+		# connections are reused
+		self.assertEqual(self.server.connections, 1)
+
+	def test_download_resume(self):
+		self.server.files['/sync.zip'] = (self.data, 'rev1')
+		self.server.fail_every = 3
+		out = StringIO()
+		self.assertTrue(dbsync.download_file(out, '/sync.zip', self.client,
+				chunk_size=8192))
+		self.assertEqual(out.getvalue(), self.data)
+
+	def test_download_missing(self):
+		self.assertFalse(dbsync.download_file(StringIO(), '/sync.zip',
+				self.client))
+
+	def test_upload(self):
+		dbsync.upload_file(StringIO(self.data), '/sync.zip', self.client,
+				len(self.data), chunk_size=8192)
+		self.assertEqual(self.server.files['/sync.zip'][0], self.data)
+		self.assertEqual(self.server.connections, 1)
+
+	def test_upload_resume(self):
+		self.server.files['/sync.zip'] = ('old', 'rev1')
+		self.server.fail_every = 3
+		dbsync.upload_file(StringIO(self.data), '/sync.zip', self.client,
+				len(self.data), chunk_size=8192)
+		self.assertEqual(self.server.files['/sync.zip'][0], self.data)
+
+	def test_download_fail(self):
+		self.server.files['/sync.zip'] = (self.data, 'rev1')
+		self.server.unavailable = True
+		self.assertRaises(dbsync.dropbox.rest.ErrorResponse,
+				dbsync.download_file, StringIO(), '/sync.zip', self.client)
+
+
+if __name__ == '__main__':
+	main()
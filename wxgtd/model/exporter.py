@@ -20,6 +20,7 @@ import datetime
 import gettext
 import csv
 import sys
+import cStringIO
 try:
 	import cjson
 	_JSON_DECODER = cjson.decode
@@ -30,6 +31,7 @@ except ImportError:
 	_JSON_ENCODER = json.dumps
 
 from wxgtd.lib import fmt
+from wxgtd.lib import datetimeutils as DTU
 from wxgtd.model import objects
 from wxgtd.model import enums
 
@@ -52,17 +54,19 @@ def save_to_file(filename, notify_cb=_fake_update_func, internal_fname=None):
 		internal_fname: name of file inside zip file; default - filename
 			without ".zip" extension.
 	"""
+	# dump data before opening (truncating) file - interrupted dump must not
+	# destroy existing file
+	data = dump_database_to_json(notify_cb)
+	notify_cb(85, _("Writing..."))
 	if filename.endswith('.zip'):
 		with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zfile:
 			fname = internal_fname or os.path.basename(filename[:-4])
 			if not fname.endswith('.json'):
 				fname += '.json'
-			data = dump_database_to_json(notify_cb)
-			notify_cb(85, _("Writing..."))
 			zfile.writestr(fname, data)
 	else:
 		with open(filename, 'w') as ifile:
-			ifile.write(dump_database_to_json(notify_cb))
+			ifile.write(data)
 	notify_cb(99, _("Saved"))
 
 
@@ -77,7 +81,20 @@ def fmt_date(date):
 	"""
 	if not date:
 		return ""
-	return date.strftime("%Y-%m-%dT%H:%M:%S.") + date.strftime("%f")[:3] + 'Z'
+	value = _FMT_DATE_CACHE.get(date)
+	if value is None:
+		value = "%04d-%02d-%02dT%02d:%02d:%02d.%03dZ" % (date.year, date.month,
+				date.day, date.hour, date.minute, date.second,
+				date.microsecond // 1000)
+		if len(_FMT_DATE_CACHE) >= _FMT_DATE_CACHE_LIMIT:
+			_FMT_DATE_CACHE.clear()
+		_FMT_DATE_CACHE[date] = value
+	return value
+
+
+# formatted dates; the same values are written for task and its links
+_FMT_DATE_CACHE = {}
+_FMT_DATE_CACHE_LIMIT = 20000
 
 
 def _build_uuid_map(session, objclass):
@@ -178,23 +195,32 @@ def create_sync_lock(sync_filename):
 	Returns:
 		False, if directory is locked.
 	"""
-	session = objects.Session()
-	device_id = session.query(objects.Conf).filter_by(  # pylint: disable=E1101
-			key='deviceId').first()
-	synclog = {'deviceId': device_id.val,
-			"startTime": fmt_date(datetime.datetime.utcnow())}
-	session.flush()  # pylint: disable=E1101
-
+	device_id, lock_data = get_sync_lock_data()
 	lock_filename = os.path.join(os.path.dirname(sync_filename),
 			'sync.locked')
-	if not _check_existing_synclock(lock_filename, device_id.val):
+	if not _check_existing_synclock(lock_filename, device_id):
 		return False
 	_LOG.debug('create_sync_lock: writing synclog: %r', lock_filename)
 	with open(lock_filename, 'w') as ifile:
-		ifile.write(_JSON_ENCODER(synclog))
+		ifile.write(lock_data)
 	return True
 
 
+def get_sync_lock_data():
+	""" Prepare content of sync lock for this device.
+
+	Returns:
+		(device id, encoded lock data)
+	"""
+	session = objects.Session()
+	device_id = session.query(objects.Conf).filter_by(  # pylint: disable=E1101
+			key='deviceId').first()
+	synclog = {'deviceId': device_id.val,
+			"startTime": fmt_date(datetime.datetime.utcnow())}
+	session.flush()  # pylint: disable=E1101
+	return device_id.val, _JSON_ENCODER(synclog)
+
+
 def delete_sync_lock(sync_filename):
 	""" Delete sync lock file.
 
@@ -482,8 +508,34 @@ def _dump_notebooks(session, notify_cb, folders_cache):
 	return res
 
 
+# number of tasks loaded, formatted and written at once
+_EXPORT_BATCH_SIZE = 500
+
+
+def _iter_batches(tasks):
+	""" Split tasks into lists of _EXPORT_BATCH_SIZE elements.
+
+	Sqlalchemy queries are loaded in chunks (yield_per); iterators (i.e.
+	Task.iter_snapshots_by_filters) are consumed lazily.
+	"""
+	if hasattr(tasks, 'yield_per'):
+		tasks = tasks.yield_per(_EXPORT_BATCH_SIZE)
+	batch = []
+	for task in tasks:
+		batch.append(task)
+		if len(batch) >= _EXPORT_BATCH_SIZE:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
 def dump_tasks_to_csv(tasks, verbose, output=sys.stdout):
-	""" Export task list to stdout in cvs format. """
+	""" Export task list to stdout in cvs format.
+
+	Args:
+		tasks: Task or TaskSnapshot objects (list, query or iterator)
+	"""
 	fields = []
 	if verbose > 0:
 		fields = [_('Starred'), _('Type'), _('Priority')]
@@ -497,7 +549,8 @@ def dump_tasks_to_csv(tasks, verbose, output=sys.stdout):
 		fields.append(_('Note'))
 	if verbose > 1:
 		fields.append(_('Task UUID'))
-	writer = csv.writer(output, delimiter=';')
+	buff = cStringIO.StringIO()
+	writer = csv.writer(buff, delimiter=';')
 	writer.writerow([col.encode('utf-8') for col in fields])
 	types = {enums.TYPE_PROJECT: _('project'),
 			enums.TYPE_CHECKLIST: _('checklist'),
@@ -506,25 +559,37 @@ def dump_tasks_to_csv(tasks, verbose, output=sys.stdout):
 			enums.TYPE_RETURN_CALL: _('return call'),
 			enums.TYPE_EMAIL: _('email'),
 			enums.TYPE_SMS: _('sms')}
-	for task in tasks:
-		row = [task.title,
-				fmt.format_timestamp(task.completed, True),
-				fmt.format_timestamp(task.due_date, task.due_time_set),
-				fmt.format_timestamp(task.start_date, task.start_time_set)]
-		if verbose > 0:
-			row.append('*' if task.starred else '')
-			row.append(types.get(task.type, 'task'))
-			row.append(str(task.priority) if task.priority >= 0 else '')
-			row.append(fmt.format_timestamp(task.alarm, True))
-			row.append(task.repeat_pattern or '')
-			row.append(task.note or '')
-		if verbose > 1:
-			row.append(task.uuid)
-		writer.writerow([col.encode('utf-8') for col in row])
+	fmt_ts = fmt.format_timestamp
+	for batch in _iter_batches(tasks):
+		rows = []
+		for task in batch:
+			row = [task.title,
+					fmt_ts(task.completed, True),
+					fmt_ts(task.due_date, task.due_time_set),
+					fmt_ts(task.start_date, task.start_time_set)]
+			if verbose > 0:
+				row.append('*' if task.starred else '')
+				row.append(types.get(task.type, 'task'))
+				row.append(str(task.priority) if task.priority >= 0 else '')
+				row.append(fmt_ts(task.alarm, True))
+				row.append(task.repeat_pattern or '')
+				row.append(task.note or '')
+			if verbose > 1:
+				row.append(task.uuid)
+			rows.append([col.encode('utf-8') for col in row])
+		writer.writerows(rows)
+		output.write(buff.getvalue())
+		buff.seek(0)
+		buff.truncate()
+	output.write(buff.getvalue())
 
 
 def dump_tasks_to_text(tasks, verbose, output=sys.stdout, title_width=80):
-	""" Export task list to stdout in human-friendly format. """
+	""" Export task list to stdout in human-friendly format.
+
+	Args:
+		tasks: Task or TaskSnapshot objects (list, query or iterator)
+	"""
 	types = {enums.TYPE_PROJECT: 'P',
 			enums.TYPE_CHECKLIST: 'C',
 			enums.TYPE_CHECKLIST_ITEM: '-',
@@ -532,24 +597,145 @@ def dump_tasks_to_text(tasks, verbose, output=sys.stdout, title_width=80):
 			enums.TYPE_RETURN_CALL: 'r',
 			enums.TYPE_EMAIL: 'e',
 			enums.TYPE_SMS: 's'}
-	for task in tasks:
-		if verbose > 0:
-			output.write(('*' if task.starred else ' '))
-			output.write(types.get(task.type, ' '))
-			output.write(str(task.priority) if task.priority >= 0 else ' ')
-			output.write(' [F] ' if task.completed else '     ')
-		output.write('%-80s' % task.title[:title_width])
-		output.write('%-19s' % fmt.format_timestamp(task.due_date,
-			task.due_time_set))
-		output.write('%-19s' % fmt.format_timestamp(task.start_date,
-			task.start_time_set))
-		if verbose > 0:
-			flags = ("["
-					+ ("r" if task.repeat_pattern else " ")
-					+ ("a" if task.alarm else " ")
-					+ ("n" if task.note else " ")
-					+ "]")
-			output.write(flags + " ")
-		if verbose > 1:
-			output.write(task.uuid)
-		output.write('\n')
+	fmt_ts = fmt.format_timestamp
+	for batch in _iter_batches(tasks):
+		lines = []
+		for task in batch:
+			line = []
+			if verbose > 0:
+				line.append(('*' if task.starred else ' '))
+				line.append(types.get(task.type, ' '))
+				line.append(str(task.priority) if task.priority >= 0 else ' ')
+				line.append(' [F] ' if task.completed else '     ')
+			line.append('%-80s' % task.title[:title_width])
+			line.append('%-19s' % fmt_ts(task.due_date, task.due_time_set))
+			line.append('%-19s' % fmt_ts(task.start_date, task.start_time_set))
+			if verbose > 0:
+				line.append("["
+						+ ("r" if task.repeat_pattern else " ")
+						+ ("a" if task.alarm else " ")
+						+ ("n" if task.note else " ")
+						+ "] ")
+			if verbose > 1:
+				line.append(task.uuid)
+			line.append('\n')
+			lines.append(''.join(line))
+		output.write(''.join(lines))
+
+
+# columns exported to json lines
+_JSONL_FIELDS = ('uuid', 'parent_uuid', 'type', 'title', 'note', 'starred',
+		'status', 'priority', 'importance', 'start_time_set', 'due_time_set',
+		'repeat_pattern', 'folder_uuid', 'context_uuid', 'goal_uuid')
+_JSONL_DATE_FIELDS = ('modified', 'completed', 'start_date', 'due_date',
+		'due_date_project', 'alarm', 'hide_until')
+
+
+def dump_tasks_to_jsonl(tasks, output=sys.stdout):
+	""" Export task list in JSON Lines format (one object per line);
+	timestamps are in UTC in sync file format.
+
+	Args:
+		tasks: Task or TaskSnapshot objects (list, query or iterator)
+	"""
+	for batch in _iter_batches(tasks):
+		lines = []
+		for task in batch:
+			row = dict((key, getattr(task, key)) for key in _JSONL_FIELDS)
+			for key in _JSONL_DATE_FIELDS:
+				row[key] = fmt_date(getattr(task, key)) or None
+			line = _JSON_ENCODER(row)
+			if isinstance(line, unicode):
+				line = line.encode('utf-8')
+			lines.append(line)
+			lines.append('\n')
+		output.write(''.join(lines))
+
+
+# task priority -> iCalendar priority (1 - highest, 9 - lowest)
+_ICAL_PRIORITIES = {3: 1, 2: 3, 1: 5, 0: 9}
+
+
+def dump_tasks_to_ical(tasks, output=sys.stdout):
+	""" Export task list as iCalendar (RFC 5545) VTODO components.
+
+	Start and due dates are exported as local dates when none of them has
+	time; other timestamps in UTC.
+
+	Args:
+		tasks: Task or TaskSnapshot objects (list, query or iterator)
+	"""
+	def ical_date(name, timestamp, with_time=True):
+		if with_time:
+			return "%s:%s" % (name, timestamp.strftime("%Y%m%dT%H%M%SZ"))
+		return "%s;VALUE=DATE:%s" % (name, DTU.datetime_utc2local_naive(
+				timestamp).strftime("%Y%m%d"))
+
+	now = datetime.datetime.utcnow()
+	output.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+			"PRODID:-//wxGTD//NONSGML wxGTD//EN\r\n")
+	for batch in _iter_batches(tasks):
+		lines = []
+		for task in batch:
+			lines.append("BEGIN:VTODO")
+			lines.append("UID:" + task.uuid)
+			lines.append(ical_date("DTSTAMP", task.modified or now))
+			if task.modified:
+				lines.append(ical_date("LAST-MODIFIED", task.modified))
+			lines.append("SUMMARY:" + _ical_escape(task.title or ''))
+			if task.note:
+				lines.append("DESCRIPTION:" + _ical_escape(task.note))
+			due_date = task.due_date_project if task.type == \
+					enums.TYPE_PROJECT else task.due_date
+			# DTSTART and DUE must have the same value type; dates only when
+			# none of them has time
+			with_time = bool((task.start_date and task.start_time_set)
+					or (due_date and task.due_time_set))
+			if task.start_date:
+				lines.append(ical_date("DTSTART", task.start_date, with_time))
+			if due_date:
+				lines.append(ical_date("DUE", due_date, with_time))
+			if task.completed:
+				lines.append(ical_date("COMPLETED", task.completed))
+				lines.append("STATUS:COMPLETED")
+			else:
+				lines.append("STATUS:NEEDS-ACTION")
+			if task.priority in _ICAL_PRIORITIES:
+				lines.append("PRIORITY:%d" % _ICAL_PRIORITIES[task.priority])
+			if task.parent_uuid:
+				lines.append("RELATED-TO:" + task.parent_uuid)
+			if task.alarm:
+				lines.append("BEGIN:VALARM")
+				lines.append("ACTION:DISPLAY")
+				lines.append(ical_date("TRIGGER;VALUE=DATE-TIME", task.alarm))
+				lines.append("DESCRIPTION:" + _ical_escape(task.title or ''))
+				lines.append("END:VALARM")
+			lines.append("END:VTODO")
+		output.write(''.join(_ical_fold(line) for line in lines))
+	output.write("END:VCALENDAR\r\n")
+
+
+def _ical_escape(text):
+	return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+			.replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _ical_fold(line):
+	""" Encode line and fold it into 75-octets lines ended by CRLF. """
+	if isinstance(line, unicode):
+		line = line.encode('utf-8')
+	if len(line) <= 75:
+		return line + "\r\n"
+	parts = []
+	# continuation lines start with space
+	limit = 75
+	while len(line) > limit:
+		# don't split utf-8 sequences
+		idx = limit
+		while (ord(line[idx]) & 0xc0) == 0x80:
+			idx -= 1
+		parts.append(line[:idx])
+		line = line[idx:]
+		limit = 74
+	parts.append(line)
+	return "\r\n ".join(parts) + "\r\n"
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for exporter module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-23"
+
+import os
+import json
+import random
+import shutil
+import datetime
+import tempfile
+import StringIO
+from unittest import main, TestCase
+
+from wxgtd.lib import appconfig
+from . import db
+from . import enums
+from . import exporter
+from . import loader
+from . import queries
+from . import objects as OBJ
+
+
+class TestFmtDate(TestCase):
+	""" Test formatting timestamps. """
+
+	def test_format(self):
+		self.assertEqual(exporter.fmt_date(None), "")
+		self.assertEqual(exporter.fmt_date(datetime.datetime(2013, 3, 2, 1, 7,
+				6, 461999)), "2013-03-02T01:07:06.461Z")
+		self.assertEqual(exporter.fmt_date(datetime.datetime(2013, 3, 2)),
+				"2013-03-02T00:00:00.000Z")
+		# strftime fails for such dates
+		self.assertEqual(exporter.fmt_date(datetime.datetime(1, 1, 1)),
+				"0001-01-01T00:00:00.000Z")
+
+	def test_round_trip(self):
+		rand = random.Random(0)
+		start = datetime.datetime(1970, 1, 1)
+		for _idx in xrange(2000):
+			date = start + datetime.timedelta(seconds=rand.randint(0, 2 ** 31),
+					milliseconds=rand.randint(0, 999))
+			string = exporter.fmt_date(date)
+			self.assertEqual(string, date.strftime("%Y-%m-%dT%H:%M:%S.") +
+					date.strftime("%f")[:3] + 'Z')
+			self.assertEqual(loader.str2datetime_utc(string), date)
+
+
+class TestDumpTasks(TestCase):
+	""" Export task lists; the same output for tasks and task snapshots. """
+
+	def setUp(self):
+		appconfig.AppConfig('wxgtd.cfg', 'wxgtd-test')
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		self.session = OBJ.Session()
+		now = datetime.datetime(2013, 7, 20, 10, 0)
+		self.session.add(OBJ.Task(title=u'zadanie \u0105', priority=2,
+				starred=1, due_date=now, due_time_set=1, note='note',
+				repeat_pattern='Daily'))
+		self.session.add(OBJ.Task(title='project', type=enums.TYPE_PROJECT,
+				priority=-1, completed=now, start_date=now))
+		self.session.commit()
+		self.params = queries.build_query_params(queries.QUERY_ALL_TASK,
+				queries.OPT_SHOW_FINISHED, None, '')
+
+	def tearDown(self):
+		self.session.close()
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def _dump(self, func, tasks):
+		output = StringIO.StringIO()
+		func(tasks, 2, output=output)
+		return output.getvalue()
+
+	def test_snapshot(self):
+		tasks = OBJ.Task.select_by_filters(self.params,
+				session=self.session).all()
+		snapshots = OBJ.Task.select_by_filters(self.params,
+				session=self.session, snapshot=True)
+		self.assertEqual([task.uuid for task in snapshots],
+				[task.uuid for task in tasks])
+		self.assertTrue(all(isinstance(task, OBJ.TaskSnapshot)
+				for task in snapshots))
+		for func in (exporter.dump_tasks_to_text, exporter.dump_tasks_to_csv):
+			self.assertEqual(self._dump(func, snapshots), self._dump(func, tasks))
+		self.assertEqual(len(self._dump(exporter.dump_tasks_to_csv,
+				snapshots).splitlines()), 3)
+
+	def test_stream(self):
+		tasks = OBJ.Task.select_by_filters(self.params,
+				session=self.session).all()
+		for func in (exporter.dump_tasks_to_text, exporter.dump_tasks_to_csv):
+			self.assertEqual(self._dump(func, OBJ.Task.iter_snapshots_by_filters(
+					self.params, session=self.session, batch_size=1)),
+					self._dump(func, tasks))
+			# query is loaded in chunks
+			self.assertEqual(self._dump(func, OBJ.Task.select_by_filters(
+					self.params, session=self.session)), self._dump(func, tasks))
+
+	def test_jsonl(self):
+		output = StringIO.StringIO()
+		exporter.dump_tasks_to_jsonl(OBJ.Task.iter_snapshots_by_filters(
+				self.params, session=self.session), output=output)
+		rows = [json.loads(line) for line in output.getvalue().splitlines()]
+		self.assertEqual(sorted(row['title'] for row in rows),
+				[u'project', u'zadanie \u0105'])
+		task = [row for row in rows if row['title'] == 'project'][0]
+		self.assertEqual(task['completed'], '2013-07-20T10:00:00.000Z')
+		self.assertIsNone(task['due_date'])
+		self.assertEqual(task['type'], enums.TYPE_PROJECT)
+
+	def test_ical(self):
+		self.session.add(OBJ.Task(title=u'\u0105' * 60 + u'; a,b',
+				note='line1\nline2'))
+		self.session.commit()
+		output = StringIO.StringIO()
+		exporter.dump_tasks_to_ical(OBJ.Task.iter_snapshots_by_filters(
+				self.params, session=self.session), output=output)
+		data = output.getvalue()
+		lines = data.split('\r\n')
+		self.assertEqual(lines[0], 'BEGIN:VCALENDAR')
+		self.assertEqual(lines[-2:], ['END:VCALENDAR', ''])
+		self.assertTrue(all(len(line) <= 75 for line in lines))
+		unfolded = data.replace('\r\n ', '').decode('utf-8').split('\r\n')
+		self.assertEqual(unfolded.count('BEGIN:VTODO'), 3)
+		self.assertIn(u'SUMMARY:' + u'\u0105' * 60 + u'\\; a\\,b', unfolded)
+		self.assertIn(u'DESCRIPTION:line1\\nline2', unfolded)
+		self.assertIn(u'DUE:20130720T100000Z', unfolded)
+		self.assertIn(u'COMPLETED:20130720T100000Z', unfolded)
+		self.assertIn(u'PRIORITY:3', unfolded)
+
+	def _dump_ical_dates(self, **kwargs):
+		self.session.query(OBJ.Task).delete()
+		self.session.add(OBJ.Task(title='task', **kwargs))
+		self.session.commit()
+		output = StringIO.StringIO()
+		exporter.dump_tasks_to_ical(OBJ.Task.iter_snapshots_by_filters(
+				self.params, session=self.session), output=output)
+		return [line for line in output.getvalue().split('\r\n')
+				if line.startswith(('DTSTART', 'DUE'))]
+
+	def test_ical_dates_value_type(self):
+		date = datetime.datetime(2013, 7, 20, 10, 0)
+		# start without time, due with time - both as date-time
+		self.assertEqual(self._dump_ical_dates(start_date=date,
+				due_date=date, due_time_set=1),
+				['DTSTART:20130720T100000Z', 'DUE:20130720T100000Z'])
+		self.assertEqual(self._dump_ical_dates(start_date=date,
+				start_time_set=1, due_date=date),
+				['DTSTART:20130720T100000Z', 'DUE:20130720T100000Z'])
+		# no time - both as dates
+		lines = self._dump_ical_dates(start_date=date, due_date=date)
+		self.assertEqual([line.split(':')[0] for line in lines],
+				['DTSTART;VALUE=DATE', 'DUE;VALUE=DATE'])
+
+
+if __name__ == '__main__':
+	main()
@@ -28,7 +28,7 @@ except ImportError:
 	_JSON_ENCODER = json.dumps
 
 from dateutil import parser, tz
-from sqlalchemy import func
+from sqlalchemy import func, Table, MetaData, Column, String, DateTime
 
 from wxgtd.model import objects
 from wxgtd.model import enums
@@ -42,13 +42,15 @@ def _fake_update_func(*args, **kwargs):
 	_LOG.info("progress %r %r", args, kwargs)
 
 
-def load_from_file(filename, notify_cb=_fake_update_func, force=False):
+def load_from_file(filename, notify_cb=_fake_update_func, force=False,
+		incremental=False):
 	"""Load data from (zip)file.
 
 	Args:
 		filename: file to load
 		notify_cb: function called in each step.
 		force: don't check timestamps in synclog; always sync
+		incremental: load only objects modified since last known sync
 
 	Returns:
 		True if success.
@@ -60,41 +62,14 @@ def load_from_file(filename, notify_cb=_fake_update_func, force=False):
 	if filename.endswith(".zip"):
 		with zipfile.ZipFile(filename, "r") as zfile:
 			fname = zfile.namelist()[0]
-			return load_json(zfile.read(fname), notify_cb, force)
+			return load_json(zfile.read(fname), notify_cb, force,
+					incremental)
 	else:
 		with open(filename, "r") as ifile:
-			return load_json(ifile.read(), notify_cb, force)
+			return load_json(ifile.read(), notify_cb, force, incremental)
 	return False
 
 
-def _create_or_update(session, cls, datadict):
-	""" Create object given class or update existing with loaded data.
-
-	Args:
-		session: sqlalchemy session
-		cls: class object to load/created.
-		datadict: data (dict) to set in object
-
-	Returns:
-		Updated or created object.
-	"""
-	_LOG.debug("_create_or_update(%r, %r)", cls, datadict.get("_id", datadict))
-	uuid = datadict.pop("uuid")
-	obj = session.query(cls).filter_by(uuid=uuid).first()
-	if obj:
-		modified = datadict.get("modified")
-		if not modified or modified > obj.modified:
-			# load only modified objs
-			_LOG.debug('_create_or_update(%r, %r): update', cls, uuid)
-			obj.load_from_dict(datadict)
-	else:
-		_LOG.debug('_create_or_update(%r, %r): create', cls, uuid)
-		obj = cls(uuid=uuid)
-		obj.load_from_dict(datadict)
-		session.add(obj)
-	return obj
-
-
 def _replace_ids(objdict, cache, key_id, key_uuid=None):
 	""" Replace ids objects in loaded data by suitable uuid.
 
@@ -125,6 +100,12 @@ def _replace_ids(objdict, cache, key_id, key_uuid=None):
 	return res
 
 
+# parsed timestamps; values in sync file are often repeated (i.e. created and
+# modified in links)
+_TIMESTAMPS_CACHE = {}
+_TIMESTAMPS_CACHE_LIMIT = 20000
+
+
 def str2datetime_utc(string):
 	""" Convert string like "2013-03-22T21:27:46.461Z" into timestamp.
 
@@ -135,15 +116,46 @@ def str2datetime_utc(string):
 		Timestamp as long or None if error.
 	"""
 	if string and len(string) > 18:
+		value = _TIMESTAMPS_CACHE.get(string)
+		if value is not None:
+			return value
+		value = _parse_timestamp(string)
+		if value is not None:
+			if len(_TIMESTAMPS_CACHE) >= _TIMESTAMPS_CACHE_LIMIT:
+				_TIMESTAMPS_CACHE.clear()
+			_TIMESTAMPS_CACHE[string] = value
+			return value
+	_LOG.error("Wrong string %r", string)
+	return None
+
+
+def _parse_timestamp(string):
+	""" Parse timestamp in format written by exporter.fmt_date
+	("YYYY-MM-DDTHH:MM:SS.mmmZ", milliseconds are optional); other formats
+	are parsed by dateutil. """
+	if string[-1] == 'Z' and string[4] == '-' and string[7] == '-' and \
+			string[10] == 'T' and string[13] == ':' and string[16] == ':':
+		length = len(string)
 		try:
-			value = parser.parse(string)
-			# convert to UTC
-			value = value.astimezone(tz.tzutc())
-			# remove timezone
-			return value.replace(tzinfo=None)
+			if length == 24 and string[19] == '.':
+				return datetime.datetime(int(string[:4]), int(string[5:7]),
+						int(string[8:10]), int(string[11:13]),
+						int(string[14:16]), int(string[17:19]),
+						int(string[20:23]) * 1000)
+			if length == 20:
+				return datetime.datetime(int(string[:4]), int(string[5:7]),
+						int(string[8:10]), int(string[11:13]),
+						int(string[14:16]), int(string[17:19]))
 		except ValueError:
-			_LOG.exception("str2datetime_utc %r", string)
-	_LOG.error("Wrong string %r", string)
+			pass
+	try:
+		value = parser.parse(string)
+		# convert to UTC
+		value = value.astimezone(tz.tzutc())
+		# remove timezone
+		return value.replace(tzinfo=None)
+	except ValueError:
+		_LOG.exception("str2datetime_utc %r", string)
 	return None
 
 
@@ -156,7 +168,6 @@ def _convert_timestamps(dictobj, *fields):
 		dictobj: loaded object as dict
 		fields: list of additional fields to convert
 	"""
-	_LOG.error("fields=%r", fields)
 
 	def convert(fld):
 		value = dictobj.get(fld)
@@ -285,34 +296,105 @@ def _check_synclog(data, session):
 	return False
 
 
+def _find_sync_mark(data, session):
+	""" Find time since which objects in sync file may be changed.
+
+	For each device that synced after our last load objects modified by it
+	are newer than its sync time known to us, so the earliest such time
+	is the high-water mark. Older objects were already loaded.
+
+	Returns:
+		Mark as datetime or None when full load is required (unknown device).
+	"""
+	mark = None
+	for synclog in data.get("syncLog") or []:
+		file_sync_time_str = synclog.get("syncTime")
+		if not file_sync_time_str:
+			continue
+		file_sync_time = str2datetime_utc(file_sync_time_str)
+		last_sync_time = session.query(func.max(objects.SyncLog.sync_time)).\
+				filter_by(device_id=synclog['deviceId']).\
+				scalar()
+		if not last_sync_time:
+			_LOG.info("_find_sync_mark: unknown device %r; full load",
+					synclog['deviceId'])
+			return None
+		if last_sync_time < file_sync_time:
+			if mark is None or last_sync_time < mark:
+				mark = last_sync_time
+	_LOG.debug("_find_sync_mark: %r", mark)
+	return mark
+
+
+def _not_modified_since(objdict, mark):
+	""" Check is loaded object not modified after `mark`.
+
+	Args:
+		objdict: loaded object as dict (before timestamps conversion)
+		mark: datetime or None (=always load)
+
+	Returns:
+		True when object can be skipped.
+	"""
+	if mark is None:
+		return False
+	modified = objdict.get("modified")
+	if not modified:
+		return False
+	modified = str2datetime_utc(modified)
+	return bool(modified) and modified <= mark
+
+
 def sort_objects_by_parent(objs):
 	""" Sort objects by parent.
 	Put first object with no parent. Then object with known parent (already
 	existing in result objects). Etc.
+
+	Objects with unknown parent are treated as top-level. Objects in cycles
+	(and their children) are put at the end of result. Both are logged.
 	"""
 	if not objs:
 		return []
-	all_objs_count = len(objs)
-	# no parent
-	result = [x for x in objs if x["parent_id"] == 0]
-	result_uuids = set(obj["_id"] for obj in result)
-	objs = [x for x in objs if x["parent_id"] != 0]
-	# rest
-	while objs:
-		objs_to_add = [x for x in objs if x["parent_id"] in result_uuids]
-		objs = [x for x in objs if x["parent_id"] not in result_uuids]
-		result.extend(objs_to_add)
-		result_uuids.update(obj["_id"] for obj in objs_to_add)
-	assert len(result) == all_objs_count
+	known_ids = set(obj["_id"] for obj in objs)
+	# parent id -> list of children
+	children = {}
+	result = []
+	for obj in objs:
+		parent_id = obj["parent_id"]
+		if not parent_id:
+			result.append(obj)
+		elif parent_id not in known_ids:
+			_LOG.warn("sort_objects_by_parent: missing parent of %r", obj)
+			result.append(obj)
+		else:
+			children.setdefault(parent_id, []).append(obj)
+	# breadth-first; each object is visited once
+	idx = 0
+	while idx < len(result):
+		result.extend(children.pop(result[idx]["_id"], ()))
+		idx += 1
+	if children:
+		# not reachable from top-level objects
+		remaining = [obj for obj in objs if obj["parent_id"] in children]
+		_LOG.error("sort_objects_by_parent: cycle in parents: %r",
+				[obj["_id"] for obj in remaining])
+		result.extend(remaining)
 	return result
 
 
-def load_json(strdata, notify_cb, force=False):
+def load_json(strdata, notify_cb, force=False, incremental=False):
 	""" Load data from json string.
 
+	Loading is split into two stages: records are converted into rows ready
+	to write (ids replaced by uuids, timestamps parsed) and then written to
+	database in batches.
+
 	Args:
 		strdata: json-encoded data
 		notify_cb: function called on each step.
+		force: don't check timestamps in synclog; always load all objects
+		incremental: load only objects modified since last known sync of
+			devices; when sync history is incomplete all objects are loaded.
 
 	Returns:
 		true if success.
@@ -327,21 +409,36 @@ def load_json(strdata, notify_cb, force=False):
 		_LOG.info("load_json: no loading file")
 		return True
 
-	# 5: load
-	folders_cache = _load_folders(data, session, notify_cb)
-	contexts_cache = _load_contexts(data, session, notify_cb)
-	goals_cache = _load_goals(data, session, notify_cb)
-	tasks_cache = _load_tasks(data, session, notify_cb)
-	tasknotes_cache = _load_tasknotes(data, session, tasks_cache, notify_cb)
-	_load_alarms(data, session, tasks_cache, notify_cb)
-	_load_task_folders(data, session, tasks_cache, folders_cache, notify_cb)
-	_load_task_contexts(data, session, tasks_cache, contexts_cache, notify_cb)
-	_load_task_goals(data, session, tasks_cache, goals_cache, notify_cb)
-	tags_cache = _load_tags(data, session, notify_cb)
-	_load_task_tags(data, session, tasks_cache, tags_cache, notify_cb)
-	notebooks_cache = _load_notebooks(data, session, notify_cb)
-	_load_notebook_folders(data, session, notebooks_cache, folders_cache,
-			notify_cb)
+	mark = None
+	if incremental and not force:
+		mark = _find_sync_mark(data, session)
+		if mark:
+			_LOG.info("load_json: loading objects modified since %r", mark)
+			notify_cb(16, _("Loading changes"))
+
+	# 5: prepare
+	notify_cb(17, _("Preparing data"))
+	caches = dict((kind, _build_id_uuid_map(data.get(kind)))
+			for kind in _CACHED_KINDS)
+	# uuids of tasks and pages loaded in this run; links to it are always loaded
+	loaded = {'task': _loaded_uuids(data.get('task'), mark),
+			'notebook': _loaded_uuids(data.get('notebook'), mark)}
+	rows = _prepare_data(data, mark, caches, loaded)
+
+	# 6: write
+	_load_folders(rows, session, notify_cb)
+	_load_contexts(rows, session, notify_cb)
+	_load_goals(rows, session, notify_cb)
+	tasks = _load_tasks(rows, session, notify_cb)
+	_load_tasknotes(rows, session, notify_cb)
+	_load_alarms(rows, session, tasks, notify_cb)
+	_load_task_folders(rows, session, tasks, notify_cb)
+	_load_task_contexts(rows, session, tasks, notify_cb)
+	_load_task_goals(rows, session, tasks, notify_cb)
+	_load_tags(rows, session, notify_cb)
+	_load_task_tags(rows, session, notify_cb)
+	pages = _load_notebooks(rows, session, notify_cb)
+	_load_notebook_folders(rows, session, pages, notify_cb)
 	_load_synclog(data, session, notify_cb)
 
 	my_dev_id = session.query(  # pylint: disable=E1101
@@ -354,22 +451,22 @@ def load_json(strdata, notify_cb, force=False):
 		last_prev_sync_time = last_sync_obj.sync_time
 		notify_cb(80, _("Cleanup"))
 		# pokasowanie staroci
-		deleted_cnt = _cleanup_tasks(set(tasks_cache.itervalues()),
+		deleted_cnt = _cleanup_tasks(set(caches['task'].itervalues()),
 				last_prev_sync_time, session)
 		notify_cb(81, _("Removed tasks: %d") % deleted_cnt)
-		deleted_cnt = _cleanup_unused(objects.Folder, folders_cache,
+		deleted_cnt = _cleanup_unused(objects.Folder, caches['folder'],
 				last_prev_sync_time, session)
 		notify_cb(82, _("Removed folders: %d") % deleted_cnt)
-		deleted_cnt = _cleanup_unused(objects.Context, contexts_cache,
+		deleted_cnt = _cleanup_unused(objects.Context, caches['context'],
 				last_prev_sync_time, session)
 		notify_cb(83, _("Removed contexts: %d") % deleted_cnt)
-		deleted_cnt = _cleanup_unused(objects.Tasknote, tasknotes_cache,
+		deleted_cnt = _cleanup_unused(objects.Tasknote, caches['tasknote'],
 				last_prev_sync_time, session)
 		notify_cb(84, _("Removed task notes: %d") % deleted_cnt)
-		deleted_cnt = _cleanup_unused(objects.Goal, goals_cache,
+		deleted_cnt = _cleanup_unused(objects.Goal, caches['goal'],
 				last_prev_sync_time, session)
 		notify_cb(85, _("Removed goals %d") % deleted_cnt)
-		deleted_cnt = _cleanup_notebooks(set(notebooks_cache.itervalues()),
+		deleted_cnt = _cleanup_notebooks(set(caches['notebook'].itervalues()),
 				last_prev_sync_time, session)
 		notify_cb(86, _("Removed notebook pages: %d") % deleted_cnt)
 
@@ -390,256 +487,372 @@ def load_json(strdata, notify_cb, force=False):
 	return True
 
 
-def _load_folders(data, session, notify_cb):
+##############################################################################
+# prepare stage - convert records without database access
+
+# kinds of objects referenced by _id
+_CACHED_KINDS = ('folder', 'context', 'goal', 'task', 'tasknote', 'tag',
+		'notebook')
+# kinds of records in load order; objects with parents are sorted
+_PREPARED_KINDS = ('folder', 'context', 'goal', 'task', 'tasknote', 'alarm',
+		'task_folder', 'task_context', 'task_goal', 'tag', 'task_tag',
+		'notebook', 'notebook_folder')
+_TREE_KINDS = ('folder', 'context', 'goal', 'task', 'tag')
+# links to task: kind -> (cache, id key)
+_TASK_LINKS = {'task_folder': ('folder', 'folder_id'),
+		'task_context': ('context', 'context_id'),
+		'task_goal': ('goal', 'goal_id')}
+
+
+def _loaded_uuids(records, mark):
+	""" Get uuids of objects that will be loaded (modified after `mark`). """
+	return set(rec.get('uuid') for rec in records or []
+			if not _not_modified_since(rec, mark))
+
+
+def _prepare_data(data, mark, caches, loaded):
+	""" Convert records from `data` into rows ready to write.
+
+	Records are removed from `data`.
+
+	Returns:
+		dict kind -> list of rows
+	"""
+	rows = {}
+	for kind in _PREPARED_KINDS:
+		records = data.pop(kind, None)
+		if not records:
+			rows[kind] = []
+			continue
+		if kind in _TREE_KINDS:
+			records = sort_objects_by_parent(records)
+		rows[kind] = _prepare_records(kind, records, mark, caches, loaded)
+	return rows
+
+
+def _prepare_records(kind, records, mark, caches, loaded):
+	""" Convert list of records one kind; skip not modified and invalid.
+
+	Args:
+		kind: kind of records
+		records: list of records
+		mark: load only records modified after mark (if set)
+		caches: maps id -> uuid for each kind
+		loaded: uuids of tasks and notebooks loaded in this run
+	"""
+	result = []
+	if kind in _TREE_KINDS:
+		cache = caches[kind]
+		for rec in records:
+			if _not_modified_since(rec, mark):
+				continue
+			_replace_ids(rec, cache, "parent_id")
+			if kind == 'task':
+				_convert_timestamps(rec, "completed", "start_date", "due_date",
+						"due_date_project", "hide_until")
+				rec["context_uuid"] = None
+				rec["folder_uuid"] = None
+				rec["goal_uuid"] = None
+			else:
+				_convert_timestamps(rec)
+			result.append(rec)
+	elif kind == 'tasknote':
+		for rec in records:
+			if _not_modified_since(rec, mark):
+				continue
+			_replace_ids(rec, caches['task'], "task_id")
+			_convert_timestamps(rec)
+			result.append(rec)
+	elif kind == 'notebook':
+		for rec in records:
+			if _not_modified_since(rec, mark):
+				continue
+			_convert_timestamps(rec)
+			rec['folder_uuid'] = None
+			result.append(rec)
+	elif kind == 'alarm':
+		loaded_tasks = loaded['task']
+		for rec in records:
+			task_uuid = _replace_ids(rec, caches['task'], "task_id")
+			if not task_uuid:
+				_LOG.error("load alarm error %r", rec)
+				continue
+			if task_uuid not in loaded_tasks and \
+					_not_modified_since(rec, mark):
+				continue
+			_convert_timestamps(rec, "alarm")
+			result.append(rec)
+	elif kind == 'task_tag':
+		for rec in records:
+			if _not_modified_since(rec, mark):
+				continue
+			task_uuid = _replace_ids(rec, caches['task'], "task_id")
+			tag_uuid = _replace_ids(rec, caches['tag'], "tag_id")
+			if not task_uuid or not tag_uuid:
+				_LOG.error("load task tag error %r; %r; %r", rec, task_uuid,
+						tag_uuid)
+				continue
+			_convert_timestamps(rec)
+			result.append(rec)
+	else:
+		# links task/notebook -> folder/context/goal
+		if kind == 'notebook_folder':
+			obj_kind, obj_key = 'notebook', 'notebook_id'
+			cache_name, key = 'folder', 'folder_id'
+		else:
+			obj_kind, obj_key = 'task', 'task_id'
+			cache_name, key = _TASK_LINKS[kind]
+		loaded_objs = loaded[obj_kind]
+		for rec in records:
+			obj_uuid = _replace_ids(rec, caches[obj_kind], obj_key)
+			dest_uuid = _replace_ids(rec, caches[cache_name], key)
+			if not obj_uuid or not dest_uuid:
+				_LOG.error("load %s error %r; %r; %r", kind, rec, obj_uuid,
+						dest_uuid)
+				continue
+			if obj_uuid not in loaded_objs and _not_modified_since(rec, mark):
+				continue
+			_convert_timestamps(rec)
+			result.append(rec)
+	return result
+
+
+##############################################################################
+# write stage
+
+# max number of uuids in one query
+_FETCH_BATCH_SIZE = 500
+
+
+def _fetch_by_uuid(session, cls, uuids):
+	""" Load objects by uuids in batches.
+
+	Returns:
+		dict uuid -> object
+	"""
+	uuids = list(uuids)
+	result = {}
+	for start in xrange(0, len(uuids), _FETCH_BATCH_SIZE):
+		for obj in session.query(cls).filter(  # pylint: disable=E1101
+				cls.uuid.in_(uuids[start:start + _FETCH_BATCH_SIZE])):
+			result[obj.uuid] = obj
+	return result
+
+
+def _write_objects(session, cls, rows):
+	""" Create objects given class or update existing with loaded rows.
+
+	Existing objects are updated only when loaded are newer.
+
+	Returns:
+		dict uuid -> created or updated object
+	"""
+	result = _fetch_by_uuid(session, cls, set(row['uuid'] for row in rows))
+	for row in rows:
+		uuid = row.pop("uuid")
+		obj = result.get(uuid)
+		if obj:
+			modified = row.get("modified")
+			if not modified or modified > obj.modified:
+				# load only modified objs
+				obj.load_from_dict(row)
+		else:
+			obj = result[uuid] = cls(uuid=uuid)
+			obj.load_from_dict(row)
+			session.add(obj)
+	return result
+
+
+def _get_link_targets(session, cls, rows, key, loaded):
+	""" Get objects (created or updated in this load or existing in
+	database) for link rows; key is name of uuid attribute in row. """
+	missing = set(row[key] for row in rows) - set(loaded)
+	if not missing:
+		return loaded
+	result = dict(loaded)
+	result.update(_fetch_by_uuid(session, cls, missing))
+	return result
+
+
+def _load_folders(rows, session, notify_cb):
 	_LOG.info("_load_folders")
 	notify_cb(6, _("Loading folders"))
-	folders = data.get("folder")
-	folders_cache = _build_id_uuid_map(folders)
-	for folder in sort_objects_by_parent(folders):  # musi być sortowane,
-		# bo nie znajdzie parenta
-		_replace_ids(folder, folders_cache, "parent_id")
-		_convert_timestamps(folder)
-		_create_or_update(session, objects.Folder, folder)
-	if folders:
-		del data["folder"]
-	notify_cb(10, _("Loaded %d folders") % len(folders_cache))
-	return folders_cache
-
-
-def _load_contexts(data, session, notify_cb):
+	folders = _write_objects(session, objects.Folder, rows['folder'])
+	notify_cb(10, _("Loaded %d folders") % len(folders))
+
+
+def _load_contexts(rows, session, notify_cb):
 	_LOG.info("_load_contexts")
 	notify_cb(11, _("Loading contexts"))
-	contexts = data.get("context")
-	contexts_cache = _build_id_uuid_map(contexts)
-	for context in sort_objects_by_parent(contexts):
-		_replace_ids(context, contexts_cache, "parent_id")
-		_convert_timestamps(context)
-		_create_or_update(session, objects.Context, context)
-	if contexts:
-		del data["context"]
-	notify_cb(15, _("Loaded %d contexts") % len(contexts_cache))
-	return contexts_cache
-
-
-def _load_goals(data, session, notify_cb):
+	contexts = _write_objects(session, objects.Context, rows['context'])
+	notify_cb(15, _("Loaded %d contexts") % len(contexts))
+
+
+def _load_goals(rows, session, notify_cb):
 	_LOG.info("_load_goals")
 	notify_cb(16, _("Loading goals"))
-	goals = data.get("goal")
-	goals_cache = _build_id_uuid_map(goals)
-	for goal in sort_objects_by_parent(goals):
-		_replace_ids(goal, goals_cache, "parent_id")
-		_convert_timestamps(goal)
-		_create_or_update(session, objects.Goal, goal)
-	if goals:
-		del data["goal"]
-	notify_cb(20, _("Loaded %d goals") % len(goals_cache))
-	return goals_cache
-
-
-def _load_tasks(data, session, notify_cb):
+	goals = _write_objects(session, objects.Goal, rows['goal'])
+	notify_cb(20, _("Loaded %d goals") % len(goals))
+
+
+def _load_tasks(rows, session, notify_cb):
+	""" Load tasks; return dict uuid -> loaded task. """
 	_LOG.info("_load_tasks")
 	notify_cb(21, _("Loading tasks"))
-	tasks = data.get("task")
-	tasks_cache = _build_id_uuid_map(tasks)
-	for task in sort_objects_by_parent(tasks):
-		_replace_ids(task, tasks_cache, "parent_id")
-		_convert_timestamps(task, "completed", "start_date", "due_date",
-				"due_date_project", "hide_until")
-		task["context_uuid"] = None
-		task["folder_uuid"] = None
-		task["goal_uuid"] = None
-		task_obj = _create_or_update(session, objects.Task, task)
+	tasks = _write_objects(session, objects.Task, rows['task'])
+	for task_obj in tasks.itervalues():
 		task_logic.update_task_hide(task_obj)
 		task_logic.update_task_alarm(task_obj)
-	if tasks:
-		del data["task"]
-	notify_cb(29, _("Loaded %d tasks") % len(tasks_cache))
-	return tasks_cache
+	notify_cb(29, _("Loaded %d tasks") % len(tasks))
+	return tasks
 
 
-def _load_tasknotes(data, session, tasks_cache, notify_cb):
+def _load_tasknotes(rows, session, notify_cb):
 	_LOG.info("_load_tasknotes")
 	notify_cb(30, _("Loading task notes"))
-	tasknotes = data.get("tasknote")
-	tasknotes_cache = _build_id_uuid_map(tasknotes)
-	for tasknote in tasknotes or []:
-		_replace_ids(tasknote, tasks_cache, "task_id")
-		_convert_timestamps(tasknote)
-		_create_or_update(session, objects.Tasknote, tasknote)
-	if tasknotes:
-		del data["tasknote"]
-	notify_cb(34, _("Loaded %d task notes") % len(tasknotes_cache))
-	return tasknotes_cache
-
-
-def _load_alarms(data, session, tasks_cache, notify_cb):
+	tasknotes = _write_objects(session, objects.Tasknote, rows['tasknote'])
+	notify_cb(34, _("Loaded %d task notes") % len(tasknotes))
+
+
+def _load_alarms(rows, session, tasks, notify_cb):
 	_LOG.info("_load_alarms")
 	notify_cb(35, _("Loading alarms"))
-	alarms = data.get("alarm") or []
+	alarms = rows['alarm']
+	tasks = _get_link_targets(session, objects.Task, alarms, 'task_uuid', tasks)
 	for alarm in alarms:
-		task_uuid = _replace_ids(alarm, tasks_cache, "task_id")
-		if not task_uuid:
-			_LOG.error("load alarm error %r", alarm)
-			continue
-		_convert_timestamps(alarm, "alarm")
-		task = session.query(  # pylint: disable=E1101
-				objects.Task).filter_by(uuid=task_uuid).first()
+		task = tasks[alarm['task_uuid']]
 		if task.modified <= alarm["modified"]:
 			task.alarm = alarm["alarm"]
 			task_logic.update_task_alarm(task)
 		else:
 			_LOG.debug("skip %r", alarm)
-	if alarms:
-		del data["alarm"]
 	notify_cb(39, _("Loaded %d alarms") % len(alarms))
 
 
-def _load_task_folders(data, session, tasks_cache, folders_cache, notify_cb):
+def _load_task_links(rows, session, tasks, attr):
+	""" Set `attr` (i.e. folder_uuid) in tasks by link rows. """
+	tasks = _get_link_targets(session, objects.Task, rows, 'task_uuid', tasks)
+	for row in rows:
+		task = tasks[row['task_uuid']]
+		if task.modified <= row["modified"]:
+			setattr(task, attr, row[attr])
+		else:
+			_LOG.debug("skip %r", row)
+
+
+def _load_task_folders(rows, session, tasks, notify_cb):
 	_LOG.info("_load_task_folders")
 	notify_cb(40, _("Loading task folders"))
-	task_folders = data.get("task_folder") or []
-	for task_folder in task_folders:
-		task_uuid = _replace_ids(task_folder, tasks_cache, "task_id")
-		folder_uuid = _replace_ids(task_folder, folders_cache, "folder_id")
-		if not task_uuid or not folder_uuid:
-			_LOG.error("load task folder error %r; %r; %r", task_folder,
-					task_uuid, folder_uuid)
-			continue
-		_convert_timestamps(task_folder)
-		task = session.query(  # pylint: disable=E1101
-				objects.Task).filter_by(uuid=task_uuid).first()
-		if task.modified <= task_folder["modified"]:
-			task.folder_uuid = folder_uuid
-		else:
-			_LOG.debug("skip %r", task_folder)
-	if task_folders:
-		del data["task_folder"]
-	notify_cb(44, _("Loaded %d task folders") % len(task_folders))
+	_load_task_links(rows['task_folder'], session, tasks, 'folder_uuid')
+	notify_cb(44, _("Loaded %d task folders") % len(rows['task_folder']))
 
 
-def _load_task_contexts(data, session, tasks_cache, contexts_cache,
-		notify_cb):
+def _load_task_contexts(rows, session, tasks, notify_cb):
 	_LOG.info("_load_task_contexts")
 	notify_cb(45, _("Loading task contexts"))
-	task_contexts = data.get("task_context") or []
-	for task_context in task_contexts:
-		task_uuid = _replace_ids(task_context, tasks_cache, "task_id")
-		context_uuid = _replace_ids(task_context, contexts_cache, "context_id")
-		if not task_uuid or not context_uuid:
-			_LOG.error("load task contexts error %r; %r; %r", task_context,
-					task_uuid, context_uuid)
-			continue
-		_convert_timestamps(task_context)
-		task = session.query(  # pylint: disable=E1101
-				objects.Task).filter_by(uuid=task_uuid).first()
-		if task.modified <= task_context["modified"]:
-			task.context_uuid = context_uuid
-		else:
-			_LOG.debug("skip %r", task_context)
-	if task_contexts:
-		del data["task_context"]
-	notify_cb(49, _("Loaded %d tasks contexts") % len(task_contexts))
+	_load_task_links(rows['task_context'], session, tasks, 'context_uuid')
+	notify_cb(49, _("Loaded %d tasks contexts") % len(rows['task_context']))
 
 
-def _load_task_goals(data, session, tasks_cache, goals_cache, notify_cb):
+def _load_task_goals(rows, session, tasks, notify_cb):
 	_LOG.info("_load_task_goals")
 	notify_cb(50, _("Loading task goals"))
-	task_goals = data.get("task_goal") or []
-	for task_goal in task_goals:
-		task_uuid = _replace_ids(task_goal, tasks_cache, "task_id")
-		goal_uuid = _replace_ids(task_goal, goals_cache, "goal_id")
-		if not task_uuid or not goal_uuid:
-			_LOG.error("load task goal error %r; %r; %r", task_goal,
-					task_uuid, goal_uuid)
-			continue
-		_convert_timestamps(task_goal)
-		task = session.query(  # pylint: disable=E1101
-				objects.Task).filter_by(uuid=task_uuid).first()
-		if task.modified <= task_goal["modified"]:
-			task.goal_uuid = goal_uuid
-		else:
-			_LOG.debug("skip %r", task_goal)
-	if task_goals:
-		del data["task_goal"]
-	notify_cb(54, _("Loaded %d task goals") % len(task_goals))
+	_load_task_links(rows['task_goal'], session, tasks, 'goal_uuid')
+	notify_cb(54, _("Loaded %d task goals") % len(rows['task_goal']))
 
 
-def _load_tags(data, session, notify_cb):
+def _load_tags(rows, session, notify_cb):
 	_LOG.info("_load_tags")
 	notify_cb(55, _("Loading tags"))
-	tags = data.get("tag")
-	tags_cache = _build_id_uuid_map(tags)
-	for tag in sort_objects_by_parent(tags):
-		_replace_ids(tag, tags_cache, "parent_id")
-		_convert_timestamps(tag)
-		_create_or_update(session, objects.Tag, tag)
-	if tags:
-		del data["tag"]
-	notify_cb(59, _("Loaded %d tags") % len(tags_cache))
-	return tags_cache
-
-
-def _load_task_tags(data, session, tasks_cache, tags_cache, notify_cb):
+	tags = _write_objects(session, objects.Tag, rows['tag'])
+	notify_cb(59, _("Loaded %d tags") % len(tags))
+
+
+def _load_task_tags(rows, session, notify_cb):
 	_LOG.info("_load_task_tags")
 	notify_cb(60, _("Loading task tags"))
-	task_tags = data.get("task_tag") or []
+	task_tags = rows['task_tag']
+	# (task uuid, tag uuid) -> row; keep newest duplicate
+	links = {}
 	for task_tag in task_tags:
-		task_uuid = _replace_ids(task_tag, tasks_cache, "task_id")
-		tag_uuid = _replace_ids(task_tag, tags_cache, "tag_id")
-		_convert_timestamps(task_tag)
-		obj = session.query(  # pylint: disable=E1101
-				objects.TaskTag).filter_by(task_uuid=task_uuid,
-				tag_uuid=tag_uuid).first()
-		if obj:
-			modified = task_tag.get("modified")
-			if not modified or not obj.modified or modified > obj.modified:
-				obj.load_from_dict(task_tag)
-		else:
-			obj = objects.TaskTag(task_uuid=task_uuid, tag_uuid=tag_uuid)
-			obj.load_from_dict(task_tag)
-			session.add(obj)  # pylint: disable=E1101
-	if task_tags:
-		del data["task_tag"]
+		key = (task_tag["task_uuid"], task_tag["tag_uuid"])
+		prev = links.get(key)
+		if prev is None or (task_tag["modified"] and (not prev["modified"]
+				or task_tag["modified"] > prev["modified"])):
+			links[key] = {'task_uuid': task_tag["task_uuid"],
+					'tag_uuid': task_tag["tag_uuid"],
+					'created': task_tag["created"],
+					'modified': task_tag["modified"]}
+	if links:
+		_upsert_task_tags(session, links.values())
 	notify_cb(64, _("Loaded %d task tags") % len(task_tags))
 
 
-def _load_notebooks(data, session, notify_cb):
+# staging table for bulk load of task tags
+_TASK_TAGS_LOAD = Table('task_tags_load', MetaData(),
+		Column('task_uuid', String(50), primary_key=True),
+		Column('tag_uuid', String(50), primary_key=True),
+		Column('created', DateTime),
+		Column('modified', DateTime),
+		prefixes=['TEMPORARY'])
+
+# insert new links and replace existing when loaded are newer
+_UPSERT_TASK_TAGS = """
+INSERT OR REPLACE INTO task_tags (task_uuid, tag_uuid, created, modified)
+SELECT l.task_uuid, l.tag_uuid, l.created, l.modified
+FROM task_tags_load l
+LEFT JOIN task_tags t ON t.task_uuid = l.task_uuid AND t.tag_uuid = l.tag_uuid
+WHERE t.task_uuid IS NULL OR l.modified IS NULL OR t.modified IS NULL
+	OR l.modified > t.modified"""
+
+# number of rows in staging table
+_UPSERT_BATCH_SIZE = 5000
+
+
+def _upsert_task_tags(session, rows):
+	""" Insert or update task_tags by list of dicts; existing links are
+	updated only when loaded are newer.
+
+	Rows are bulk inserted into staging table and merged by one statement
+	per batch.
+	"""
+	# tasks and tags must exist before links are inserted
+	session.flush()
+	conn = session.connection()
+	_TASK_TAGS_LOAD.create(conn, checkfirst=True)
+	for start in xrange(0, len(rows), _UPSERT_BATCH_SIZE):
+		conn.execute(_TASK_TAGS_LOAD.delete())
+		conn.execute(_TASK_TAGS_LOAD.insert(),
+				rows[start:start + _UPSERT_BATCH_SIZE])
+		conn.execute(_UPSERT_TASK_TAGS)
+	conn.execute(_TASK_TAGS_LOAD.delete())
+	# links already loaded into session are outdated
+	for obj in list(session.identity_map.itervalues()):
+		if isinstance(obj, objects.TaskTag):
+			session.expire(obj)
+
+
+def _load_notebooks(rows, session, notify_cb):
+	""" Load notebook pages; return dict uuid -> loaded page. """
 	_LOG.info("_load_notebooks")
 	notify_cb(65, _("Loading notebooks"))
-	notebooks = data.get("notebook") or []
-	notebooks_cache = _build_id_uuid_map(notebooks)
-	for notebook in notebooks:
-		_convert_timestamps(notebook)
-		notebook['folder_uuid'] = None
-		_create_or_update(session, objects.NotebookPage, notebook)
-	if notebooks:
-		del data["notebook"]
-	notify_cb(69, _("Loaded %d notebook pages") % len(notebooks_cache))
-	return notebooks_cache
-
-
-def _load_notebook_folders(data, session, notebooks_cache, folders_cache,
-		notify_cb):
+	pages = _write_objects(session, objects.NotebookPage, rows['notebook'])
+	notify_cb(69, _("Loaded %d notebook pages") % len(pages))
+	return pages
+
+
+def _load_notebook_folders(rows, session, pages, notify_cb):
 	_LOG.info("_load_notebook_folders")
 	notify_cb(70, _("Loading notebook pages folders"))
-	notebook_folders = data.get("notebook_folder") or []
+	notebook_folders = rows['notebook_folder']
+	pages = _get_link_targets(session, objects.NotebookPage, notebook_folders,
+			'notebook_uuid', pages)
 	for notebook_folder in notebook_folders:
-		notebook_uuid = _replace_ids(notebook_folder, notebooks_cache,
-				"notebook_id")
-		folder_uuid = _replace_ids(notebook_folder, folders_cache, "folder_id")
-		if not notebook_uuid or not folder_uuid:
-			_LOG.error("load notebook folder error %r; %r; %r", notebook_folder,
-					notebook_uuid, folder_uuid)
-			continue
-		_convert_timestamps(notebook_folder)
-		notebook = session.query(  # pylint: disable=E1101
-				objects.NotebookPage).filter_by(uuid=notebook_uuid).first()
+		notebook = pages[notebook_folder['notebook_uuid']]
 		if notebook.modified <= notebook_folder["modified"]:
-			notebook.folder_uuid = folder_uuid
+			notebook.folder_uuid = notebook_folder['folder_uuid']
 		else:
 			_LOG.debug("skip %r", notebook_folder)
-	if notebook_folders:
-		del data["notebook_folder"]
 	notify_cb(75, _("Loaded %d notebook folders") % len(notebook_folders))
 
 
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103, W0212
+""" Tests for loader module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-23"
+
+import os
+import shutil
+import datetime
+import tempfile
+from unittest import main, TestCase
+
+from . import db
+from . import loader
+from . import objects as OBJ
+
+
+def _quiet(_progress, _msg):
+	pass
+
+
+class TestStr2DatetimeUtc(TestCase):
+	""" Test parsing timestamps. """
+
+	def test_fast_format(self):
+		self.assertEqual(loader.str2datetime_utc('2013-03-22T21:27:46.461Z'),
+				datetime.datetime(2013, 3, 22, 21, 27, 46, 461000))
+		self.assertEqual(loader.str2datetime_utc('2013-03-22T21:27:46Z'),
+				datetime.datetime(2013, 3, 22, 21, 27, 46))
+		# cached
+		self.assertEqual(loader.str2datetime_utc('2013-03-22T21:27:46.461Z'),
+				datetime.datetime(2013, 3, 22, 21, 27, 46, 461000))
+
+	def test_other_formats(self):
+		self.assertEqual(loader.str2datetime_utc(
+				'2013-03-22T23:27:46.461+02:00'),
+				datetime.datetime(2013, 3, 22, 21, 27, 46, 461000))
+		self.assertEqual(loader.str2datetime_utc('2013-03-22 21:27:46.461Z'),
+				datetime.datetime(2013, 3, 22, 21, 27, 46, 461000))
+
+	def test_invalid(self):
+		self.assertIsNone(loader.str2datetime_utc(''))
+		self.assertIsNone(loader.str2datetime_utc(None))
+		self.assertIsNone(loader.str2datetime_utc('2013-03-22'))
+		self.assertIsNone(loader.str2datetime_utc('2013-13-22T21:27:46.461Z'))
+		self.assertIsNone(loader.str2datetime_utc('abcd-ef-ghTij:kl:mn.opqZ'))
+
+
+class TestSortObjectsByParent(TestCase):
+
+	@staticmethod
+	def _sort(parents):
+		""" Sort objects given as list of (id, parent id); return ids. """
+		objs = [{'_id': oid, 'parent_id': parent} for oid, parent in parents]
+		return [obj['_id'] for obj in loader.sort_objects_by_parent(objs)]
+
+	def test_sort(self):
+		self.assertEqual(self._sort([]), [])
+		self.assertEqual(self._sort([(3, 2), (1, 0), (2, 1), (4, 0), (5, 4)]),
+				[1, 4, 2, 5, 3])
+
+	def test_deep(self):
+		# reversed chain 5000 -> 4999 -> ... -> 1
+		parents = [(oid, oid - 1) for oid in xrange(5000, 0, -1)]
+		self.assertEqual(self._sort(parents), range(1, 5001))
+
+	def test_missing_parent(self):
+		self.assertEqual(self._sort([(2, 9), (3, 2), (1, 0)]), [2, 1, 3])
+
+	def test_cycle(self):
+		self.assertEqual(self._sort([(1, 0), (2, 3), (3, 2), (4, 3), (5, 1)]),
+				[1, 5, 2, 3, 4])
+
+
+class TestLoadTaskTags(TestCase):
+	""" Test bulk loading of task tags. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		self.session = OBJ.Session()
+		self.tasks = {1: 'task1', 2: 'task2'}
+		self.tags = {1: 'tag1', 2: 'tag2'}
+		for uuid in self.tasks.itervalues():
+			self.session.add(OBJ.Task(uuid=uuid, title=uuid))
+		for uuid in self.tags.itervalues():
+			self.session.add(OBJ.Tag(uuid=uuid, title=uuid))
+		# existing link, modified 2013-01-10
+		self.session.add(OBJ.TaskTag(task_uuid='task1', tag_uuid='tag1',
+				created=datetime.datetime(2013, 1, 1),
+				modified=datetime.datetime(2013, 1, 10)))
+		self.session.add(OBJ.TaskTag(task_uuid='task2', tag_uuid='tag1',
+				created=datetime.datetime(2013, 1, 1),
+				modified=datetime.datetime(2013, 1, 10)))
+		self.session.commit()
+
+	def tearDown(self):
+		self.session.close()
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def _load(self, task_tags):
+		data = {'task_tag': [{'task_id': task_id, 'tag_id': tag_id,
+				'created': '2013-01-01T00:00:00.000Z', 'modified': modified}
+				for task_id, tag_id, modified in task_tags]}
+		caches = {'task': self.tasks, 'tag': self.tags}
+		rows = loader._prepare_data(data, None, caches, {})
+		loader._load_task_tags(rows, self.session, _quiet)
+		self.session.commit()
+		self.assertEqual(data, {})
+		return dict(((ttag.task_uuid, ttag.tag_uuid), ttag.modified)
+				for ttag in self.session.query(OBJ.TaskTag))
+
+	def test_upsert(self):
+		links = self._load([
+				# older - not updated
+				(1, 1, '2013-01-05T00:00:00.000Z'),
+				# newer - updated
+				(2, 1, '2013-01-20T00:00:00.000Z'),
+				# new links; duplicates - newest wins
+				(1, 2, '2013-01-03T00:00:00.000Z'),
+				(1, 2, '2013-01-04T00:00:00.000Z'),
+				(1, 2, '2013-01-02T00:00:00.000Z'),
+				# unknown task
+				(3, 1, '2013-01-20T00:00:00.000Z')])
+		self.assertEqual(links, {
+				('task1', 'tag1'): datetime.datetime(2013, 1, 10),
+				('task2', 'tag1'): datetime.datetime(2013, 1, 20),
+				('task1', 'tag2'): datetime.datetime(2013, 1, 4)})
+
+	def test_loaded_objects_refreshed(self):
+		task = self.session.query(OBJ.Task).filter_by(uuid='task2').one()
+		self.assertEqual(len(task.task_tags), 1)
+		self._load([(2, 1, '2013-01-20T00:00:00.000Z'),
+				(2, 2, '2013-01-20T00:00:00.000Z')])
+		self.assertEqual(sorted(ttag.tag_uuid for ttag in task.task_tags),
+				['tag1', 'tag2'])
+
+
+class TestPrepareData(TestCase):
+	""" Prepare stage: converting records without database access. """
+
+	def _data(self):
+		return {'folder': [
+					{'_id': 2, 'uuid': 'f2', 'parent_id': 1,
+						'created': '2013-01-01T00:00:00.000Z',
+						'modified': '2013-01-02T00:00:00.000Z'},
+					{'_id': 1, 'uuid': 'f1', 'parent_id': 0,
+						'created': '2013-01-01T00:00:00.000Z',
+						'modified': '2013-01-20T00:00:00.000Z'}],
+				'task': [{'_id': 1, 'uuid': 't1', 'parent_id': 0,
+						'created': '2013-01-01T00:00:00.000Z',
+						'modified': '2013-01-20T00:00:00.000Z',
+						'completed': '', 'start_date': '',
+						'due_date': '2013-02-01T10:00:00.000Z',
+						'due_date_project': '', 'hide_until': ''}],
+				'task_folder': [
+					{'task_id': 1, 'folder_id': 2,
+						'created': '2013-01-01T00:00:00.000Z',
+						'modified': '2013-01-02T00:00:00.000Z'},
+					{'task_id': 9, 'folder_id': 2,
+						'created': '2013-01-01T00:00:00.000Z',
+						'modified': '2013-01-02T00:00:00.000Z'}]}
+
+	def _prepare(self, mark=None):
+		data = self._data()
+		caches = dict((kind, loader._build_id_uuid_map(data.get(kind)))
+				for kind in loader._CACHED_KINDS)
+		loaded = {'task': loader._loaded_uuids(data.get('task'), mark),
+				'notebook': set()}
+		rows = loader._prepare_data(data, mark, caches, loaded)
+		self.assertEqual(data, {})
+		return rows
+
+	def test_prepare(self):
+		rows = self._prepare()
+		self.assertEqual([row['uuid'] for row in rows['folder']], ['f1', 'f2'])
+		self.assertEqual(rows['folder'][1]['parent_uuid'], 'f1')
+		self.assertEqual(rows['task'][0]['due_date'],
+				datetime.datetime(2013, 2, 1, 10))
+		self.assertIsNone(rows['task'][0]['completed'])
+		# link to unknown task is skipped
+		self.assertEqual([(row['task_uuid'], row['folder_uuid'])
+				for row in rows['task_folder']], [('t1', 'f2')])
+
+	def test_prepare_since_mark(self):
+		rows = self._prepare(datetime.datetime(2013, 1, 10))
+		self.assertEqual([row['uuid'] for row in rows['folder']], ['f1'])
+		# link is older than mark but task is loaded
+		self.assertEqual(len(rows['task_folder']), 1)
+
+
+if __name__ == '__main__':
+	main()
@@ -17,13 +17,14 @@ __version__ = "2013-03-02"
 import logging
 import gettext
 import uuid
+import sqlite3
 import datetime
 
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy import orm, or_, and_
-from sqlalchemy import select, func
+from sqlalchemy import select, func, bindparam
 
 from wxgtd.model import enums
 
@@ -262,60 +263,116 @@ class Task(BaseModelMixin, Base):
 	@property
 	def overdue(self):
 		""" Is task overdue. """
-		if self.completed:
-			return False
-		now = datetime.datetime.utcnow()
-		if self.type == enums.TYPE_PROJECT:
-			return self.due_date_project and self.due_date_project < now
-		return self.due_date and self.due_date < now
+		return _is_task_overdue(self)
 
 	@classmethod
-	def select_by_filters(cls, params, session=None):
+	def select_by_filters(cls, params, session=None, snapshot=False):
 		""" Get tasks list according to given criteria.
 
+		Query is created from cached statement (see _get_filters_plan) so it
+		can't be modified; use count_by_filters for counting.
+
 		Args:
 			params: dict with filter parameters (criteria)
 			session: optional sqlalchemy session
+			snapshot: return read-only TaskSnapshot objects instead of tasks
 
 		Returns:
-			SqlAlchemy query
+			SqlAlchemy query or list of TaskSnapshot (when snapshot)
 		"""
-		# pylint: disable=R0912
 		_LOG.debug('Task.select_by_filters(%r)', params)
 		session = session or Session()
-		query = session.query(cls)
-		if params.get('deleted'):
-			query = query.filter(cls.deleted.isnot(None))
-		else:
-			query = query.filter(cls.deleted.is_(None))
-		query = _append_filter_list(query, Task.context_uuid, params.get('contexts'))
-		query = _append_filter_list(query, Task.folder_uuid, params.get('folders'))
-		query = _append_filter_list(query, Task.goal_uuid, params.get('goals'))
-		query = _append_filter_list(query, Task.status, params.get('statuses'))
-		query = _append_filter_list(query, Task.type, params.get('types'))
-		search_str = params.get('search_str', '').strip()
-		if search_str:
-			search_str = '%%' + search_str.lower() + "%%"
-			query = query.filter(or_(func.lower(Task.title).like(search_str),
-					func.lower(Task.note).like(search_str)))
-		now = datetime.datetime.utcnow()
-		query = _query_add_filter_by_tags(query, params)
-		if params.get('hide_until'):
-			# hide task with hide_until value in future
-			query = query.filter(or_(Task.hide_until.is_(None),
-					Task.hide_until <= now))
-		if params.get('max_due_date'):
-			query = query.filter(Task.due_date.isnot(None))
-		elif params.get('no_due_date'):
-			query = query.filter(Task.due_date.is_(None))
-		query = _quert_add_filter_by_hotlist(query, params, now)
-		query = _query_add_filter_by_finished(query, params.get('finished'))
-		query = _query_add_filter_by_parent(query, params.get('parent_uuid'))
-		# future alarms
-		if params.get('active_alarm'):
-			query = query.filter(Task.alarm >= now)
-		query = query.order_by(Task.title)
-		return query
+		plan, values = _get_filters_plan(params)
+		if snapshot:
+			conn = session.connection().execution_options(
+					compiled_cache=_COMPILED_CACHE)
+			return [TaskSnapshot(*row) for row  # pylint: disable=W0142
+					in conn.execute(plan.snapshot, values)]
+		return session.query(cls).from_statement(plan.select).params(
+				**values).execution_options(compiled_cache=_COMPILED_CACHE)
+
+	@classmethod
+	def iter_snapshots_by_filters(cls, params, session=None,
+			batch_size=500):
+		""" Iterate over TaskSnapshot according to given criteria.
+
+		Rows are fetched from cursor in batches, so long lists (exports)
+		are not loaded into memory at once.
+		"""
+		session = session or Session()
+		plan, values = _get_filters_plan(params)
+		conn = session.connection().execution_options(
+				compiled_cache=_COMPILED_CACHE)
+		result = conn.execute(plan.snapshot, values)
+		try:
+			while True:
+				rows = result.fetchmany(batch_size)
+				if not rows:
+					break
+				for row in rows:
+					yield TaskSnapshot(*row)  # pylint: disable=W0142
+		finally:
+			result.close()
+
+	@classmethod
+	def select_uuids_by_filters(cls, params, session=None):
+		""" Get uuids of tasks according to given criteria.
+
+		Returns:
+			SqlAlchemy query returning (uuid, )
+		"""
+		session = session or Session()
+		plan, values = _get_filters_plan(params)
+		return session.query(cls.uuid).from_statement(plan.uuids).params(
+				**values).execution_options(compiled_cache=_COMPILED_CACHE)
+
+	@classmethod
+	def count_by_filters(cls, params, session=None):
+		""" Count tasks according to given criteria. """
+		session = session or Session()
+		plan, values = _get_filters_plan(params)
+		conn = session.connection().execution_options(
+				compiled_cache=_COMPILED_CACHE)
+		return conn.execute(plan.count, values).scalar()
+
+	@classmethod
+	def select_by_uuids(cls, uuids, session=None):
+		""" Get tasks with given uuids in order of `uuids`. """
+		if not uuids:
+			return []
+		session = session or Session()
+		tasks = dict((task.uuid, task) for task
+				in session.query(cls).filter(cls.uuid.in_(uuids)))
+		return [tasks[uuid] for uuid in uuids if uuid in tasks]
+
+	@classmethod
+	def select_list_items_by_filters(cls, params, session=None):
+		""" Get TaskListItem-s (data displayed on task list) according to
+		given criteria. """
+		_LOG.debug('Task.select_list_items_by_filters(%r)', params)
+		session = session or Session()
+		plan, values = _get_filters_plan(params)
+		conn = session.connection().execution_options(
+				compiled_cache=_COMPILED_CACHE)
+		items = [TaskListItem(*row) for row  # pylint: disable=W0142
+				in conn.execute(plan.list_items, values)]
+		_fill_parents_paths(items, session)
+		return items
+
+	@classmethod
+	def select_list_items_by_uuids(cls, uuids, session=None):
+		""" Get TaskListItem-s for tasks with given uuids in order of
+		`uuids`. """
+		if not uuids:
+			return []
+		session = session or Session()
+		query = session.query(*_list_item_columns()).filter(
+				cls.uuid.in_(uuids)).params(now=datetime.datetime.utcnow())
+		items = dict((row[0], TaskListItem(*row))  # pylint: disable=W0142
+				for row in query)
+		items = [items[uuid] for uuid in uuids if uuid in items]
+		_fill_parents_paths(items, session)
+		return items
 
 	@classmethod
 	def search(cls, text, active_only, session=None):
@@ -396,6 +453,33 @@ class Task(BaseModelMixin, Base):
 				.where(and_(Task.parent_uuid == self.uuid,
 					Task.deleted.is_(None))))
 
+	@property
+	def context_title(self):
+		return self.context.title if self.context else None
+
+	@property
+	def folder_title(self):
+		return self.folder.title if self.folder else None
+
+	@property
+	def goal_title(self):
+		return self.goal.title if self.goal else None
+
+	@property
+	def tags_titles(self):
+		""" Titles of task tags separated by comma. """
+		return ",".join(tag.title for tag in self.tags) or None
+
+	@property
+	def parents_path(self):
+		""" Titles of all parents of task (from top) separated by "/". """
+		titles = []
+		task = self.parent
+		while task:
+			titles.insert(0, task.title)
+			task = task.parent
+		return '/'.join(titles) or None
+
 	@property
 	def sub_projects(self):
 		return Session.object_session(self).query(Task).with_parent(self)\
@@ -429,13 +513,128 @@ class Task(BaseModelMixin, Base):
 		return newobj
 
 
+class TaskSnapshot(object):
+	""" Read-only copy of task columns used by task lists and exports.
+
+	Much smaller than Task instance (no sqlalchemy state, no relations);
+	created by Task.select_by_filters(..., snapshot=True).
+	"""
+	# pylint: disable=R0902, R0903
+
+	__slots__ = ('uuid', 'parent_uuid', 'type', 'title', 'note', 'modified',
+			'completed', 'starred', 'status', 'priority', 'importance',
+			'start_date', 'start_time_set', 'due_date', 'due_date_project',
+			'due_time_set', 'alarm', 'repeat_pattern', 'hide_until',
+			'folder_uuid', 'context_uuid', 'goal_uuid')
+	# attributes loaded from database (in order of columns)
+	_COLUMNS = __slots__
+
+	def __init__(self, *values):
+		for name, value in zip(self._COLUMNS, values):
+			setattr(self, name, value)
+
+	@property
+	def overdue(self):
+		""" Is task overdue. """
+		return _is_task_overdue(self)
+
+	def __repr__(self):
+		return "<%s %r %r>" % (self.__class__.__name__, self.uuid, self.title)
+
+
+class TaskListItem(TaskSnapshot):
+	""" TaskSnapshot with values displayed on task list: titles of related
+	objects and number of subtasks (the same attributes as in Task).
+
+	Created by Task.select_list_items_by_filters and
+	Task.select_list_items_by_uuids.
+	"""
+	# pylint: disable=R0902, R0903
+
+	__slots__ = ('context_title', 'folder_title', 'goal_title',
+			'tags_titles', 'child_count', 'active_child_count',
+			'child_overdue', 'parents_path')
+	# parents_path is set by _fill_parents_paths
+	_COLUMNS = TaskSnapshot.__slots__ + __slots__[:-1]
+
+	def __init__(self, *values):
+		TaskSnapshot.__init__(self, *values)
+		self.parents_path = None
+
+
+def _list_item_columns():
+	""" Columns for TaskListItem: TaskSnapshot columns and scalar subqueries
+	correlated with task (require `now` bind parameter). """
+	child = orm.aliased(Task)
+	now = bindparam('now')
+	children = and_(child.parent_uuid == Task.uuid, child.deleted.is_(None))
+	columns = [getattr(Task, name) for name in TaskSnapshot.__slots__]
+	columns.extend((
+			select([Context.title]).where(
+				Context.uuid == Task.context_uuid).as_scalar(),
+			select([Folder.title]).where(
+				Folder.uuid == Task.folder_uuid).as_scalar(),
+			select([Goal.title]).where(
+				Goal.uuid == Task.goal_uuid).as_scalar(),
+			select([func.group_concat(Tag.title, ',')]).where(and_(
+				TaskTag.task_uuid == Task.uuid,
+				Tag.uuid == TaskTag.tag_uuid)).as_scalar(),
+			select([func.count(child.uuid)]).where(children).as_scalar(),
+			select([func.count(child.uuid)]).where(and_(children,
+				child.completed.is_(None))).as_scalar(),
+			# the same conditions as in Task.child_overdue
+			select([func.count(child.uuid)]).where(and_(children,
+				child.due_date.isnot(None), child.completed.is_(None),
+				or_(
+					and_(child.due_date < now,
+						child.type != enums.TYPE_PROJECT),
+					and_(child.due_date_project < now,
+						child.type == enums.TYPE_PROJECT)))).as_scalar()))
+	return columns
+
+
+def _fill_parents_paths(items, session, chunk_size=500):
+	""" Set parents_path in TaskListItem-s; titles of parents are loaded
+	level by level. """
+	parents = {}  # uuid -> (title, parent uuid)
+	missing = set(item.parent_uuid for item in items if item.parent_uuid)
+	while missing:
+		missing = list(missing)
+		loaded = []
+		for idx in xrange(0, len(missing), chunk_size):
+			loaded.extend(session.query(Task.uuid, Task.title,
+					Task.parent_uuid).filter(Task.uuid.in_(
+						missing[idx:idx + chunk_size])))
+		for task_uuid, title, parent_uuid in loaded:
+			parents[task_uuid] = (title, parent_uuid)
+		missing = set(parent_uuid for _uuid, _title, parent_uuid in loaded
+				if parent_uuid and parent_uuid not in parents)
+	for item in items:
+		titles = []
+		parent_uuid = item.parent_uuid
+		while parent_uuid in parents and len(titles) < len(parents):
+			title, parent_uuid = parents[parent_uuid]
+			titles.insert(0, title or '')
+		item.parents_path = '/'.join(titles) or None
+
+
+def _is_task_overdue(task):
+	""" Check is task (Task or TaskSnapshot) overdue. """
+	if task.completed:
+		return False
+	now = datetime.datetime.utcnow()
+	if task.type == enums.TYPE_PROJECT:
+		return task.due_date_project and task.due_date_project < now
+	return task.due_date and task.due_date < now
+
+
 def _append_filter_list(query, param, values):
 	""" Build sqlalachemy filter object from params and values.
 
 	Args:
 		query: current sqlalchemy query object
 		param: field in object (database column) used to filter
-		values: values acceptable for given field
+		values: values (or bind parameters) acceptable for given field
 
 	Returns:
 		Updated query object.
@@ -443,57 +642,58 @@ def _append_filter_list(query, param, values):
 	if not values:
 		# brak filtra
 		return query
-	if values == [None]:
+	# values may contain bind parameters - don't compare them to None
+	not_null = [value for value in values if value is not None]
+	if not not_null:
 		# wyświetlenie tylko bez ustawionej wartości parametru
 		return query.filter(param.is_(None))
-	elif None in values:
+	elif len(not_null) < len(values):
 		# lista parametrów zawiera wartość NULL
-		values = values[:]
-		values.remove(None)
-		return query.filter(or_(param.is_(None), param.in_(values)))
+		return query.filter(or_(param.is_(None), param.in_(not_null)))
 	# lista parametrów bez NULL
 	return query.filter(param.in_(values))
 
 
-def _query_add_filter_by_tags(query, params):
+def _query_add_filter_by_tags(query, tags):
 	""" Add filters related to tags. """
-	if params.get('tags'):
+	if tags:
 		# filter by tags; pylint: disable=E1101
-		tags = set(params.get('tags'))
-		if None in tags:
-			if len(tags) == 1:
+		not_null = [tag for tag in tags if tag is not None]
+		if len(not_null) < len(tags):
+			if not not_null:
 				query = query.filter(~Task.tags.any())
 			else:
 				query = query.filter(or_(
-						Task.tags.any(TaskTag.tag_uuid.in_(params['tags'])),
+						Task.tags.any(TaskTag.tag_uuid.in_(not_null)),
 						~Task.tags.any()))
 		else:
-			query = query.filter(Task.tags.any(TaskTag.tag_uuid.in_(params['tags'])))
+			query = query.filter(Task.tags.any(TaskTag.tag_uuid.in_(tags)))
 	return query
 
 
-def _quert_add_filter_by_hotlist(query, params, now):
+def _quert_add_filter_by_hotlist(query, template, now):
 	""" Add filters related to hotlist. """
 	opt = []
-	if params.get('starred'):  # show starred task
+	if template.get('starred'):  # show starred task
 		opt.append(Task.starred > 0)
-	if params.get('min_priority') is not None:  # minimal task priority
-		opt.append(Task.priority >= params['min_priority'])
-	if params.get('max_due_date'):
+	if template.get('min_priority'):  # minimal task priority
+		opt.append(Task.priority >= bindparam(template['min_priority']))
+	if template.get('max_due_date'):
+		max_due_date = bindparam(template['max_due_date'])
 		opt.append(or_(
 			and_(Task.type != enums.TYPE_PROJECT,
 					Task.due_date.isnot(None),
-					Task.due_date <= params['max_due_date']),
+					Task.due_date <= max_due_date),
 			and_(Task.type == enums.TYPE_PROJECT,
 					Task.due_date_project.isnot(None),
-					Task.due_date_project <= params['max_due_date'])))
-	if params.get('next_action'):
+					Task.due_date_project <= max_due_date)))
+	if template.get('next_action'):
 		opt.append(Task.status == 1)  # status = next action
-	if params.get('started'):  # started task (with start date in past)
+	if template.get('started'):  # started task (with start date in past)
 		opt.append(Task.start_date <= now)
 	if opt:
 		# use "or" or "and" operator for hotlist params
-		if params.get('filter_operator', 'and') == 'or':
+		if template.get('filter_operator', 'and') == 'or':
 			query = query.filter(or_(*opt))  # pylint: disable=W0142
 		else:
 			query = query.filter(*opt)  # pylint: disable=W0142
@@ -517,11 +717,150 @@ def _query_add_filter_by_parent(query, parent_uuid):
 			# filter by parent (show only master task (not subtask))
 			query = query.filter(Task.parent_uuid.is_(None))
 		elif parent_uuid:
-			# filter by parent (show only subtask)
-			query = query.filter(Task.parent_uuid == parent_uuid)
+			# filter by parent (show only subtask); name of bind parameter
+			query = query.filter(Task.parent_uuid == bindparam(parent_uuid))
 	return query
 
 
+# params that are lists of values
+_FILTER_LIST_PARAMS = ('contexts', 'folders', 'goals', 'statuses', 'types',
+		'tags')
+# params that values are bound on execution (when are set)
+_FILTER_BIND_PARAMS = ('max_due_date', 'parent_uuid')
+# max number of cached plans
+_FILTERS_PLANS_LIMIT = 200
+# shape of params -> _FiltersPlan
+_FILTERS_PLANS = {}
+# sqlalchemy compiled_cache for statements from _FILTERS_PLANS
+_COMPILED_CACHE = {}
+
+
+class _FiltersPlan(object):
+	""" Statements for given shape of filter params.
+
+	Attributes:
+		select: select tasks
+		snapshot: select columns for TaskSnapshot
+		list_items: select columns for TaskListItem
+		uuids: select tasks uuids
+		count: count tasks
+	"""
+	# pylint: disable=R0903
+
+	def __init__(self, template):
+		query = _build_filters_query(orm.Query(Task), template)
+		self.select = query.statement
+		self.snapshot = query.with_entities(*[getattr(Task, name)
+				for name in TaskSnapshot.__slots__]).statement
+		self.list_items = query.with_entities(
+				*_list_item_columns()).statement  # pylint: disable=W0142
+		self.uuids = query.with_entities(Task.uuid).statement
+		self.count = select([func.count()]).select_from(
+				query.order_by(None).statement.alias())
+
+
+def _get_filters_plan(params):
+	""" Find (or create) statements for params.
+
+	Values from params are replaced by bind parameters; params that differ
+	only by values of filters share one plan.
+
+	Returns:
+		(_FiltersPlan, dict of bind parameters values)
+	"""
+	template, values = _split_filter_params(params)
+	shape = tuple(sorted(template.iteritems()))
+	plan = _FILTERS_PLANS.get(shape)
+	if plan is None:
+		_LOG.debug('_get_filters_plan: new plan for %r', shape)
+		if len(_FILTERS_PLANS) >= _FILTERS_PLANS_LIMIT:
+			_FILTERS_PLANS.clear()
+			_COMPILED_CACHE.clear()
+		plan = _FILTERS_PLANS[shape] = _FiltersPlan(template)
+	return plan, values
+
+
+def _split_filter_params(params):
+	""" Split params into template (values replaced by names of bind
+	parameters) and values of bind parameters. """
+	template, values = {}, {}
+	for key, value in params.iteritems():
+		if value and key in _FILTER_LIST_PARAMS:
+			tvalue = []
+			for idx, val in enumerate(value):
+				if val is None:
+					tvalue.append(None)
+				else:
+					name = '%s_%d' % (key, idx)
+					values[name] = val
+					tvalue.append(name)
+			template[key] = tuple(tvalue)
+		elif value and key in _FILTER_BIND_PARAMS:
+			values[key] = value
+			template[key] = key
+		elif key == 'min_priority' and value is not None:
+			values[key] = value
+			template[key] = key
+		elif key == 'search_str':
+			value = (value or '').strip()
+			if value:
+				values[key] = '%' + value.lower() + '%'
+			template[key] = key if value else None
+		elif isinstance(value, list):
+			template[key] = tuple(value)
+		else:
+			template[key] = value
+	values['now'] = datetime.datetime.utcnow()
+	return template, values
+
+
+def _build_filters_query(query, template):
+	""" Add filters to query according to template created by
+	_get_filters_plan (values replaced by names of bind parameters). """
+	now = bindparam('now')
+	if template.get('deleted'):
+		query = query.filter(Task.deleted.isnot(None))
+	else:
+		query = query.filter(Task.deleted.is_(None))
+	query = _append_filter_list(query, Task.context_uuid,
+			_bind_list(template.get('contexts')))
+	query = _append_filter_list(query, Task.folder_uuid,
+			_bind_list(template.get('folders')))
+	query = _append_filter_list(query, Task.goal_uuid,
+			_bind_list(template.get('goals')))
+	query = _append_filter_list(query, Task.status,
+			_bind_list(template.get('statuses')))
+	query = _append_filter_list(query, Task.type,
+			_bind_list(template.get('types')))
+	if template.get('search_str'):
+		search_str = bindparam(template['search_str'])
+		query = query.filter(or_(func.lower(Task.title).like(search_str),
+				func.lower(Task.note).like(search_str)))
+	query = _query_add_filter_by_tags(query, _bind_list(template.get('tags')))
+	if template.get('hide_until'):
+		# hide task with hide_until value in future
+		query = query.filter(or_(Task.hide_until.is_(None),
+				Task.hide_until <= now))
+	if template.get('max_due_date'):
+		query = query.filter(Task.due_date.isnot(None))
+	elif template.get('no_due_date'):
+		query = query.filter(Task.due_date.is_(None))
+	query = _quert_add_filter_by_hotlist(query, template, now)
+	query = _query_add_filter_by_finished(query, template.get('finished'))
+	query = _query_add_filter_by_parent(query, template.get('parent_uuid'))
+	# future alarms
+	if template.get('active_alarm'):
+		query = query.filter(Task.alarm >= now)
+	return query.order_by(Task.title)
+
+
+def _bind_list(names):
+	""" Create list of bind parameters (or None) for list of names. """
+	if not names:
+		return names
+	return [None if name is None else bindparam(name) for name in names]
+
+
 class Folder(BaseModelMixin, Base):
 	""" Folder.
 
@@ -689,6 +1028,28 @@ class SyncLog(BaseModelMixin, Base):
 	prev_sync_time = Column(DateTime, nullable=True)
 
 
-Index('idx_task_childs', Task.parent_uuid, Task.due_date, Task.completed)
-Index('idx_task_show', Task.hide_until, Task.parent_uuid, Task.completed,
-		Task.title)
+def _active_index(name, *columns):
+	""" Create index on not deleted tasks (partial index when sqlite
+	support it). """
+	if sqlite3.sqlite_version_info >= (3, 8, 0):
+		return Index(name, *columns, sqlite_where=Task.deleted.is_(None))
+	return Index(name, Task.deleted, *columns)
+
+
+# indexes for standard queries; see query_advisor
+# lists by parent ordered by title; subtasks counters (covering)
+_active_index('idx_task_active_parent', Task.parent_uuid, Task.completed,
+		Task.title, Task.uuid)
+# lists with subtasks ordered by title
+_active_index('idx_task_active_completed', Task.completed, Task.title)
+# hotlist, today; overdue subtasks
+_active_index('idx_task_active_due', Task.parent_uuid, Task.due_date,
+		Task.completed)
+# reminders (covering for ReminderScheduler)
+_active_index('idx_task_active_alarm', Task.alarm, Task.completed, Task.uuid)
+# trash and cleanup of deleted tasks
+if sqlite3.sqlite_version_info >= (3, 8, 0):
+	Index('idx_task_deleted', Task.deleted,
+			sqlite_where=Task.deleted.isnot(None))
+else:
+	Index('idx_task_deleted', Task.deleted)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for objects module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import shutil
+import datetime
+import tempfile
+from unittest import main, TestCase
+
+from wxgtd.lib import appconfig
+from . import db
+from . import enums
+from . import queries
+from . import objects as OBJ
+
+# hotlist: due date in past, priority >= 3 or starred (only tasks with due
+# date are shown)
+_HOTLIST_SETTINGS = {'cond': True, 'due': 0, 'priority': 3, 'starred': True,
+		'next_action': False, 'started': False}
+
+# all not finished, top-level tasks (QUERY_ALL_TASK without options)
+_ALL = sorted(['alarm', 'checklist', 'ctx1', 'ctx2', 'due_future',
+		'due_today', 'hidden', 'plain', 'project', 'started', 'starred'])
+
+
+def _without(names, *excluded):
+	return [name for name in names if name not in excluded]
+
+
+class _HotlistConfig(object):
+	""" Configuration used by queries (hotlist settings). """
+
+	def get(self, section, key, default=None):
+		if section == 'hotlist':
+			return _HOTLIST_SETTINGS.get(key, default)
+		return default
+
+
+class TestSelectByFilters(TestCase):
+	""" Task.select_by_filters, select_uuids_by_filters and count_by_filters
+	for each query group and option on small database.
+
+	Uuid of each task is equal to its title, so expected results are sorted
+	lists of uuids.
+	"""
+
+	longMessage = True
+
+	def setUp(self):
+		appconfig.AppConfig('wxgtd.cfg', 'wxgtd-test')
+		self._appconfig = queries.AppConfig
+		queries.AppConfig = _HotlistConfig
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		self.session = session = OBJ.Session()
+		now = datetime.datetime.utcnow()
+		later = now + datetime.timedelta(days=30)
+		session.add_all([OBJ.Context(uuid='c1', title='c1'),
+				OBJ.Context(uuid='c2', title='c2'),
+				OBJ.Folder(uuid='f1', title='f1'),
+				OBJ.Goal(uuid='g1', title='g1'),
+				OBJ.Tag(uuid='t1', title='t1'),
+				OBJ.Tag(uuid='t2', title='t2')])
+		tasks = [
+				# only task without context and status - basket
+				dict(uuid='plain', context_uuid=None, status=0),
+				dict(uuid='ctx1', context_uuid='c1', folder_uuid='f1',
+					goal_uuid='g1'),
+				dict(uuid='ctx2', priority=3, due_date=later),
+				dict(uuid='starred', context_uuid='c1', starred=1, due_date=later),
+				dict(uuid='due_today', due_date=now - datetime.timedelta(hours=1)),
+				dict(uuid='due_future', due_date=later),
+				dict(uuid='finished', completed=now - datetime.timedelta(days=1)),
+				dict(uuid='project', type=enums.TYPE_PROJECT,
+					due_date_project=now - datetime.timedelta(hours=1)),
+				dict(uuid='sub', parent_uuid='project'),
+				dict(uuid='checklist', type=enums.TYPE_CHECKLIST),
+				dict(uuid='item', type=enums.TYPE_CHECKLIST_ITEM,
+					parent_uuid='checklist'),
+				dict(uuid='alarm', alarm=now + datetime.timedelta(days=1)),
+				dict(uuid='hidden', hide_until=now + datetime.timedelta(days=5)),
+				dict(uuid='deleted', deleted=now),
+				dict(uuid='started', start_date=now - datetime.timedelta(days=1))]
+		for task in tasks:
+			task.setdefault('context_uuid', 'c2')
+			task.setdefault('status', 1)
+			session.add(OBJ.Task(title=task['uuid'], **task))
+		session.flush()
+		session.add_all([OBJ.TaskTag(task_uuid='ctx1', tag_uuid='t1'),
+				OBJ.TaskTag(task_uuid='ctx2', tag_uuid='t2')])
+		session.commit()
+
+	def tearDown(self):
+		self.session.close()
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+		queries.AppConfig = self._appconfig
+
+	def _check(self, params, expected):
+		session = self.session
+		self.assertEqual([task.uuid for task in OBJ.Task.select_by_filters(
+				params, session=session)], expected, params)
+		self.assertEqual([task.uuid for task in OBJ.Task.select_by_filters(
+				params, session=session, snapshot=True)], expected, params)
+		self.assertEqual([row[0] for row in OBJ.Task.select_uuids_by_filters(
+				params, session=session)], expected, params)
+		self.assertEqual(OBJ.Task.count_by_filters(params, session=session),
+				len(expected), params)
+
+	def _params(self, group, options=0, parent=None, search=''):
+		return queries.build_query_params(group, options, parent, search)
+
+	def test_groups(self):
+		for group, expected in (
+				(queries.QUERY_ALL_TASK, _ALL),
+				(queries.QUERY_HOTLIST, ['ctx2', 'due_today', 'starred']),
+				(queries.QUERY_TODAY, ['due_today']),
+				(queries.QUERY_STARRED, ['starred']),
+				(queries.QUERY_BASKET, ['plain']),
+				(queries.QUERY_FINISHED, ['finished']),
+				(queries.QUERY_PROJECTS, ['project']),
+				(queries.QUERY_CHECKLISTS, ['checklist']),
+				(queries.QUERY_FUTURE_ALARMS, ['alarm']),
+				(queries.QUERY_TRASH, ['deleted'])):
+			self._check(self._params(group), expected)
+
+	def test_options(self):
+		group = queries.QUERY_ALL_TASK
+		self._check(self._params(group, queries.OPT_SHOW_FINISHED),
+				sorted(_ALL + ['finished']))
+		self._check(self._params(group, queries.OPT_SHOW_SUBTASKS),
+				sorted(_ALL + ['item', 'sub']))
+		self._check(self._params(group, queries.OPT_HIDE_UNTIL),
+				_without(_ALL, 'hidden'))
+		self._check(self._params(group, queries.OPT_SHOW_FINISHED |
+				queries.OPT_SHOW_SUBTASKS | queries.OPT_HIDE_UNTIL),
+				_without(sorted(_ALL + ['finished', 'item', 'sub']), 'hidden'))
+		self._check(self._params(queries.QUERY_FINISHED,
+				queries.OPT_SHOW_SUBTASKS), ['finished'])
+		self._check(self._params(queries.QUERY_FUTURE_ALARMS,
+				queries.OPT_SHOW_FINISHED), ['alarm'])
+
+	def test_parent_and_search(self):
+		self._check(self._params(queries.QUERY_PROJECTS, parent='project'),
+				['sub'])
+		self._check(self._params(queries.QUERY_CHECKLISTS, parent='checklist'),
+				['item'])
+		self._check(self._params(queries.QUERY_ALL_TASK, parent='checklist'),
+				['item'])
+		self._check(self._params(queries.QUERY_ALL_TASK, search=' CTX '),
+				['ctx1', 'ctx2'])
+		self._check(self._params(queries.QUERY_ALL_TASK, search='due'),
+				['due_future', 'due_today'])
+
+	def test_lists(self):
+		for key, values, expected in (
+				('contexts', ['c1'], ['ctx1', 'starred']),
+				# the same plan, other values
+				('contexts', ['c2'], _without(_ALL, 'ctx1', 'plain', 'starred')),
+				('contexts', [None], ['plain']),
+				('contexts', [None, 'c1'], ['ctx1', 'plain', 'starred']),
+				('folders', ['f1'], ['ctx1']),
+				('folders', [None], _without(_ALL, 'ctx1')),
+				('goals', ['g1'], ['ctx1']),
+				('goals', ['g1', None], _ALL),
+				('tags', ['t1'], ['ctx1']),
+				('tags', ['t1', 't2'], ['ctx1', 'ctx2']),
+				('tags', [None], _without(_ALL, 'ctx1', 'ctx2')),
+				('tags', [None, 't2'], _without(_ALL, 'ctx1')),
+				('statuses', [0], ['plain'])):
+			params = self._params(queries.QUERY_ALL_TASK)
+			params[key] = values
+			self._check(params, expected)
+		# list filters together
+		params = self._params(queries.QUERY_ALL_TASK)
+		queries.query_params_append_contexts(params, ['c1', None])
+		queries.query_params_append_tags(params, [None])
+		self._check(params, ['plain', 'starred'])
+
+	def test_list_items(self):
+		session = self.session
+		item = OBJ.Task.get(session, uuid='item')
+		item.due_date = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+		session.add(OBJ.Task(uuid='subsub', title='subsub', parent_uuid='sub',
+				completed=datetime.datetime.utcnow()))
+		session.commit()
+		params = self._params(queries.QUERY_ALL_TASK,
+				queries.OPT_SHOW_FINISHED | queries.OPT_SHOW_SUBTASKS)
+		items = OBJ.Task.select_list_items_by_filters(params, session=session)
+		self.assertEqual([task.uuid for task in items], [task.uuid for task
+				in OBJ.Task.select_by_filters(params, session=session)])
+		by_uuids = OBJ.Task.select_list_items_by_uuids(['subsub', 'ctx1',
+				'deleted', 'missing'], session)
+		self.assertEqual([task.uuid for task in by_uuids],
+				['subsub', 'ctx1', 'deleted'])
+		for task in items + by_uuids:
+			orm_task = OBJ.Task.get(session, uuid=task.uuid)
+			for name in OBJ.TaskListItem.__slots__:
+				self.assertEqual(getattr(task, name), getattr(orm_task, name),
+						(task.uuid, name))
+		items = dict((task.uuid, task) for task in items)
+		self.assertEqual((items['ctx1'].context_title,
+				items['ctx1'].folder_title, items['ctx1'].goal_title,
+				items['ctx1'].tags_titles), ('c1', 'f1', 'g1', 't1'))
+		self.assertEqual((items['checklist'].child_count,
+				items['checklist'].active_child_count,
+				items['checklist'].child_overdue), (1, 1, 1))
+		self.assertEqual((items['sub'].child_count,
+				items['sub'].active_child_count), (1, 0))
+		self.assertEqual(items['subsub'].parents_path, 'project/sub')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+""" SQL queries instrumentation.
+
+Count queries and SQL time per logical operation (refresh list, sync phase,
+save task...) and detect N+1 patterns - the same statement executed many
+times with different parameters in one operation.
+
+Profiling is disabled by default; `enable` attach listeners to engine.
+Operations are marked by `operation` context manager or `profiled`
+decorator; when profiler is disabled they cost only one attribute check.
+
+	with profiler.operation('refresh list'):
+		...
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-23"
+
+import time
+import logging
+import functools
+import threading
+import contextlib
+
+from sqlalchemy import event
+
+_LOG = logging.getLogger(__name__)
+
+# minimal number of executions of the same statement in one operation
+# reported as N+1
+N_PLUS_ONE_THRESHOLD = 10
+# name of pseudo-operation for queries executed outside operations
+NO_OPERATION = '(no operation)'
+
+
+class OperationStats(object):
+	""" Aggregated statistics for operation. """
+
+	def __init__(self, name):
+		self.name = name
+		self.calls = 0
+		self.queries = 0
+		self.max_queries = 0
+		self.sql_time = 0.0
+		self.wall_time = 0.0
+		# statement -> max number of executions in one call
+		self.n_plus_one = {}
+
+	def __repr__(self):
+		return "<OperationStats %s: calls=%d, queries=%d, sql=%.1fms>" % (
+				self.name, self.calls, self.queries, self.sql_time * 1000)
+
+
+class _Operation(object):
+	""" One running operation. """
+
+	def __init__(self, name):
+		self.name = name
+		self.start = time.time()
+		self.queries = 0
+		self.sql_time = 0.0
+		# statement -> [executions, set of parameters]
+		self.statements = {}
+
+	def add_query(self, statement, parameters, duration):
+		self.queries += 1
+		self.sql_time += duration
+		stmt = self.statements.get(statement)
+		if stmt is None:
+			stmt = self.statements[statement] = [0, set()]
+		stmt[0] += 1
+		if len(stmt[1]) < 2:
+			stmt[1].add(repr(parameters))
+
+	def find_n_plus_one(self):
+		""" Find statements executed many times with different parameters.
+
+		Returns:
+			list of (statement, number of executions)
+		"""
+		return [(statement, cnt)
+				for statement, (cnt, params) in self.statements.iteritems()
+				if cnt >= N_PLUS_ONE_THRESHOLD and len(params) > 1]
+
+
+class SqlProfiler(object):
+	""" Collect statistics of sql queries per operation.
+
+	Operations are tracked per thread; query is counted in all operations
+	that are running in thread (inclusive), N+1 patterns are reported for
+	innermost operation.
+	"""
+
+	def __init__(self):
+		self.enabled = False
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		# operation name -> OperationStats
+		self._stats = {}
+		self._engines = []
+
+	def enable(self, engine):
+		""" Start profiling queries executed by `engine`. """
+		if engine not in self._engines:
+			event.listen(engine, "before_cursor_execute", self._before_execute)
+			event.listen(engine, "after_cursor_execute", self._after_execute)
+			self._engines.append(engine)
+		self.enabled = True
+		_LOG.info("SqlProfiler enabled")
+
+	def disable(self):
+		for engine in self._engines:
+			event.remove(engine, "before_cursor_execute", self._before_execute)
+			event.remove(engine, "after_cursor_execute", self._after_execute)
+		self._engines = []
+		self.enabled = False
+
+	def reset(self):
+		with self._lock:
+			self._stats.clear()
+
+	@contextlib.contextmanager
+	def operation(self, name):
+		""" Mark block of code as logical operation `name`. """
+		if not self.enabled:
+			yield
+			return
+		stack = self._get_stack()
+		oper = _Operation(name)
+		stack.append(oper)
+		try:
+			yield
+		finally:
+			stack.pop()
+			self._finish(oper)
+
+	def get_stats(self):
+		""" Get list of OperationStats sorted by sql time (descending). """
+		with self._lock:
+			return sorted(self._stats.itervalues(),
+					key=lambda stats: stats.sql_time, reverse=True)
+
+	def format_summary(self):
+		""" Format statistics as list of text lines. """
+		lines = ["%-30s %6s %8s %6s %10s %10s" % ('operation', 'calls',
+				'queries', 'max', 'sql ms', 'total ms')]
+		n_plus_one = []
+		for stats in self.get_stats():
+			lines.append("%-30s %6d %8d %6d %10.1f %10.1f" % (stats.name[:30],
+					stats.calls, stats.queries, stats.max_queries,
+					stats.sql_time * 1000, stats.wall_time * 1000))
+			n_plus_one.extend((stats.name, statement, cnt)
+					for statement, cnt in stats.n_plus_one.iteritems())
+		if n_plus_one:
+			lines.append("N+1 queries:")
+			for name, statement, cnt in sorted(n_plus_one,
+					key=lambda item: -item[2]):
+				lines.append("  %s: %d x %s" % (name, cnt,
+						_short_statement(statement)))
+		return lines
+
+	def log_summary(self):
+		if self.enabled:
+			_LOG.info("SQL profile:\n%s", "\n".join(self.format_summary()))
+
+	def _get_stack(self):
+		stack = getattr(self._local, 'stack', None)
+		if stack is None:
+			stack = self._local.stack = []
+		return stack
+
+	def _before_execute(self, _conn, _cursor, _statement, _parameters,
+			_context, _executemany):
+		self._local.query_start = time.time()
+
+	def _after_execute(self, _conn, _cursor, statement, parameters,
+			_context, _executemany):
+		start = getattr(self._local, 'query_start', None)
+		if start is None:
+			return
+		duration = time.time() - start
+		self._local.query_start = None
+		stack = self._get_stack()
+		if not stack:
+			with self._lock:
+				stats = self._get_operation_stats(NO_OPERATION)
+				stats.queries += 1
+				stats.sql_time += duration
+			return
+		# only innermost operation track statements
+		stack[-1].add_query(statement, parameters, duration)
+		for oper in stack[:-1]:
+			oper.queries += 1
+			oper.sql_time += duration
+
+	def _finish(self, oper):
+		wall_time = time.time() - oper.start
+		n_plus_one = oper.find_n_plus_one()
+		with self._lock:
+			stats = self._get_operation_stats(oper.name)
+			stats.calls += 1
+			stats.queries += oper.queries
+			stats.max_queries = max(stats.max_queries, oper.queries)
+			stats.sql_time += oper.sql_time
+			stats.wall_time += wall_time
+			for statement, cnt in n_plus_one:
+				stats.n_plus_one[statement] = max(cnt,
+						stats.n_plus_one.get(statement, 0))
+		_LOG.debug("operation %s: %d queries, sql %.1fms, total %.1fms",
+				oper.name, oper.queries, oper.sql_time * 1000, wall_time * 1000)
+		for statement, cnt in n_plus_one:
+			_LOG.info("operation %s: N+1 query (%d x): %s", oper.name, cnt,
+					_short_statement(statement))
+
+	def _get_operation_stats(self, name):
+		stats = self._stats.get(name)
+		if stats is None:
+			stats = self._stats[name] = OperationStats(name)
+		return stats
+
+
+def _short_statement(statement, length=160):
+	statement = ' '.join(statement.split())
+	if len(statement) > length:
+		statement = statement[:length - 3] + '...'
+	return statement
+
+
+PROFILER = SqlProfiler()
+
+
+def enable(engine):
+	PROFILER.enable(engine)
+
+
+def is_enabled():
+	return PROFILER.enabled
+
+
+def operation(name):
+	""" Context manager marking logical operation. """
+	return PROFILER.operation(name)
+
+
+def profiled(name):
+	""" Decorator marking function as logical operation `name`. """
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			with PROFILER.operation(name):
+				return func(*args, **kwargs)
+		return wrapper
+	return decorator
+
+
+def get_stats():
+	return PROFILER.get_stats()
+
+
+def format_summary():
+	return PROFILER.format_summary()
+
+
+def log_summary():
+	PROFILER.log_summary()
+
+
+def reset():
+	PROFILER.reset()
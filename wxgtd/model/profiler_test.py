@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for profiler module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-23"
+
+from unittest import main, TestCase
+
+import sqlalchemy
+
+from . import profiler
+
+
+class TestSqlProfiler(TestCase):
+	""" Test SqlProfiler. """
+
+	def setUp(self):
+		self.engine = sqlalchemy.create_engine("sqlite://")
+		self.engine.execute("create table items (id integer, parent integer)")
+		self.prof = profiler.SqlProfiler()
+
+	def tearDown(self):
+		self.prof.disable()
+
+	def _stats(self):
+		return dict((stats.name, stats) for stats in self.prof.get_stats())
+
+	def test_disabled(self):
+		with self.prof.operation('oper'):
+			self.engine.execute("select * from items")
+		self.assertEqual(self.prof.get_stats(), [])
+
+	def test_operations(self):
+		self.prof.enable(self.engine)
+		with self.prof.operation('outer'):
+			self.engine.execute("select * from items")
+			with self.prof.operation('inner'):
+				self.engine.execute("select * from items where id=?", 1)
+		with self.prof.operation('inner'):
+			pass
+		self.engine.execute("select 1")
+		stats = self._stats()
+		self.assertEqual(stats['outer'].calls, 1)
+		self.assertEqual(stats['outer'].queries, 2)
+		self.assertEqual(stats['inner'].calls, 2)
+		self.assertEqual(stats['inner'].queries, 1)
+		self.assertEqual(stats['inner'].max_queries, 1)
+		self.assertEqual(stats[profiler.NO_OPERATION].queries, 1)
+		self.assertEqual(stats['outer'].n_plus_one, {})
+
+	def test_n_plus_one(self):
+		self.prof.enable(self.engine)
+		with self.prof.operation('oper'):
+			for idx in xrange(profiler.N_PLUS_ONE_THRESHOLD):
+				self.engine.execute("select * from items where parent=?", idx)
+			# the same parameters - not N+1
+			for idx in xrange(profiler.N_PLUS_ONE_THRESHOLD):
+				self.engine.execute("select * from items where id=?", 1)
+		n_plus_one = self._stats()['oper'].n_plus_one
+		self.assertEqual(n_plus_one.values(), [profiler.N_PLUS_ONE_THRESHOLD])
+		self.assertIn('parent=?', n_plus_one.keys()[0])
+		self.assertTrue(any(line.startswith('N+1')
+				for line in self.prof.format_summary()))
+
+
+if __name__ == '__main__':
+	main()
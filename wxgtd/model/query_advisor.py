@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Check query plans of standard queries (EXPLAIN QUERY PLAN).
+
+Replay queries used by gui (task groups, group counters, subtasks counters,
+reminders) and report full table scans and temporary b-trees used for
+sorting.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-22'
+
+import sys
+import datetime
+import logging
+
+from sqlalchemy import select, func, and_
+
+from wxgtd.model import objects as OBJ
+from wxgtd.model import queries
+from wxgtd.model import enums
+
+_LOG = logging.getLogger(__name__)
+
+_GROUPS = (
+		('all', queries.QUERY_ALL_TASK),
+		('hotlist', queries.QUERY_HOTLIST),
+		('today', queries.QUERY_TODAY),
+		('starred', queries.QUERY_STARRED),
+		('basket', queries.QUERY_BASKET),
+		('finished', queries.QUERY_FINISHED),
+		('projects', queries.QUERY_PROJECTS),
+		('checklists', queries.QUERY_CHECKLISTS),
+		('future alarms', queries.QUERY_FUTURE_ALARMS),
+		('trash', queries.QUERY_TRASH))
+
+
+def get_workload():
+	""" Build standard queries.
+
+	Returns:
+		list of (name, statement, params)
+	"""
+	# pylint: disable=W0212
+	workload = []
+	for name, group in _GROUPS:
+		for opt_name, options, parent in (
+				('', queries.OPT_HIDE_UNTIL, None),
+				(' +subtasks', queries.OPT_HIDE_UNTIL | queries.OPT_SHOW_SUBTASKS,
+					None),
+				(' +finished', queries.OPT_SHOW_FINISHED, None),
+				(' parent', queries.OPT_HIDE_UNTIL, 'parent-uuid')):
+			params = queries.build_query_params(group, options, parent, '')
+			plan, values = OBJ._get_filters_plan(params)
+			workload.append((name + opt_name, plan.select, values))
+			if not parent:
+				workload.append((name + opt_name + ' (count)', plan.count, values))
+	now = datetime.datetime.utcnow()
+	task = OBJ.Task.__table__.c
+	# subtasks counters (for each task on list)
+	workload.append(('child_count', select([func.count(task.uuid)]).where(
+			and_(task.parent_uuid == 'parent-uuid', task.deleted.is_(None))), {}))
+	workload.append(('active_child_count', select([func.count(task.uuid)])
+			.where(and_(task.parent_uuid == 'parent-uuid',
+					task.completed.is_(None), task.deleted.is_(None))), {}))
+	workload.append(('child_overdue', select([func.count(task.uuid)])
+			.where(and_(task.parent_uuid == 'parent-uuid',
+					task.due_date.isnot(None), task.completed.is_(None),
+					task.deleted.is_(None), task.due_date < now,
+					task.type != enums.TYPE_PROJECT)), {}))
+	# reminders
+	session = OBJ.Session()
+	workload.append(('reminders', OBJ.Task.select_reminders(None,
+			session).statement, {}))
+	workload.append(('reminders scheduler', session.query(OBJ.Task.uuid,
+			OBJ.Task.alarm).filter(OBJ.Task.alarm.isnot(None),
+					OBJ.Task.completed.is_(None),
+					OBJ.Task.deleted.is_(None)).statement, {}))
+	session.close()
+	return workload
+
+
+def explain(connection, statement, params):
+	""" Get query plan for statement.
+
+	Returns:
+		list of plan details (strings)
+	"""
+	compiled = statement.compile(dialect=connection.dialect)
+	values = compiled.construct_params(params)
+	args = tuple(values[name] for name in compiled.positiontup)
+	result = connection.execute("EXPLAIN QUERY PLAN " + unicode(compiled),
+			args)
+	# last column is detail
+	return [tuple(row)[-1] for row in result]
+
+
+def is_full_scan(detail):
+	""" Check if plan step is scan of whole table (not index). """
+	detail = detail.upper()
+	return detail.startswith('SCAN ') and 'INDEX' not in detail and \
+			'SUBQUERY' not in detail and 'CONSTANT ROW' not in detail
+
+
+def is_temp_sort(detail):
+	return 'USE TEMP B-TREE' in detail.upper()
+
+
+def check_queries(connection):
+	""" Replay workload and find problems.
+
+	Returns:
+		list of (query name, plan details, list of problems)
+	"""
+	results = []
+	for name, statement, params in get_workload():
+		details = explain(connection, statement, params)
+		problems = [detail for detail in details
+				if is_full_scan(detail) or is_temp_sort(detail)]
+		results.append((name, details, problems))
+	return results
+
+
+def print_report(connection, verbose=False, output=sys.stdout):
+	""" Print report; return number of queries with problems. """
+	bad = 0
+	results = check_queries(connection)
+	for name, details, problems in results:
+		if problems:
+			bad += 1
+		if problems or verbose:
+			output.write("%-6s %s\n" % ('WARN' if problems else 'OK', name))
+			for detail in details:
+				output.write("         %s%s\n" % (detail,
+						'  <--' if detail in problems else ''))
+	output.write("%d queries, %d with full scans or temporary sorting\n" %
+			(len(results), bad))
+	return bad
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for query_advisor module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-22"
+
+import os
+import shutil
+import tempfile
+import StringIO
+from unittest import main, TestCase
+
+from wxgtd.lib import appconfig
+
+from . import db
+from . import sqls
+from . import objects as OBJ
+from . import query_advisor
+
+
+class TestQueryAdvisor(TestCase):
+	""" Test query plans of standard queries. """
+
+	def setUp(self):
+		# hotlist settings are read from configuration
+		appconfig.AppConfig('wxgtd.cfg', 'wxgtd-test')
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		self.session = OBJ.Session()
+
+	def tearDown(self):
+		self.session.close()
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def test_no_full_scans(self):
+		for name, details, _problems in query_advisor.check_queries(
+				self.session.connection()):
+			if name.startswith('trash'):
+				continue
+			self.assertFalse(any(query_advisor.is_full_scan(detail)
+					for detail in details), (name, details))
+
+	def test_report(self):
+		output = StringIO.StringIO()
+		bad = query_advisor.print_report(self.session.connection(),
+				output=output)
+		self.assertIn("%d with full scans" % bad, output.getvalue())
+
+	def test_update_indexes(self):
+		engine = self.session.get_bind()
+		engine.execute("drop index idx_task_active_parent")
+		engine.execute("create index idx_task_show on tasks (title)")
+		sqls.update_indexes(engine, OBJ.Base.metadata)
+		names = set(row[0] for row in engine.execute(
+				"select name from sqlite_master where type='index'"))
+		self.assertIn('idx_task_active_parent', names)
+		self.assertNotIn('idx_task_show', names)
+
+
+if __name__ == '__main__':
+	main()
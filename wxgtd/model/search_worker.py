@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Running search queries in background thread.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-21'
+
+import time
+import logging
+import itertools
+import threading
+
+from sqlalchemy import exc
+
+from wxgtd.model import objects
+
+_LOG = logging.getLogger(__name__)
+
+# delay after last request before query is started (sec)
+DEFAULT_DELAY = 0.3
+# number of task uuids in one result page
+PAGE_SIZE = 200
+
+
+class SearchWorker(threading.Thread):
+	""" Thread running search queries.
+
+	Each request gets new generation number; request is started when there
+	is no newer request for `delay` seconds. New request (or `cancel`)
+	interrupt running query. Query is run in separate, read-only session and
+	only task uuids are returned - in pages by `page_cb`.
+
+	Callbacks are called in worker thread - caller is responsible for passing
+	them to gui thread (i.e. by wx.CallAfter) and for ignoring results for
+	outdated requests (see `is_current`).
+	"""
+
+	def __init__(self, page_size=PAGE_SIZE):
+		threading.Thread.__init__(self, name="search")
+		self.daemon = True
+		self._page_size = page_size
+		self._cond = threading.Condition()
+		self._generation = 0
+		# (generation, start time, query_func, page_cb)
+		self._request = None
+		self._stopped = False
+		# sqlite connection used by running query
+		self._connection = None
+
+	def submit(self, query_func, page_cb, delay=DEFAULT_DELAY):
+		""" Request new search.
+
+		Args:
+			query_func: function(session) returning sqlalchemy query for task
+				uuids (uuid must be first column)
+			page_cb: function(generation, list of uuids, first page, last page)
+			delay: debounce time in seconds
+
+		Returns:
+			generation number of request.
+		"""
+		with self._cond:
+			self._generation += 1
+			self._request = (self._generation, time.time() + delay, query_func,
+					page_cb)
+			self._interrupt()
+			self._cond.notify()
+			return self._generation
+
+	def cancel(self):
+		""" Cancel pending and running requests. """
+		with self._cond:
+			self._generation += 1
+			self._request = None
+			self._interrupt()
+
+	def stop(self):
+		with self._cond:
+			self._generation += 1
+			self._stopped = True
+			self._request = None
+			self._interrupt()
+			self._cond.notify()
+
+	def is_current(self, generation):
+		return generation == self._generation
+
+	def run(self):
+		while True:
+			with self._cond:
+				request = self._next_request()
+				if request is None:
+					return
+			self._run_query(*request)
+
+	def _next_request(self):
+		""" Wait for request that is not superseded for its delay. """
+		while not self._stopped:
+			if self._request is None:
+				self._cond.wait()
+				continue
+			wait = self._request[1] - time.time()
+			if wait > 0:
+				self._cond.wait(wait)
+				continue
+			request, self._request = self._request, None
+			return request
+		return None
+
+	def _run_query(self, generation, _start, query_func, page_cb):
+		_LOG.debug("SearchWorker._run_query(%d)", generation)
+		session = objects.Session()
+		try:
+			session.execute("PRAGMA query_only = ON")
+			with self._cond:
+				if not self.is_current(generation):
+					return
+				self._connection = session.connection().connection.connection
+			rows_iter = iter(query_func(session).yield_per(self._page_size))
+			first = True
+			while True:
+				rows = list(itertools.islice(rows_iter, self._page_size))
+				last = len(rows) < self._page_size
+				if not self.is_current(generation):
+					return
+				page_cb(generation, [row[0] for row in rows], first, last)
+				if last:
+					break
+				first = False
+		except Exception as err:  # pylint: disable=W0703
+			# interrupted query raise OperationalError
+			if self.is_current(generation):
+				_LOG.exception("SearchWorker._run_query error")
+			else:
+				_LOG.debug("SearchWorker._run_query(%d) interrupted: %s",
+						generation, err)
+		finally:
+			with self._cond:
+				self._connection = None
+			try:
+				session.execute("PRAGMA query_only = OFF")
+			except exc.SQLAlchemyError:
+				pass
+			session.close()  # pylint: disable=E1101
+
+	def _interrupt(self):
+		""" Abort running query (called with lock acquired). """
+		if self._connection is not None:
+			_LOG.debug("SearchWorker: interrupt query")
+			self._connection.interrupt()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for search_worker module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-21"
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import main, TestCase
+
+from . import db
+from . import objects as OBJ
+from . import search_worker
+
+
+class TestSearchWorker(TestCase):
+	""" Test SearchWorker. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		session = OBJ.Session()
+		session.add_all(OBJ.Task(title='task %03d' % idx) for idx in xrange(250))
+		session.commit()
+		session.close()
+		self.pages = []
+		self.finished = threading.Event()
+		self.worker = search_worker.SearchWorker(page_size=100)
+		self.worker.start()
+
+	def tearDown(self):
+		self.worker.stop()
+		self.worker.join(5)
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def _page_cb(self, generation, uuids, first, last):
+		self.pages.append((generation, len(uuids), first, last))
+		if last:
+			self.finished.set()
+
+	def _search(self, text, delay):
+		return self.worker.submit(lambda session: OBJ.Task.search(text, True,
+				session).with_entities(OBJ.Task.uuid), self._page_cb, delay)
+
+	def test_search(self):
+		gen = self._search('task', 0)
+		self.assertTrue(self.finished.wait(5))
+		self.assertEqual(self.pages, [(gen, 100, True, False),
+				(gen, 100, False, False), (gen, 50, False, True)])
+		self.assertTrue(self.worker.is_current(gen))
+
+	def test_debounce(self):
+		self._search('task', 0.2)
+		self._search('task 0', 0.2)
+		gen = self._search('task 1', 0.2)
+		self.assertTrue(self.finished.wait(5))
+		# only last request is executed
+		self.assertEqual(self.pages, [(gen, 100, True, False),
+				(gen, 0, False, True)])
+
+	def test_readonly(self):
+		def query_func(session):
+			session.execute("DELETE FROM tasks")
+		self.worker.submit(query_func, self._page_cb, 0)
+		self._search('task', 0.1)
+		self.assertTrue(self.finished.wait(5))
+		self.assertEqual(OBJ.Session().query(OBJ.Task).count(), 250)
+
+
+if __name__ == '__main__':
+	main()
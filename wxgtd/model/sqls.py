@@ -155,3 +155,23 @@ def fix_synclog(engine):
 		conn.execute("insert into synclog select device_id, sync_time, "
 				"prev_sync_time from synclog")
 	engine.execute("drop table synclog_old;")
+
+
+# indexes replaced by other
+_OBSOLETE_INDEXES = ('idx_task_childs', 'idx_task_show')
+
+
+def update_indexes(engine, metadata):
+	""" Create indexes missing in existing tables; drop obsolete indexes.
+
+	metadata.create_all creates indexes only for new tables.
+	"""
+	existing = set(row[0] for row in engine.execute(
+			"select name from sqlite_master where type='index'"))
+	for name in _OBSOLETE_INDEXES:
+		if name in existing:
+			engine.execute("drop index %s" % name)
+	for table in metadata.sorted_tables:
+		for index in table.indexes:
+			if index.name not in existing:
+				index.create(engine)
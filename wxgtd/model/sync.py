@@ -16,13 +16,23 @@ import logging
 import gettext
 import os
 import datetime
+import hashlib
+import json
+import tempfile
+import threading
+
+from sqlalchemy import func
 
 from wxgtd.wxtools.wxpub import publisher
 
 from wxgtd.lib import appconfig
 
+from wxgtd.model import backup
 from wxgtd.model import exporter
 from wxgtd.model import loader
+from wxgtd.model import objects
+from wxgtd.model import profiler
+from wxgtd.model import transport
 
 
 _LOG = logging.getLogger(__name__)
@@ -39,66 +49,195 @@ class OtherSyncError(RuntimeError):
 	pass
 
 
+class SyncCancelledError(RuntimeError):
+	""" Synchronisation cancelled by user. """
+	pass
+
+
 def _notify_progress(progress, msg):
 	publisher.sendMessage('sync.progress',
 			data=(progress, msg))
 
 
-def sync(filename, load_only=False, notify_cb=_notify_progress):
+def sync(filename, load_only=False, notify_cb=_notify_progress, force=False):
 	""" Sync data from/to given file.
 
 	Notify progress by publisher.
 
 	Args:
-		filename: full path to file
+		filename: full path to file or http(s) url
 		load_only: only load, not write data
+		force: load all objects from file (full resync)
+
+	Returns:
+		False when nothing changed and synchronisation was skipped.
 
 	Raises:
 		SyncLockedError when source file is locked.
 	"""
 	_LOG.info("sync: %r", filename)
+	if filename.startswith(('http://', 'https://')):
+		notify_cb(0, _("Sync via %s") % filename)
+		return sync_transport(transport.HttpTransport(filename), load_only,
+				notify_cb, force)
 	notify_cb(0, _("Sync via file %s") % filename)
-	notify_cb(0, _("Creating backup"))
-	create_backup()
-	notify_cb(25, _("Sanity check"))
-	_sync_file_check(filename)
-	notify_cb(50, _("Checking sync lock"))
-	if exporter.create_sync_lock(filename):
-		notify_cb(1, _("Loading..."))
-		try:
-			if loader.load_from_file(filename, notify_cb):
-				if not load_only:
-					exporter.save_to_file(filename, notify_cb)
-		except Exception as err:
-			_LOG.exception("file sync error")
-			raise OtherSyncError(err)
-		finally:
-			notify_cb(50, _("Removing sync lock"))
-			exporter.delete_sync_lock(filename)
-		notify_cb(100, _("Completed"))
-	else:
+	if not force and not is_sync_needed(filename, load_only):
+		_LOG.info("sync: no changes; skipping")
+		notify_cb(100, _("No changes"))
+		return False
+	sync_transport(transport.FileTransport(filename), load_only, notify_cb,
+			force)
+	_save_sync_state(filename, load_only)
+	return True
+
+
+def sync_transport(trans, load_only=False, notify_cb=_notify_progress,
+		force=False):
+	""" Synchronize data with sync file accessible by given transport.
+
+	Sync file is downloaded in background thread while backup is created.
+
+	Args:
+		trans: transport (see wxgtd.model.transport)
+		load_only: only load, not write data
+		force: load all objects from file (full resync)
+
+	Returns:
+		True after synchronisation
+
+	Raises:
+		SyncLockedError when source file is locked.
+	"""
+	notify_cb(1, _("Checking sync lock"))
+	try:
+		trans.check()
+		locked = not trans.lock()
+	except Exception as err:
+		_LOG.exception("sync_transport: lock error")
+		trans.close()
+		raise OtherSyncError(err)
+	if locked:
+		trans.close()
 		notify_cb(100, _("Synchronization file is locked. "
 			"Can't synchronize..."))
 		raise SyncLockedError()
+	suffix = os.path.splitext(trans.name)[1]
+	tmp_fd, tmp_filename = tempfile.mkstemp(suffix=suffix)
+	download = _Downloader(trans, os.fdopen(tmp_fd, 'wb'))
+	try:
+		notify_cb(2, _("Downloading..."))
+		download.start()
+		notify_cb(3, _("Creating backup"))
+		with profiler.operation('sync: backup'):
+			create_backup()
+		loaded = download.wait()
+		notify_cb(5, _("Loading..."))
+		if loaded:
+			with profiler.operation('sync: load'):
+				loaded = loader.load_from_file(tmp_filename, notify_cb, force,
+						use_incremental_sync())
+		else:
+			loaded = True
+		if loaded and not load_only:
+			internal_fname = os.path.splitext(trans.name)[0] + '.json'
+			with profiler.operation('sync: save'):
+				exporter.save_to_file(tmp_filename, notify_cb, internal_fname)
+			notify_cb(95, _("Uploading..."))
+			with open(tmp_filename, 'rb') as tmp_file:
+				trans.put(tmp_file, os.path.getsize(tmp_filename))
+	except SyncCancelledError:
+		raise
+	except Exception as err:
+		_LOG.exception("sync_transport: sync error")
+		raise OtherSyncError(err)
+	finally:
+		download.join()
+		try:
+			trans.unlock()
+		except Exception:  # pylint: disable=W0703
+			_LOG.exception("sync_transport: unlock error")
+		trans.close()
+		if os.path.isfile(tmp_filename):
+			os.unlink(tmp_filename)
+	# not in finally - notify_cb may raise SyncCancelledError
+	notify_cb(99, _("Sync lock removed"))
+	notify_cb(100, _("Completed"))
+	return True
+
+
+class _Downloader(threading.Thread):
+	""" Download sync file into `fileobj` in background. """
+
+	def __init__(self, trans, fileobj):
+		threading.Thread.__init__(self, name="sync-download")
+		self.daemon = True
+		self._trans = trans
+		self._fileobj = fileobj
+		self._result = None
+		self._error = None
+
+	def run(self):
+		try:
+			self._result = self._trans.get(self._fileobj)
+		except Exception as err:  # pylint: disable=W0703
+			self._error = err
+		finally:
+			self._fileobj.close()
+
+	def wait(self):
+		""" Wait for download; re-raise download error.
+
+		Returns:
+			False when remote file not exists.
+		"""
+		self.join()
+		if self._error is not None:
+			raise self._error  # pylint: disable=E0702
+		return self._result
+
+	def join(self, timeout=None):
+		if self.ident is None:
+			# not started
+			self._fileobj.close()
+			return
+		threading.Thread.join(self, timeout)
+
+
+def use_incremental_sync():
+	""" Check is incremental loading of sync file enabled.
+
+	Configuration in wxgtd.conf:
+	[sync]
+	incremental = True
+	"""
+	return bool(appconfig.AppConfig().get('sync', 'incremental', True))
 
 
 def create_backup():
 	""" Create backup current data in database.
 
-	Format of backup file is identical with synchronization file.
 	Backup are stored for default in ~/.local/share/wxgtd/backups/
+	Default mode ("snapshot") store incremental, deduplicated snapshots
+	(see: wxgtd.model.backup) written in background thread. Mode "sqlite"
+	store compressed copy of database file. Mode "json" create regular export
+	file - format is identical with synchronization file.
 
 	Configuration in wxgtd.conf:
 	[backup]
 	number_copies = 21
 	location = <path to dir>
+	mode = snapshot|sqlite|json
 	"""
 	appcfg = appconfig.AppConfig()
-	backup_dir = appcfg.get('backup', 'location')
-	if backup_dir:
-		backup_dir = os.path.expanduser(backup_dir)
-	else:
-		backup_dir = os.path.join(appcfg.user_share_dir, 'backups')
+	backup_dir = get_backup_dir()
+	num_copies = int(appcfg.get('backup', 'number_copies', 21))
+	mode = appcfg.get('backup', 'mode', 'snapshot')
+	if mode == 'snapshot':
+		_LOG.info('create_backup: snapshot in %s', backup_dir)
+		return backup.create_snapshot(backup_dir, num_copies)
+	if mode == 'sqlite':
+		_LOG.info('create_backup: sqlite backup in %s', backup_dir)
+		return backup.create_sqlite_backup(backup_dir, num_copies)
 	filename = os.path.join(backup_dir,
 			"BACKUP_" + datetime.date.today().isoformat() + ".json.zip")
 	_LOG.info('create_backup: %s', filename)
@@ -106,13 +245,12 @@ def create_backup():
 		_LOG.info("create_backup: today backup already exists; skipping...")
 		return True
 	if os.path.isdir(backup_dir):
-		num_files_to_keep = int(appcfg.get('backup', 'number_copies', 21))
 		# backup dir exists; check number of files and delete if more than 21
 		files = sorted((fname for fname in os.listdir(backup_dir)
 				if fname.startswith('BACKUP') and fname.endswith('.json.zip')),
 				reverse=True)
-		if len(files) >= num_files_to_keep:
-			for fname in files[num_files_to_keep:]:
+		if len(files) >= num_copies:
+			for fname in files[num_copies:]:
 				_LOG.info('create_backup: delete backup: %r', fname)
 				os.unlink(os.path.join(backup_dir, fname))
 	else:
@@ -128,12 +266,130 @@ def create_backup():
 	return True
 
 
-def _sync_file_check(filename):
-	directory = os.path.dirname(filename)
-	if not os.path.isdir(directory):
-		raise OtherSyncError(_("Sync directory not exists."))
-	files = os.listdir(directory)
-	if 'sync.locked' in files:
-		files.remove('sync.locked')
-	if len(files) > 2:
-		raise OtherSyncError(_("To many files in sync directory."))
+def get_backup_dir():
+	""" Get configured directory for backups. """
+	appcfg = appconfig.AppConfig()
+	backup_dir = appcfg.get('backup', 'location')
+	if backup_dir:
+		return os.path.expanduser(backup_dir)
+	return os.path.join(appcfg.user_share_dir, 'backups')
+
+
+_SYNC_STATE_KEY = 'sync_state'
+# objects included in database change counter
+_SYNC_STATE_CLASSES = (objects.Task, objects.Folder, objects.Context,
+		objects.Goal, objects.Tag, objects.TaskTag, objects.Tasknote,
+		objects.NotebookPage)
+
+
+def is_sync_needed(filename, load_only=False):
+	""" Check if sync file or database changed since last synchronisation.
+
+	Compare size, modification time and (only when necessary) content hash
+	of sync file and database change counter with values stored after last
+	synchronisation. Sync file is not decoded.
+
+	Args:
+		filename: full path to sync file
+		load_only: check only sync file
+
+	Returns:
+		False when synchronisation may be skipped.
+	"""
+	session = objects.Session()
+	state = _load_sync_state(session)
+	if not state or state.get('filename') != filename:
+		return True
+	if not _is_file_unchanged(filename, state.get('file')):
+		_LOG.debug("is_sync_needed: sync file changed")
+		return True
+	if load_only:
+		return False
+	return state.get('db') != _get_db_state(session)
+
+
+def _load_sync_state(session):
+	conf = session.query(objects.Conf).filter_by(  # pylint: disable=E1101
+			key=_SYNC_STATE_KEY).first()
+	if conf is None or not conf.val:
+		return None
+	try:
+		return json.loads(conf.val)
+	except ValueError:
+		_LOG.exception("_load_sync_state: wrong state %r", conf.val)
+	return None
+
+
+def _save_sync_state(filename, load_only):
+	""" Store state of sync file & database after synchronisation.
+
+	After loading only, database state is not updated, so local changes made
+	before loading are still written on next synchronisation.
+	"""
+	session = objects.Session()
+	state = _load_sync_state(session)
+	if not state or state.get('filename') != filename:
+		state = {'filename': filename}
+	state['file'] = _get_file_state(filename)
+	if not load_only:
+		state['db'] = _get_db_state(session)
+	conf = session.query(objects.Conf).filter_by(  # pylint: disable=E1101
+			key=_SYNC_STATE_KEY).first()
+	if conf is None:
+		conf = objects.Conf(key=_SYNC_STATE_KEY)
+		session.add(conf)  # pylint: disable=E1101
+	conf.val = json.dumps(state)
+	session.commit()  # pylint: disable=E1101
+	_LOG.debug("_save_sync_state: %r", state)
+
+
+def _get_file_state(filename):
+	""" Get size, modification time and content hash of file.
+
+	Returns:
+		dict or None when file not exists.
+	"""
+	if not os.path.isfile(filename):
+		return None
+	fstat = os.stat(filename)
+	return {'size': fstat.st_size, 'mtime': fstat.st_mtime,
+			'hash': _file_hash(filename)}
+
+
+def _is_file_unchanged(filename, file_state):
+	""" Compare file with stored state.
+
+	Hash is computed only when size is the same but modification time differ.
+	"""
+	if not file_state or not os.path.isfile(filename):
+		return False
+	fstat = os.stat(filename)
+	if fstat.st_size != file_state['size']:
+		return False
+	if fstat.st_mtime == file_state['mtime']:
+		return True
+	return _file_hash(filename) == file_state['hash']
+
+
+def _file_hash(filename):
+	fhash = hashlib.sha1()
+	with open(filename, 'rb') as ifile:
+		while True:
+			data = ifile.read(65536)
+			if not data:
+				break
+			fhash.update(data)
+	return fhash.hexdigest()
+
+
+def _get_db_state(session):
+	""" Build database change counter - number of objects and last
+	modification and deletion time for each table. """
+	state = []
+	for cls in _SYNC_STATE_CLASSES:
+		cols = [func.count(), func.max(cls.modified)]
+		if hasattr(cls, 'deleted'):
+			cols.append(func.max(cls.deleted))
+		row = session.query(*cols).select_from(cls).one()  # pylint: disable=W0142
+		state.append([None if val is None else str(val) for val in row])
+	return state
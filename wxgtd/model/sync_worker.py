@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Running synchronisation in background thread.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-27'
+
+import logging
+import threading
+
+from wxgtd.model import objects
+from wxgtd.model import sync as SYNC
+
+_LOG = logging.getLogger(__name__)
+
+# steps from uploading data to the end can't be cancelled
+_PROGRESS_NO_CANCEL = 95
+
+
+class SyncWorker(threading.Thread):
+	""" Thread running synchronisation function.
+
+	Sync function is called with `notify_cb` keyword argument. Worker use its
+	own database sessions; callbacks are called in worker thread - caller is
+	responsible for passing them to gui thread (i.e. by wx.CallAfter).
+
+	Args:
+		sync_func: function to call (sync.sync, dbsync.sync)
+		args, kwargs: arguments for sync_func
+		progress_cb: function(progress, message) called on each step
+		finished_cb: function(result, error, changed_uuids) called after
+			synchronisation; error is None on success; changed_uuids is set
+			of uuid tasks added, modified or deleted by synchronisation.
+	"""
+
+	def __init__(self, sync_func, args, kwargs, progress_cb, finished_cb):
+		threading.Thread.__init__(self, name="sync")
+		self.daemon = True
+		self._sync_func = sync_func
+		self._args = args
+		self._kwargs = kwargs
+		self._progress_cb = progress_cb
+		self._finished_cb = finished_cb
+		self._cancelled = threading.Event()
+		self._cancel_raised = False
+
+	def cancel(self):
+		""" Request cancel synchronisation.
+
+		Synchronisation is interrupted on next progress step; changes are not
+		committed. Request is ignored when upload already started.
+		"""
+		_LOG.info("SyncWorker.cancel")
+		self._cancelled.set()
+
+	@property
+	def cancelled(self):
+		return self._cancelled.is_set()
+
+	def run(self):
+		_LOG.info("SyncWorker.run START")
+		result, error = None, None
+		state_before = _get_tasks_state()
+		try:
+			kwargs = dict(self._kwargs)
+			kwargs['notify_cb'] = self._notify
+			result = self._sync_func(*self._args, **kwargs)
+		except SYNC.SyncCancelledError as err:
+			_LOG.info("SyncWorker.run cancelled")
+			error = err
+		except Exception as err:  # pylint: disable=W0703
+			_LOG.exception("SyncWorker.run error")
+			error = err
+		# data may be changed even when error occurred after commit
+		changed = _find_changed_tasks(state_before, _get_tasks_state())
+		_LOG.info("SyncWorker.run FINISHED; changed tasks: %d", len(changed))
+		self._finished_cb(result, error, changed)
+
+	def _notify(self, progress, msg):
+		if self._cancelled.is_set() and not self._cancel_raised and \
+				progress < _PROGRESS_NO_CANCEL:
+			# raise only once - let sync function finish cleanup
+			self._cancel_raised = True
+			raise SYNC.SyncCancelledError()
+		self._progress_cb(progress, msg)
+
+
+def _get_tasks_state():
+	""" Get uuid -> (modified, deleted) mapping for all tasks. """
+	session = objects.Session()
+	query = session.query(objects.Task.uuid,  # pylint: disable=E1101
+			objects.Task.modified, objects.Task.deleted)
+	state = dict((uuid, (modified, deleted))
+			for uuid, modified, deleted in query)
+	session.close()  # pylint: disable=E1101
+	return state
+
+
+def _find_changed_tasks(state_before, state_after):
+	""" Find uuids of added, removed or modified tasks. """
+	changed = set(state_before).symmetric_difference(state_after)
+	changed.update(uuid for uuid, state in state_after.iteritems()
+			if uuid in state_before and state_before[uuid] != state)
+	return changed
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for sync_worker module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from . import db
+from . import objects as OBJ
+from . import sync as SYNC
+from . import sync_worker
+
+
+class TestSyncWorker(TestCase):
+	""" Test cancelling synchronisation in SyncWorker. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(self.tmpdir, 'wxgtd.db'))
+		self.progress = []
+		self.finished = []
+
+	def tearDown(self):
+		OBJ.Session.close_all()
+		shutil.rmtree(self.tmpdir)
+
+	def _run(self, cancel_at):
+		""" Run sync function notifying steps 50, 95, 99; cancel is requested
+		before step `cancel_at`. """
+
+		def sync_func(notify_cb):
+			for progress in (50, 95, 99):
+				if progress == cancel_at:
+					worker.cancel()
+				notify_cb(progress, str(progress))
+			return True
+
+		worker = sync_worker.SyncWorker(sync_func, (), {},
+				lambda *args: self.progress.append(args),
+				lambda *args: self.finished.append(args))
+		worker.start()
+		worker.join(5)
+		self.assertFalse(worker.is_alive())
+		self.assertEqual(len(self.finished), 1)
+		return self.finished[0]
+
+	def test_cancel(self):
+		result, error, changed = self._run(50)
+		self.assertIsNone(result)
+		self.assertIsInstance(error, SYNC.SyncCancelledError)
+		self.assertEqual(changed, set())
+		self.assertEqual(self.progress, [])
+
+	def test_cancel_during_upload(self):
+		# upload already started - cancel is ignored
+		result, error, _changed = self._run(95)
+		self.assertTrue(result)
+		self.assertIsNone(error)
+		self.assertEqual([progress for progress, _msg in self.progress],
+				[50, 95, 99])
+
+
+if __name__ == '__main__':
+	main()
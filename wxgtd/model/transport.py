@@ -0,0 +1,280 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Transports for synchronisation file.
+
+Transport give access to remote sync file and sync lock; synchronisation
+flow (lock, backup, load, export) is in sync.sync_transport.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-27'
+
+import os
+import json
+import shutil
+import socket
+import httplib
+import logging
+import gettext
+import tempfile
+import urlparse
+import posixpath
+
+from wxgtd.model import exporter
+
+_LOG = logging.getLogger(__name__)
+_ = gettext.gettext
+
+_BLOCK_SIZE = 65536
+# max number of attempts to create lock changed by other devices
+_LOCK_ATTEMPTS = 5
+
+
+class TransportError(RuntimeError):
+	""" Remote sync location is not available or invalid. """
+	pass
+
+
+class Transport(object):
+	""" Base class for transports.
+
+	Attributes:
+		name: name of sync file (i.e. GTD_SYNC.zip)
+	"""
+
+	name = 'GTD_SYNC.zip'
+
+	def check(self):
+		""" Check sync location; raise TransportError on problems. """
+		pass
+
+	def stat(self):
+		""" Get information about remote file.
+
+		Returns:
+			dict with at least 'size' key or None when file not exists.
+		"""
+		raise NotImplementedError()
+
+	def get(self, fileobj):
+		""" Download sync file into `fileobj`.
+
+		Returns:
+			False when file not exists.
+		"""
+		raise NotImplementedError()
+
+	def put(self, fileobj, size):
+		""" Upload `size` bytes from `fileobj` as sync file. """
+		raise NotImplementedError()
+
+	def lock(self):
+		""" Create sync lock.
+
+		Returns:
+			False when sync is locked by other device.
+		"""
+		raise NotImplementedError()
+
+	def unlock(self):
+		""" Remove sync lock. """
+		raise NotImplementedError()
+
+	def close(self):
+		""" Release resources. """
+		pass
+
+
+class FileTransport(Transport):
+	""" Sync file in local (or shared) directory.
+
+	Args:
+		filename: path to sync file
+	"""
+
+	def __init__(self, filename):
+		self._filename = filename
+		self.name = os.path.basename(filename)
+
+	def check(self):
+		directory = os.path.dirname(self._filename)
+		if not os.path.isdir(directory):
+			raise TransportError(_("Sync directory not exists."))
+		files = os.listdir(directory)
+		if 'sync.locked' in files:
+			files.remove('sync.locked')
+		if len(files) > 2:
+			raise TransportError(_("To many files in sync directory."))
+
+	def stat(self):
+		if not os.path.isfile(self._filename):
+			return None
+		fstat = os.stat(self._filename)
+		return {'size': fstat.st_size, 'mtime': fstat.st_mtime}
+
+	def get(self, fileobj):
+		if not os.path.isfile(self._filename):
+			return False
+		with open(self._filename, 'rb') as ifile:
+			shutil.copyfileobj(ifile, fileobj, _BLOCK_SIZE)
+		return True
+
+	def put(self, fileobj, size):
+		# write to temp file in the same directory and replace sync file
+		tmp_fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(
+				self._filename), prefix='.wxgtd')
+		try:
+			with os.fdopen(tmp_fd, 'wb') as ofile:
+				shutil.copyfileobj(fileobj, ofile, _BLOCK_SIZE)
+			if os.name == 'nt' and os.path.isfile(self._filename):
+				os.unlink(self._filename)
+			os.rename(tmp_name, self._filename)
+		except:
+			if os.path.isfile(tmp_name):
+				os.unlink(tmp_name)
+			raise
+
+	def lock(self):
+		return exporter.create_sync_lock(self._filename)
+
+	def unlock(self):
+		exporter.delete_sync_lock(self._filename)
+
+
+class HttpTransport(Transport):
+	""" Sync file on HTTP server supporting GET, HEAD, PUT and DELETE
+	(i.e. WebDAV).
+
+	Lock is created by conditional PUT (If-None-Match: *) of sync.locked file
+	in the same directory; own lock is refreshed by PUT with If-Match. One
+	connection is used for all requests.
+
+	Args:
+		url: url of sync file
+		timeout: socket timeout
+	"""
+
+	def __init__(self, url, timeout=60):
+		self._url = urlparse.urlsplit(url)
+		if self._url.scheme not in ('http', 'https'):
+			raise TransportError(_("Unsupported url: %s") % url)
+		self._path = self._url.path
+		self._lock_path = posixpath.join(posixpath.dirname(self._path),
+				'sync.locked')
+		self._timeout = timeout
+		self._conn = None
+		self.name = posixpath.basename(self._path)
+
+	def stat(self):
+		status, headers, _body = self._request('HEAD', self._path)
+		if status == httplib.NOT_FOUND:
+			return None
+		self._check_status(status)
+		return {'size': int(headers.get('content-length', 0)),
+				'etag': headers.get('etag')}
+
+	def get(self, fileobj):
+		status, _headers, _body = self._request('GET', self._path,
+				output=fileobj)
+		if status == httplib.NOT_FOUND:
+			return False
+		self._check_status(status)
+		return True
+
+	def put(self, fileobj, size):
+		status = self._request('PUT', self._path, fileobj,
+				{'Content-Length': str(size)})[0]
+		self._check_status(status)
+
+	def lock(self):
+		device_id, lock_data = exporter.get_sync_lock_data()
+		for _attempt in xrange(_LOCK_ATTEMPTS):
+			status = self._request('PUT', self._lock_path, lock_data,
+					{'If-None-Match': '*'})[0]
+			if status != httplib.PRECONDITION_FAILED:
+				self._check_status(status)
+				return True
+			# lock exists; check owner
+			status, headers, body = self._request('GET', self._lock_path)
+			if status == httplib.NOT_FOUND:
+				# lock removed in meantime; create it again
+				continue
+			self._check_status(status)
+			try:
+				if json.loads(body).get('deviceId') != device_id:
+					return False
+			except ValueError:
+				return False
+			etag = headers.get('etag')
+			if not etag:
+				# own lock; can't be safely refreshed
+				return True
+			# refresh own lock only when it is not changed after GET
+			status = self._request('PUT', self._lock_path, lock_data,
+					{'If-Match': etag})[0]
+			if status != httplib.PRECONDITION_FAILED:
+				self._check_status(status)
+				return True
+		_LOG.warn('HttpTransport.lock: lock changed by other devices')
+		return False
+
+	def unlock(self):
+		status = self._request('DELETE', self._lock_path)[0]
+		if status != httplib.NOT_FOUND:
+			self._check_status(status)
+
+	def close(self):
+		if self._conn:
+			self._conn.close()
+			self._conn = None
+
+	def _connect(self):
+		if self._conn is None:
+			conn_class = (httplib.HTTPSConnection if self._url.scheme == 'https'
+					else httplib.HTTPConnection)
+			self._conn = conn_class(self._url.netloc, timeout=self._timeout)
+		return self._conn
+
+	def _request(self, method, path, body=None, headers=None, output=None):
+		""" Send request; reconnect once when connection was closed.
+
+		Returns:
+			(status, headers dict, body); body is empty when `output` is given
+		"""
+		headers = headers or {}
+		for attempt in (1, 2):
+			conn = self._connect()
+			try:
+				if hasattr(body, 'seek'):
+					body.seek(0)
+				conn.request(method, path, body, headers)
+				resp = conn.getresponse()
+				break
+			except (socket.error, httplib.HTTPException):
+				self.close()
+				if attempt == 2:
+					raise
+		data = ''
+		if output is not None and resp.status == httplib.OK:
+			while True:
+				block = resp.read(_BLOCK_SIZE)
+				if not block:
+					break
+				output.write(block)
+		else:
+			data = resp.read()
+		if resp.getheader('connection', '').lower() == 'close':
+			self.close()
+		_LOG.debug('HttpTransport: %s %s -> %d', method, path, resp.status)
+		return resp.status, dict(resp.getheaders()), data
+
+	@staticmethod
+	def _check_status(status):
+		if status >= 300:
+			raise TransportError(_("Request failed; status: %d") % status)
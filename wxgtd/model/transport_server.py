@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" In-process HTTP server for testing and benchmarking HttpTransport.
+
+Server keep files in memory and support GET, HEAD, PUT (with
+If-None-Match: * and If-Match) and DELETE. Optional latency is added to each request.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = '2013-07-27'
+
+import time
+import threading
+import SocketServer
+import BaseHTTPServer
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, *_args):
+		pass
+
+	def do_HEAD(self):
+		self._handle_get(False)
+
+	def do_GET(self):
+		self._handle_get(True)
+
+	def do_PUT(self):
+		self.server.wait()
+		data = self.rfile.read(int(self.headers['Content-Length']))
+		with self.server.lock:
+			current = self.server.files.get(self.path)
+			if (self.headers.get('If-None-Match') == '*'
+					and current is not None):
+				return self._reply(412)
+			etag = self.headers.get('If-Match')
+			if etag and (current is None or etag != _get_etag(current)):
+				return self._reply(412)
+			created = self.path not in self.server.files
+			self.server.files[self.path] = data
+		self._reply(201 if created else 204)
+
+	def do_DELETE(self):
+		self.server.wait()
+		with self.server.lock:
+			if self.server.files.pop(self.path, None) is None:
+				return self._reply(404)
+		self._reply(204)
+
+	def _handle_get(self, send_body):
+		self.server.wait()
+		data = self.server.files.get(self.path)
+		if data is None:
+			return self._reply(404)
+		self.send_response(200)
+		self.send_header('Content-Length', str(len(data)))
+		self.send_header('ETag', _get_etag(data))
+		self.end_headers()
+		if send_body:
+			self.wfile.write(data)
+
+	def _reply(self, status):
+		self.send_response(status)
+		self.send_header('Content-Length', '0')
+		self.end_headers()
+
+
+def _get_etag(data):
+	return '"%x"' % hash(data)
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	""" Local http server running in background thread.
+
+	Args:
+		latency: delay (in seconds) added to each request
+
+	Attributes:
+		files: dict path -> content
+		url: base url of server
+	"""
+	daemon_threads = True
+
+	def __init__(self, latency=0):
+		BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+		self.latency = latency
+		self.files = {}
+		self.lock = threading.Lock()
+		self.url = 'http://127.0.0.1:%d' % self.server_port
+		self._thread = None
+
+	def start(self):
+		self._thread = threading.Thread(target=self.serve_forever,
+				name="standin-server")
+		self._thread.daemon = True
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+
+	def wait(self):
+		if self.latency:
+			time.sleep(self.latency)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for transport module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import json
+import shutil
+import tempfile
+from StringIO import StringIO
+from unittest import main, TestCase
+
+from . import db
+from . import transport
+from .transport_server import StandInServer
+
+
+class TestHttpTransport(TestCase):
+	""" Test HttpTransport against in-process server. """
+
+	@classmethod
+	def setUpClass(cls):
+		cls.tmpdir = tempfile.mkdtemp()
+		db.connect(os.path.join(cls.tmpdir, 'wxgtd.db'))
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.tmpdir)
+
+	def setUp(self):
+		self.server = StandInServer().start()
+		self.trans = transport.HttpTransport(self.server.url +
+				'/sync/GTD_SYNC.zip')
+
+	def tearDown(self):
+		self.trans.close()
+		self.server.stop()
+
+	def test_get_put(self):
+		self.assertIsNone(self.trans.stat())
+		self.assertFalse(self.trans.get(StringIO()))
+		data = 'x' * 200000
+		self.trans.put(StringIO(data), len(data))
+		self.assertEqual(self.trans.stat()['size'], len(data))
+		out = StringIO()
+		self.assertTrue(self.trans.get(out))
+		self.assertEqual(out.getvalue(), data)
+		self.assertEqual(self.trans.name, 'GTD_SYNC.zip')
+
+	def test_lock(self):
+		self.assertTrue(self.trans.lock())
+		self.assertIn('/sync/sync.locked', self.server.files)
+		# own lock
+		self.assertTrue(self.trans.lock())
+		self.trans.unlock()
+		self.assertNotIn('/sync/sync.locked', self.server.files)
+		# lock created by other device
+		self.server.files['/sync/sync.locked'] = json.dumps({'deviceId': 'x'})
+		self.assertFalse(self.trans.lock())
+
+	def test_lock_race(self):
+		""" Lock removed by its owner between PUT and GET of other client;
+		then third client create lock before second retry. """
+		lock_path = '/sync/sync.locked'
+		other = transport.HttpTransport(self.server.url + '/sync/GTD_SYNC.zip')
+		devices = ['a']
+		request = self.trans._request  # pylint: disable=W0212
+
+		def get_sync_lock_data():
+			return devices[0], json.dumps({'deviceId': devices[0]})
+
+		def race_request(method, path, *args, **kwargs):
+			if method != 'GET' or path != lock_path or devices[0] != 'a':
+				return request(method, path, *args, **kwargs)
+			# owner remove lock before GET; "b" lock it before "a" continue
+			self.server.files.pop(lock_path)
+			result = request(method, path, *args, **kwargs)
+			devices[0] = 'b'
+			self.assertTrue(other.lock())
+			return result
+
+		self.server.files[lock_path] = json.dumps({'deviceId': 'c'})
+		self.trans._request = race_request  # pylint: disable=W0212
+		lock_data_func = transport.exporter.get_sync_lock_data
+		transport.exporter.get_sync_lock_data = get_sync_lock_data
+		try:
+			self.assertFalse(self.trans.lock())
+		finally:
+			transport.exporter.get_sync_lock_data = lock_data_func
+			other.close()
+		self.assertEqual(json.loads(self.server.files[lock_path]),
+				{'deviceId': 'b'})
+
+	def test_reconnect(self):
+		self.trans.put(StringIO('abc'), 3)
+		# server closed connection
+		self.trans._conn.sock.close()  # pylint: disable=W0212
+		self.assertEqual(self.trans.stat()['size'], 3)
+
+
+class TestFileTransport(TestCase):
+	""" Test FileTransport. """
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.filename = os.path.join(self.tmpdir, 'GTD_SYNC.zip')
+		self.trans = transport.FileTransport(self.filename)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_get_put(self):
+		self.trans.check()
+		self.assertIsNone(self.trans.stat())
+		self.assertFalse(self.trans.get(StringIO()))
+		self.trans.put(StringIO('abc'), 3)
+		self.assertEqual(self.trans.stat()['size'], 3)
+		out = StringIO()
+		self.assertTrue(self.trans.get(out))
+		self.assertEqual(out.getvalue(), 'abc')
+		self.assertEqual(os.listdir(self.tmpdir), ['GTD_SYNC.zip'])
+
+	def test_check(self):
+		for idx in xrange(3):
+			open(os.path.join(self.tmpdir, str(idx)), 'w').close()
+		self.assertRaises(transport.TransportError, self.trans.check)
+
+
+if __name__ == '__main__':
+	main()
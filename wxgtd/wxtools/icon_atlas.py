@@ -0,0 +1,311 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" Packed icons atlas.
+
+Icons from data directory are stored in one file as raw RGBA pixels (atlas)
+and index (json: name -> offset, width, height). At startup atlas is
+memory-mapped and images are created from slices of it - without searching
+files and decoding png for each icon. Index keep size, modification time and
+hash of source files; icons which files were changed after building atlas
+are ignored (loaded from files).
+
+Atlas is created at build time (setup.py make_icon_atlas) by `build_atlas`;
+png files are decoded here, so building don't require wx.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import mmap
+import json
+import zlib
+import struct
+import hashlib
+import logging
+
+_LOG = logging.getLogger(__name__)
+
+ATLAS_FILE = 'icons.atlas'
+INDEX_FILE = 'icons.atlas.json'
+FORMAT_VERSION = 2
+# bigger images (i.e. splash) are not packed
+MAX_ICON_SIZE = 64
+
+_PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+# png color type -> number of channels
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def read_png(filename):
+	""" Decode non-interlaced png file (any color type, 1-8 bits depth).
+
+	Returns:
+		(width, height, RGBA pixels as string)
+
+	Raises:
+		ValueError: unsupported or invalid file
+	"""
+	with open(filename, 'rb') as ifile:
+		data = ifile.read()
+	if not data.startswith(_PNG_SIGNATURE):
+		raise ValueError('not png file')
+	pos = len(_PNG_SIGNATURE)
+	header = None
+	palette = transparency = None
+	idat = []
+	while pos < len(data):
+		length, ctype = struct.unpack('>I4s', data[pos:pos + 8])
+		chunk = data[pos + 8:pos + 8 + length]
+		pos += length + 12
+		if ctype == 'IHDR':
+			header = struct.unpack('>IIBBBBB', chunk)
+		elif ctype == 'PLTE':
+			palette = chunk
+		elif ctype == 'tRNS':
+			transparency = chunk
+		elif ctype == 'IDAT':
+			idat.append(chunk)
+		elif ctype == 'IEND':
+			break
+	if not header:
+		raise ValueError('missing IHDR')
+	width, height, depth, color_type, _compr, _filter, interlace = header
+	if interlace or depth > 8 or color_type not in _PNG_CHANNELS:
+		raise ValueError('unsupported format %r' % (header, ))
+	channels = _PNG_CHANNELS[color_type]
+	rows = _unfilter(zlib.decompress(''.join(idat)), width, height,
+			channels * depth)
+	if color_type == 6:
+		return width, height, ''.join(rows)
+	if color_type == 2:
+		return width, height, ''.join(_rgb2rgba(row, 3) for row in rows)
+	# gray, gray+alpha and palette images
+	if color_type == 3:
+		if not palette:
+			raise ValueError('missing palette')
+		alpha = [ord(char) for char in (transparency or '')]
+		colors = [palette[idx * 3:idx * 3 + 3] + chr(alpha[idx]
+				if idx < len(alpha) else 255) for idx in xrange(len(palette) // 3)]
+	else:
+		colors = None
+	result = []
+	for row in rows:
+		if color_type == 4:
+			values = [ord(char) for char in row]
+			result.extend(chr(values[idx]) * 3 + chr(values[idx + 1])
+					for idx in xrange(0, width * 2, 2))
+			continue
+		values = _unpack_row(row, width, depth)
+		if colors is not None:
+			result.extend(colors[value] for value in values)
+		else:
+			scale = 255 // ((1 << depth) - 1)
+			result.extend(chr(value * scale) * 3 + '\xff' for value in values)
+	return width, height, ''.join(result)
+
+
+def _unfilter(data, width, height, bits_per_pixel):
+	""" Reverse png scanline filters; return list of rows (strings). """
+	bpp = max(1, bits_per_pixel // 8)
+	stride = (width * bits_per_pixel + 7) // 8
+	rows = []
+	prev = [0] * stride
+	pos = 0
+	for _row in xrange(height):
+		ftype = ord(data[pos])
+		line = [ord(char) for char in data[pos + 1:pos + 1 + stride]]
+		pos += stride + 1
+		if ftype == 1:  # sub
+			for idx in xrange(bpp, stride):
+				line[idx] = (line[idx] + line[idx - bpp]) & 0xff
+		elif ftype == 2:  # up
+			line = [(val + up) & 0xff for val, up in zip(line, prev)]
+		elif ftype == 3:  # average
+			for idx in xrange(stride):
+				left = line[idx - bpp] if idx >= bpp else 0
+				line[idx] = (line[idx] + ((left + prev[idx]) >> 1)) & 0xff
+		elif ftype == 4:  # paeth
+			for idx in xrange(stride):
+				left = line[idx - bpp] if idx >= bpp else 0
+				upleft = prev[idx - bpp] if idx >= bpp else 0
+				line[idx] = (line[idx] + _paeth(left, prev[idx], upleft)) & 0xff
+		elif ftype != 0:
+			raise ValueError('invalid filter %d' % ftype)
+		rows.append(''.join(chr(val) for val in line))
+		prev = line
+	return rows
+
+
+def _paeth(left, up, upleft):
+	estimate = left + up - upleft
+	dleft, dup, dupleft = (abs(estimate - left), abs(estimate - up),
+			abs(estimate - upleft))
+	if dleft <= dup and dleft <= dupleft:
+		return left
+	if dup <= dupleft:
+		return up
+	return upleft
+
+
+def _unpack_row(row, width, depth):
+	""" Get list of values (palette indexes or gray levels) from row. """
+	if depth == 8:
+		return [ord(char) for char in row[:width]]
+	mask = (1 << depth) - 1
+	per_byte = 8 // depth
+	values = []
+	for char in row:
+		byte = ord(char)
+		for idx in xrange(per_byte):
+			values.append((byte >> (8 - depth * (idx + 1))) & mask)
+	return values[:width]
+
+
+def _rgb2rgba(row, channels):
+	return ''.join(row[idx:idx + channels] + '\xff'
+			for idx in xrange(0, len(row), channels))
+
+
+def build_atlas(directory, output_dir=None):
+	""" Pack all png icons from `directory` into atlas.
+
+	Images that can't be decoded or bigger than MAX_ICON_SIZE are skipped
+	(there are loaded from files).
+
+	Args:
+		directory: directory with icons
+		output_dir: where atlas is created; default `directory`
+
+	Returns:
+		number of packed icons
+	"""
+	output_dir = output_dir or directory
+	index = {}
+	offset = 0
+	with open(os.path.join(output_dir, ATLAS_FILE), 'wb') as atlas:
+		for filename in sorted(os.listdir(directory)):
+			name, ext = os.path.splitext(filename)
+			if ext.lower() != '.png':
+				continue
+			path = os.path.join(directory, filename)
+			try:
+				width, height, pixels = read_png(path)
+			except (ValueError, IOError, zlib.error, struct.error) as err:
+				_LOG.warn('build_atlas: skipping %s: %s', filename, err)
+				continue
+			if width > MAX_ICON_SIZE or height > MAX_ICON_SIZE:
+				continue
+			atlas.write(pixels)
+			index[name] = (offset, width, height, filename) + \
+					_get_file_info(path)
+			offset += len(pixels)
+	with open(os.path.join(output_dir, INDEX_FILE), 'w') as ofile:
+		json.dump({'version': FORMAT_VERSION, 'size': offset,
+				'icons': index}, ofile, sort_keys=True)
+	return len(index)
+
+
+def _get_file_info(path):
+	""" Get (size, modification time, sha1) of file. """
+	with open(path, 'rb') as ifile:
+		digest = hashlib.sha1(ifile.read()).hexdigest()
+	fstat = os.stat(path)
+	return fstat.st_size, int(fstat.st_mtime), digest
+
+
+def _is_file_unchanged(path, size, mtime, digest):
+	""" Check is file the same as described by `_get_file_info` result. """
+	try:
+		fstat = os.stat(path)
+	except OSError:
+		return False
+	if fstat.st_size != size:
+		return False
+	if int(fstat.st_mtime) == mtime:
+		return True
+	# i.e. file copied by installer - compare content
+	try:
+		with open(path, 'rb') as ifile:
+			return hashlib.sha1(ifile.read()).hexdigest() == digest
+	except IOError:
+		return False
+
+
+class IconAtlas(object):
+	""" Memory-mapped atlas.
+
+	Icons are checked against source files on first use.
+
+	Args:
+		directory: directory with atlas and index files.
+		icons_dir: directory with source files; default `directory`
+
+	Raises:
+		IOError, ValueError: missing or invalid atlas
+	"""
+
+	def __init__(self, directory, icons_dir=None):
+		with open(os.path.join(directory, INDEX_FILE)) as ifile:
+			index = json.load(ifile)
+		if index.get('version') != FORMAT_VERSION:
+			raise ValueError('invalid atlas version %r' % index.get('version'))
+		self._icons = index['icons']
+		self._icons_dir = icons_dir or directory
+		# name -> icon is up to date
+		self._valid = {}
+		with open(os.path.join(directory, ATLAS_FILE), 'rb') as atlas:
+			if os.fstat(atlas.fileno()).st_size != index['size']:
+				raise ValueError('invalid atlas size')
+			self._data = mmap.mmap(atlas.fileno(), 0, access=mmap.ACCESS_READ)
+
+	def __contains__(self, name):
+		return self._is_valid(name)
+
+	def __len__(self):
+		return len(self._icons)
+
+	def names(self):
+		""" Get names of up-to-date icons. """
+		return [name for name in self._icons if self._is_valid(name)]
+
+	def get_rgba(self, name):
+		""" Get icon data.
+
+		Returns:
+			(width, height, RGBA pixels as string) or None when icon is not
+			in atlas or its file was changed.
+		"""
+		if not self._is_valid(name):
+			return None
+		offset, width, height = self._icons[name][:3]
+		return width, height, self._data[offset:offset + width * height * 4]
+
+	def close(self):
+		self._data.close()
+
+	def _is_valid(self, name):
+		valid = self._valid.get(name)
+		if valid is None:
+			icon = self._icons.get(name)
+			valid = bool(icon) and _is_file_unchanged(os.path.join(
+					self._icons_dir, icon[3]), *icon[4:])  # pylint: disable=W0142
+			if icon and not valid:
+				_LOG.info('IconAtlas: icon %s changed; skipping', name)
+			self._valid[name] = valid
+		return valid
+
+
+def load_atlas(directory, icons_dir=None):
+	""" Open atlas from directory; return None when not available. """
+	try:
+		return IconAtlas(directory, icons_dir)
+	except (IOError, ValueError, KeyError, EnvironmentError) as err:
+		_LOG.info('load_atlas: atlas not available: %s', err)
+	return None
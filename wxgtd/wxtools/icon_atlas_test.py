@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for icon_atlas module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-27"
+
+import os
+import zlib
+import struct
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from . import icon_atlas
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+def _chunk(ctype, data):
+	return struct.pack('>I', len(data)) + ctype + data + struct.pack('>I',
+			zlib.crc32(ctype + data) & 0xffffffff)
+
+
+def _write_png(filename, width, height, depth, color_type, rows,
+		palette=None, transparency=None):
+	""" Write png; rows are lists of filter type and raw row data. """
+	data = icon_atlas._PNG_SIGNATURE
+	data += _chunk('IHDR', struct.pack('>IIBBBBB', width, height, depth,
+			color_type, 0, 0, 0))
+	if palette:
+		data += _chunk('PLTE', palette)
+	if transparency:
+		data += _chunk('tRNS', transparency)
+	data += _chunk('IDAT', zlib.compress(''.join(chr(ftype) + row
+			for ftype, row in rows)))
+	data += _chunk('IEND', '')
+	with open(filename, 'wb') as ofile:
+		ofile.write(data)
+
+
+class TestIconAtlas(TestCase):
+	""" Decoding png and building atlas. """
+
+	def setUp(self):
+		self.tempdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempdir)
+
+	def test_read_rgba_filters(self):
+		# 2x2 pixels; second row use "sub" filter (difference to left pixel)
+		filename = os.path.join(self.tempdir, 'rgba.png')
+		_write_png(filename, 2, 2, 8, 6, [(0, '\x01\x02\x03\x04\x05\x06\x07\x08'),
+				(1, '\x10\x20\x30\x40\x01\x01\x01\x01')])
+		self.assertEqual(icon_atlas.read_png(filename), (2, 2,
+				'\x01\x02\x03\x04\x05\x06\x07\x08'
+				'\x10\x20\x30\x40\x11\x21\x31\x41'))
+
+	def test_read_palette(self):
+		# 2-bit palette; first color transparent
+		filename = os.path.join(self.tempdir, 'pal.png')
+		_write_png(filename, 3, 1, 2, 3, [(0, chr(0b00011000))],
+				palette='\x00\x00\x00\xff\x00\x00\x00\xff\x00', transparency='\x00')
+		self.assertEqual(icon_atlas.read_png(filename), (3, 1,
+				'\x00\x00\x00\x00\xff\x00\x00\xff\x00\xff\x00\xff'))
+
+	def test_build_and_load(self):
+		_write_png(os.path.join(self.tempdir, 'a.png'), 1, 1, 8, 2,
+				[(0, '\x01\x02\x03')])
+		_write_png(os.path.join(self.tempdir, 'b.png'), 1, 2, 8, 0,
+				[(0, '\x00'), (2, '\xff')])
+		_write_png(os.path.join(self.tempdir, 'big.png'), 65, 1, 8, 0,
+				[(0, '\x00' * 65)])
+		self.assertEqual(icon_atlas.build_atlas(self.tempdir), 2)
+		atlas = icon_atlas.load_atlas(self.tempdir)
+		try:
+			self.assertEqual(sorted(atlas.names()), ['a', 'b'])
+			self.assertEqual(atlas.get_rgba('a'), (1, 1, '\x01\x02\x03\xff'))
+			self.assertEqual(atlas.get_rgba('b'), (1, 2,
+					'\x00\x00\x00\xff\xff\xff\xff\xff'))
+			self.assertIsNone(atlas.get_rgba('big'))
+		finally:
+			atlas.close()
+
+	def test_invalid_atlas(self):
+		self.assertIsNone(icon_atlas.load_atlas(self.tempdir))
+		_write_png(os.path.join(self.tempdir, 'a.png'), 1, 1, 8, 2,
+				[(0, '\x01\x02\x03')])
+		icon_atlas.build_atlas(self.tempdir)
+		with open(os.path.join(self.tempdir, icon_atlas.ATLAS_FILE), 'ab') \
+				as atlas:
+			atlas.write('\x00')
+		self.assertIsNone(icon_atlas.load_atlas(self.tempdir))
+
+	def test_changed_icon(self):
+		filename = os.path.join(self.tempdir, 'a.png')
+		_write_png(filename, 1, 1, 8, 2, [(0, '\x01\x02\x03')])
+		_write_png(os.path.join(self.tempdir, 'b.png'), 1, 1, 8, 2,
+				[(0, '\x04\x05\x06')])
+		icon_atlas.build_atlas(self.tempdir)
+		# the same content and size, other modification time (i.e. installed)
+		mtime = os.stat(filename).st_mtime
+		os.utime(filename, (mtime + 10, mtime + 10))
+		atlas = icon_atlas.load_atlas(self.tempdir)
+		try:
+			self.assertEqual(atlas.get_rgba('a'), (1, 1, '\x01\x02\x03\xff'))
+		finally:
+			atlas.close()
+		# the same dimension and file size, other pixels
+		_write_png(filename, 1, 1, 8, 2, [(0, '\x07\x08\x09')])
+		os.utime(filename, (mtime + 20, mtime + 20))
+		atlas = icon_atlas.load_atlas(self.tempdir)
+		try:
+			self.assertNotIn('a', atlas)
+			self.assertIsNone(atlas.get_rgba('a'))
+			self.assertEqual(atlas.names(), ['b'])
+		finally:
+			atlas.close()
+		# removed file
+		os.unlink(os.path.join(self.tempdir, 'b.png'))
+		atlas = icon_atlas.load_atlas(self.tempdir)
+		try:
+			self.assertIsNone(atlas.get_rgba('b'))
+		finally:
+			atlas.close()
+
+	def test_data_atlas_up_to_date(self):
+		""" Atlas in data directory contains current icons. """
+		atlas = icon_atlas.load_atlas(_DATA_DIR)
+		self.assertIsNotNone(atlas)
+		try:
+			self.assertEqual(len(atlas.names()), len(atlas))
+			for filename in os.listdir(_DATA_DIR):
+				name, ext = os.path.splitext(filename)
+				if ext != '.png' or name not in atlas:
+					continue
+				self.assertEqual(atlas.get_rgba(name),
+						icon_atlas.read_png(os.path.join(_DATA_DIR, filename)),
+						name)
+		finally:
+			atlas.close()
+
+
+if __name__ == '__main__':
+	main()
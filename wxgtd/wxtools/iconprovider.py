@@ -14,7 +14,7 @@ Foundation, version 2.
 
 __author__ = 'Karol Będkowski'
 __copyright__ = 'Copyright (c) Karol Będkowski 2007-2013'
-__version__ = '2013-04-27'
+__version__ = '2013-07-27'
 
 
 import logging
@@ -23,6 +23,7 @@ import os.path
 import wx
 
 from wxgtd.lib.singleton import Singleton
+from wxgtd.wxtools import icon_atlas
 
 
 _LOG = logging.getLogger(__name__)
@@ -32,6 +33,12 @@ _FILE_TYPES = (
 		(wx.BITMAP_TYPE_ICO, '.ico'),
 		(wx.BITMAP_TYPE_JPEG, '.jpg'),
 )
+# icons used by main window (toolbar, task list, infobox); loaded on start
+FIRST_FRAME_ICONS = ('wxgtd', 'task_new', 'task_quick', 'task_edit',
+		'task_delete', 'task_done', 'task_starred', 'sync', 'reminders',
+		'notebook', 'prio-1', 'prio0', 'prio1', 'prio2', 'prio3', 'sm_up',
+		'sm_down', 'status_small', 'project_small', 'goal_small', 'folder_small',
+		'tag_small', 'starred_small', 'alarm_small', 'repeat_small', 'note_small')
 
 
 class _IconProviderCache(Singleton):
@@ -49,6 +56,9 @@ class _IconProviderCache(Singleton):
 		self._icons_cache = {}
 		self._icons_pkg = icons_pkg
 		self._icons_dir = icons_directory
+		self._atlas = None
+		if icons_directory:
+			self._atlas = icon_atlas.load_atlas(icons_directory)
 		if not icons_pkg and not icons_directory:
 			_LOG.error("_IconProviderCache: no icons_directory and icons_pkg!")
 		if icons_directory and not os.path.isdir(icons_directory):
@@ -58,21 +68,27 @@ class _IconProviderCache(Singleton):
 	def _load_image(self, name):
 		""" Get icon with given name.
 
-		If image is cached - return it from cache. Otherwise load and add to
-		cache. Also load icons from standard wxArtProvider by given id.
+		Icons are searched in atlas (only icons which files were not changed
+		after building atlas), standard wxArtProvider (by given id), icons
+		directory and icons package. Result (also missing icon) is cached.
 
 		Args:
 			name: icon name without extension.
 		Return:
 			wxBitmap object.
 		"""
-		# load from wxArtProvider
-		bitmap = wx.ArtProvider_GetBitmap(name)
-		if bitmap and not bitmap.IsNull():
-			return bitmap
 		bitmap = None
+		# load from atlas
+		if self._atlas is not None and name in self._atlas:
+			width, height, data = self._atlas.get_rgba(name)
+			bitmap = wx.BitmapFromBufferRGBA(width, height, data)
+		# load from wxArtProvider
+		if bitmap is None:
+			bitmap = wx.ArtProvider_GetBitmap(name)
+			if not bitmap or bitmap.IsNull():
+				bitmap = None
 		# load from directory
-		if self._icons_dir:
+		if bitmap is None and self._icons_dir:
 			bitmap = self._try_to_load_from_dir(name)
 		# load from package
 		if bitmap is None and self._icons_pkg is not None:
@@ -81,16 +97,22 @@ class _IconProviderCache(Singleton):
 				bitmap = getattr(self._icons_pkg, attrname)()
 		if bitmap is None:
 			_LOG.warn('_IconProviderCache._load_image(%s): not found', name)
-			return wx.NullBitmap
+			bitmap = wx.NullBitmap
 		self._icons_cache[name] = bitmap
 		return bitmap
 
 	def __getitem__(self, name):
 		icon = self._icons_cache.get(name)
-		if not icon:
+		if icon is None:
 			icon = self._load_image(name)
 		return icon
 
+	def preload(self, names):
+		""" Load given icons into cache. """
+		for name in names:
+			if name not in self._icons_cache:
+				self._load_image(name)
+
 	def __delitem__(self, _key):
 		pass
 
@@ -198,6 +220,16 @@ def init_icon_cache(icons_package, data_dir):
 	_IconProviderCache(icons_package, data_dir)
 
 
+def preload_icons(names=FIRST_FRAME_ICONS):
+	""" Load icons into cache before creating windows; other icons are
+	loaded on first use.
+
+	Args:
+		names: list of image names; default: icons used by main window.
+	"""
+	_IconProviderCache().preload(names)
+
+
 def get_icon(name):
 	""" Load & return wxIcon object with given name.
 
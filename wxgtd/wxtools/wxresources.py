@@ -9,11 +9,10 @@ Licence: GPLv2+
 """
 __author__ = "Karol Będkowski"
 __copyright__ = "Copyright (c) Karol Będkowski, 2004-2014"
-__version__ = "2013-04-27"
+__version__ = "2013-07-26"
 
-import re
+import os
 import locale
-import gettext
 
 import wx
 from wx import xrc
@@ -22,17 +21,7 @@ from wx.lib import colourselect as csel
 import wx.calendar
 
 from wxgtd.lib.appconfig import AppConfig
-
-_ = gettext.gettext
-
-
-def _localize(match_object):
-	""" Replace strings by it localized version. """
-	if match_object.group(2).strip():
-		return ''.join((match_object.group(1), _(match_object.group(2)),
-				match_object.group(3)))
-	else:
-		return ''.join(match_object.groups())
+from wxgtd.wxtools import xrc_cache
 
 
 class NumCtrlXmlHandler(xrc.XmlResourceHandler):
@@ -151,13 +140,56 @@ class CalendarCtrlXmlHandler(xrc.XmlResourceHandler):
 		return ctrl
 
 
+class _LazyXmlResource(object):
+	""" Resources created from precompiled xrc (see xrc_cache).
+
+	Each top-level object is loaded (parsed) separately on first use.
+
+	Args:
+		objects: dict object name -> xrc document
+	"""
+
+	def __init__(self, objects):
+		self._objects = objects
+		self._resources = {}
+
+	def _get_resource(self, name):
+		res = self._resources.get(name)
+		if res is None:
+			data = self._objects.get(name)
+			if data is None:
+				return None
+			res = xrc.EmptyXmlResource()
+			res.InsertHandler(NumCtrlXmlHandler())
+			res.InsertHandler(TimeCtrlXmlHandler())
+			res.InsertHandler(ColourSelectHandler())
+			res.InsertHandler(SearchCtrlXmlHandler())
+			res.InsertHandler(CalendarCtrlXmlHandler())
+			res.LoadFromString(data)
+			self._resources[name] = res
+		return res
+
+	def LoadDialog(self, parent, name):
+		res = self._get_resource(name)
+		return res.LoadDialog(parent, name) if res else None
+
+	def LoadFrame(self, parent, name):
+		res = self._get_resource(name)
+		return res.LoadFrame(parent, name) if res else None
+
+	def LoadPanel(self, parent, name):
+		res = self._get_resource(name)
+		return res.LoadPanel(parent, name) if res else None
+
+
 _XRC_CACHE = {}
 
 
 def load_xrc_resource(filename):
 	""" Load resources from xrc file, localize it and handle custom controls.
 
-	Resources are cached.
+	Localized resources are cached on disk (per locale) and in memory;
+	windows are parsed when created first time.
 
 	Args:
 		filename: path to xrc resource file
@@ -168,27 +200,8 @@ def load_xrc_resource(filename):
 	xrcfile_path = AppConfig().get_data_file(filename)
 	res = _XRC_CACHE.get(xrcfile_path)
 	if res is None:
-		with open(xrcfile_path) as xrc_file:
-			data = xrc_file.read()
-		data = data.decode('UTF-8')
-		re_gettext = re.compile(r'(\<label\>)(.*?)(\<\/label\>)')
-		data = re_gettext.sub(_localize, data)
-		re_gettext = re.compile(r'(\<title\>)(.*?)(\<\/title\>)')
-		data = re_gettext.sub(_localize, data)
-		re_gettext = re.compile(r'(\<tooltip\>)(.*?)(\<\/tooltip\>)')
-		data = re_gettext.sub(_localize, data)
-		re_gettext = re.compile(r'(\<item\>)(.*?)(\<\/item\>)')
-		data = re_gettext.sub(_localize, data)
-		# workaround for 'XRC error: unknown font family "default"'
-		data = data.replace('<family>default</family>', '')
-		data = data.replace('|wxTHICK_FRAME', '')
-		data = data.encode('UTF-8')
-		res = xrc.EmptyXmlResource()
-		res.InsertHandler(NumCtrlXmlHandler())
-		res.InsertHandler(TimeCtrlXmlHandler())
-		res.InsertHandler(ColourSelectHandler())
-		res.InsertHandler(SearchCtrlXmlHandler())
-		res.InsertHandler(CalendarCtrlXmlHandler())
-		res.LoadFromString(data)
-		_XRC_CACHE[xrcfile_path] = res
+		appconfig = AppConfig()
+		objects = xrc_cache.load_objects(xrcfile_path, appconfig.locales_dir,
+				os.path.join(appconfig.user_cache_dir, 'xrc'))
+		res = _XRC_CACHE[xrcfile_path] = _LazyXmlResource(objects)
 	return res
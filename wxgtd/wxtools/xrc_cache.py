@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+""" Precompiled (localized) xrc resources.
+
+Xrc file is localized (labels, titles, tooltips and items are translated)
+and split into separate documents for each top-level object (frame,
+dialog), so windows can be created by parsing only own part of resources.
+Result is stored in cache directory; cache file is identified by locale and
+hash of xrc file and translation catalog, so it is rebuilt when any of them
+change.
+
+Copyright (c) Karol Będkowski, 2013
+
+This file is part of wxGTD
+Licence: GPLv2+
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-26"
+
+import os
+import re
+import sys
+import marshal
+import hashlib
+import logging
+import gettext
+import tempfile
+import xml.etree.cElementTree as ET
+
+_LOG = logging.getLogger(__name__)
+_ = gettext.gettext
+
+# change when format of cache or preprocessing change
+CACHE_VERSION = 1
+_DOMAIN = 'wxgtd'
+_RE_GETTEXT = [re.compile(r'(\<%s\>)(.*?)(\<\/%s\>)' % (tag, tag))
+		for tag in ('label', 'title', 'tooltip', 'item')]
+
+
+def _localize(match_object):
+	""" Replace strings by it localized version. """
+	if match_object.group(2).strip():
+		return ''.join((match_object.group(1), _(match_object.group(2)),
+				match_object.group(3)))
+	else:
+		return ''.join(match_object.groups())
+
+
+def localize_xrc(data):
+	""" Translate strings in xrc and fix unsupported values.
+
+	Args:
+		data: content of xrc file (utf-8 encoded)
+
+	Returns:
+		localized xrc (utf-8 encoded)
+	"""
+	data = data.decode('UTF-8')
+	for re_gettext in _RE_GETTEXT:
+		data = re_gettext.sub(_localize, data)
+	# workaround for 'XRC error: unknown font family "default"'
+	data = data.replace('<family>default</family>', '')
+	data = data.replace('|wxTHICK_FRAME', '')
+	return data.encode('UTF-8')
+
+
+def split_objects(data):
+	""" Split xrc into documents containing one top-level object.
+
+	Args:
+		data: xrc (utf-8 encoded)
+
+	Returns:
+		dict name -> xrc document (utf-8 encoded)
+	"""
+	root = ET.fromstring(data)
+	objects = {}
+	for obj in root:
+		name = obj.get('name')
+		if not name:
+			continue
+		resource = ET.Element(root.tag, root.attrib)
+		resource.append(obj)
+		objects[name] = ET.tostring(resource, 'UTF-8')
+	return objects
+
+
+def get_locale_key(locales_dir):
+	""" Find translation catalog used for current locale.
+
+	Returns:
+		(language, path to catalog); ('C', None) when strings are not
+		translated.
+	"""
+	catalog = gettext.find(_DOMAIN, locales_dir)
+	if not catalog:
+		return 'C', None
+	# <locales_dir>/<language>/LC_MESSAGES/<domain>.mo
+	return os.path.basename(os.path.dirname(os.path.dirname(catalog))), \
+			catalog
+
+
+def _get_digest(data, catalog):
+	# marshal format depends on python version
+	digest = hashlib.sha1('%d %s' % (CACHE_VERSION, sys.version[:3]))
+	digest.update(data)
+	if catalog:
+		with open(catalog, 'rb') as catalog_file:
+			digest.update(catalog_file.read())
+	return digest.hexdigest()
+
+
+def load_objects(xrcfile_path, locales_dir, cache_dir):
+	""" Load localized and split xrc resources; use cached result if
+	available.
+
+	Args:
+		xrcfile_path: path to xrc file
+		locales_dir: directory with translations
+		cache_dir: directory for cache files; None = don't use cache
+
+	Returns:
+		dict object name -> xrc document (utf-8 encoded)
+	"""
+	with open(xrcfile_path, 'rb') as xrc_file:
+		data = xrc_file.read()
+	language, catalog = get_locale_key(locales_dir)
+	prefix = '%s-%s-' % (os.path.splitext(os.path.basename(xrcfile_path))[0],
+			language)
+	cache_file = None
+	if cache_dir:
+		cache_file = os.path.join(cache_dir, prefix + _get_digest(data,
+			catalog) + '.cache')
+		objects = _read_cache(cache_file)
+		if objects is not None:
+			return objects
+	_LOG.info('load_objects: preprocessing %s (language %s)', xrcfile_path,
+			language)
+	objects = split_objects(localize_xrc(data))
+	if cache_file:
+		_write_cache(cache_file, prefix, objects)
+	return objects
+
+
+def _read_cache(cache_file):
+	if not os.path.isfile(cache_file):
+		return None
+	try:
+		with open(cache_file, 'rb') as ifile:
+			objects = marshal.load(ifile)
+	except (IOError, ValueError, EOFError, TypeError) as err:
+		_LOG.warn('xrc_cache: invalid cache file %s: %s', cache_file, err)
+		return None
+	if not isinstance(objects, dict):
+		_LOG.warn('xrc_cache: invalid cache file %s', cache_file)
+		return None
+	return objects
+
+
+def _write_cache(cache_file, prefix, objects):
+	""" Write cache; remove files created for previous version of xrc or
+	translation. """
+	cache_dir = os.path.dirname(cache_file)
+	try:
+		if not os.path.isdir(cache_dir):
+			os.makedirs(cache_dir)
+		for filename in os.listdir(cache_dir):
+			if filename.startswith(prefix):
+				os.remove(os.path.join(cache_dir, filename))
+		# other instance of application may read cache in this time
+		fileno, tmp_file = tempfile.mkstemp(dir=cache_dir)
+		with os.fdopen(fileno, 'wb') as ofile:
+			marshal.dump(objects, ofile)
+		os.rename(tmp_file, cache_file)
+	except (IOError, OSError) as err:
+		_LOG.warn('xrc_cache: write cache %s error: %s', cache_file, err)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=R0902, R0903, C0103
+""" Tests for xrc_cache module.
+"""
+
+__author__ = "Karol Będkowski"
+__copyright__ = "Copyright (c) Karol Będkowski, 2013"
+__version__ = "2013-07-26"
+
+import os
+import shutil
+import tempfile
+import xml.etree.cElementTree as ET
+from unittest import main, TestCase
+
+from . import xrc_cache
+
+_XRC = """<?xml version="1.0" encoding="UTF-8"?>
+<resource version="2.3.0.1">
+    <object class="wxFrame" name="frame_test">
+        <title>Test</title>
+        <style>wxDEFAULT_FRAME_STYLE|wxTHICK_FRAME</style>
+        <object class="wxStaticText" name="label_1">
+            <label>Zażółć</label>
+            <font><family>default</family></font>
+        </object>
+    </object>
+    <object class="wxDialog" name="dlg_test">
+        <title>Dialog</title>
+    </object>
+</resource>
+"""
+
+
+class TestXrcCache(TestCase):
+	""" Preprocessing and caching xrc files. """
+
+	def setUp(self):
+		self.tempdir = tempfile.mkdtemp()
+		self.xrc_file = os.path.join(self.tempdir, 'test.xrc')
+		self.cache_dir = os.path.join(self.tempdir, 'cache')
+		self.locales_dir = os.path.join(self.tempdir, 'locale')
+		with open(self.xrc_file, 'w') as xrc_file:
+			xrc_file.write(_XRC)
+		self._language = os.environ.get('LANGUAGE')
+		os.environ['LANGUAGE'] = 'pl'
+
+	def tearDown(self):
+		if self._language is None:
+			del os.environ['LANGUAGE']
+		else:
+			os.environ['LANGUAGE'] = self._language
+		shutil.rmtree(self.tempdir)
+
+	def test_split_objects(self):
+		objects = xrc_cache.split_objects(xrc_cache.localize_xrc(_XRC))
+		self.assertEqual(sorted(objects), ['dlg_test', 'frame_test'])
+		frame = ET.fromstring(objects['frame_test'])
+		self.assertEqual(frame.get('version'), '2.3.0.1')
+		self.assertEqual([obj.get('name') for obj in frame], ['frame_test'])
+		self.assertEqual(frame.find('object/style').text,
+				'wxDEFAULT_FRAME_STYLE')
+		self.assertEqual(frame.find('object/object/label').text,
+				u'Zażółć')
+		self.assertIsNone(frame.find('object/object/font/family'))
+
+	def test_cache(self):
+		objects = xrc_cache.load_objects(self.xrc_file, self.locales_dir,
+				self.cache_dir)
+		cache_files = os.listdir(self.cache_dir)
+		self.assertEqual(len(cache_files), 1)
+		self.assertTrue(cache_files[0].startswith('test-C-'))
+		# second load use cache
+		split_objects = xrc_cache.split_objects
+		xrc_cache.split_objects = None
+		try:
+			self.assertEqual(xrc_cache.load_objects(self.xrc_file,
+					self.locales_dir, self.cache_dir), objects)
+		finally:
+			xrc_cache.split_objects = split_objects
+		# changed file - cache is rebuilt
+		with open(self.xrc_file, 'w') as xrc_file:
+			xrc_file.write(_XRC.replace('Dialog', 'Dialog 2'))
+		objects = xrc_cache.load_objects(self.xrc_file, self.locales_dir,
+				self.cache_dir)
+		self.assertIn('Dialog 2', objects['dlg_test'])
+		new_cache_files = os.listdir(self.cache_dir)
+		self.assertEqual(len(new_cache_files), 1)
+		self.assertNotEqual(new_cache_files, cache_files)
+
+	def test_locale_key(self):
+		self.assertEqual(xrc_cache.get_locale_key(self.locales_dir),
+				('C', None))
+		catalog_dir = os.path.join(self.locales_dir, 'pl', 'LC_MESSAGES')
+		os.makedirs(catalog_dir)
+		catalog = os.path.join(catalog_dir, 'wxgtd.mo')
+		open(catalog, 'w').close()
+		self.assertEqual(xrc_cache.get_locale_key(self.locales_dir),
+				('pl', catalog))
+		xrc_cache.load_objects(self.xrc_file, self.locales_dir, self.cache_dir)
+		xrc_cache.load_objects(self.xrc_file, None, self.cache_dir)
+		self.assertEqual(sorted(name.split('-')[1] for name
+				in os.listdir(self.cache_dir)), ['C', 'pl'])
+
+
+if __name__ == '__main__':
+	main()